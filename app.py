@@ -1,6 +1,9 @@
 import os
+import threading
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from models.engine import init_app_db
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 
 # --------------------------------
@@ -12,7 +15,8 @@ app.secret_key = os.environ.get("SECRET_KEY", "supersecretkey")
 # Database config
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+init_app_db(app, db)
 
 # Login manager
 login_manager = LoginManager()
@@ -83,32 +87,257 @@ def practice():
 # --------------------------------
 # Heavy ML routes (lazy imports)
 # --------------------------------
-@app.route("/analyze", methods=["POST"])
-@login_required
-def analyze():
-    # 🔹 Import only when route is called
-    from utils.analysis_utils import analyze_pronunciation  
+def run_analysis(phrase, audio_path):
+    """Job body: the full pipeline, returning a JSON-ready result."""
+    from utils.analysis_utils import analyze_pronunciation
+
+    result = analyze_pronunciation(phrase, audio_path)
+    result.pop("phoneme_comparison", None)
+    return result
+
+# Batches hold a request thread for their whole run; BATCH_MAX_CONCURRENT
+# bounds how many may, so they cannot take every thread of the worker
+batch_slots = threading.BoundedSemaphore(int(os.environ.get("BATCH_MAX_CONCURRENT", 1)))
 
-    data = request.json
+def busy_response(error):
+    response = jsonify({"error": f"Server busy: {error}"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+def job_urls(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for("analyze_job_status", job_id=job.id),
+        "events_url": url_for("analyze_job_events", job_id=job.id)
+    }
+
+def submit_analysis():
+    """Queue the analysis in the request body; returns (job, None) or (None, error response)."""
+    from utils.jobs import QueueFull, get_job_queue
+
+    data = request.json or {}
     phrase = data.get("phrase")
     audio_path = data.get("audio_path")
 
     if not phrase or not audio_path:
+        return None, (jsonify({"error": "Missing input"}), 400)
+
+    # Runs on the job workers, so concurrent analyses stay bounded; shared
+    # so that whichever worker gets the status request can answer it
+    try:
+        job = get_job_queue().submit(run_analysis, phrase, audio_path, owner=current_user.id, shared=True)
+    except QueueFull as e:
+        return None, busy_response(e)
+    return job, None
+
+@app.route("/analyze", methods=["POST"])
+@login_required
+def analyze():
+    """
+    Queue an analysis. Answers 202 at once, with a Location header pointing
+    at the job's status; poll it or follow its events for the result.
+    """
+    job, error = submit_analysis()
+    if error:
+        return error
+    urls = job_urls(job)
+    return jsonify(urls), 202, {"Location": urls["status_url"]}
+
+@app.route("/analyze/jobs", methods=["POST"])
+@login_required
+def submit_analyze_job():
+    """Queue an analysis and return its job id at once."""
+    job, error = submit_analysis()
+    if error:
+        return error
+    return jsonify(job_urls(job)), 202
+
+def find_job(job_id):
+    from utils.jobs import get_job_queue
+
+    job = get_job_queue().get(job_id)
+    # Other users' jobs look the same as unknown ones; stored owners are strings
+    if job is None or str(job.owner) != str(current_user.id):
+        return None
+    return job
+
+@app.route("/analyze/jobs/<job_id>")
+@login_required
+def analyze_job_status(job_id):
+    """Poll a job: its status, and the result once it is done."""
+    from utils.jobs import get_job_queue
+
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    state = job.to_dict()
+    state["queue_position"] = get_job_queue().position(job)
+    return jsonify(state)
+
+@app.route("/analyze/jobs/<job_id>/events")
+@login_required
+def analyze_job_events(job_id):
+    """
+    Server-sent events: one 'status' event per change, ending with the result.
+    The stream holds a gunicorn thread until the job finishes, so size
+    GUNICORN_THREADS for the concurrent streams expected (or use an async worker).
+    """
+    import json
+    from flask import Response, stream_with_context
+
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    def generate():
+        for state in job.watch(timeout=15):
+            if state is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/analyze/batch", methods=["POST"])
+@login_required
+def analyze_batch():
+    """
+    Score a list of {phrase, audio_path} items, streamed back as JSON lines:
+    a "result" line per item and a "stats" line with progress and
+    throughput after every batch. All requests share one process pool
+    sized by BATCH_MAX_WORKERS, and at most BATCH_MAX_CONCURRENT batches
+    run at once; further ones get 503.
+    """
+    import json
+    from flask import Response, stream_with_context
+    from utils.batch_scoring import MAX_BATCH_SIZE, get_batch_pool, score_batch
+
+    data = request.json or {}
+    items = [
+        {"phrase": item.get("phrase"), "audio": item.get("audio_path") or item.get("audio")}
+        for item in data.get("items", [])
+    ]
+    if not items:
         return jsonify({"error": "Missing input"}), 400
+    try:
+        batch_size = int(data.get("batch_size", 8))
+    except (TypeError, ValueError):
+        batch_size = 0
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        return jsonify({"error": f"batch_size must be an integer from 1 to {MAX_BATCH_SIZE}"}), 400
 
-    result = analyze_pronunciation(phrase, audio_path)
-    return jsonify(result)
+    if not batch_slots.acquire(blocking=False):
+        return busy_response("too many batches running")
+
+    def generate():
+        # score_batch reports progress once a batch's results are all out
+        progress = []
+
+        def stats_lines():
+            while progress:
+                yield json.dumps({"type": "stats", **progress.pop(0)}) + "\n"
+
+        try:
+            for result in score_batch(items, batch_size=batch_size, pool=get_batch_pool(),
+                                      on_progress=lambda stats: progress.append(stats.as_dict())):
+                yield from stats_lines()
+                yield json.dumps({"type": "result", **result}) + "\n"
+            yield from stats_lines()
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": f"Batch error: {str(e)}"}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    # Runs however the stream ends, even if it is never read
+    response.call_on_close(batch_slots.release)
+    return response
+
+# --------------------------------
+# Metrics (opt-in)
+# --------------------------------
+if os.environ.get("METRICS_ENDPOINT") == "1":
+    @app.route("/metrics")
+    def metrics_snapshot():
+        """Counters and histograms of every worker (see METRICS_DIR) plus this worker's database pools."""
+        from models.engine import pool_stats
+        from utils import metrics
+        combined = metrics.combined_snapshot()
+        return jsonify({"metrics": combined["metrics"], "workers": combined["workers"],
+                        "pid": os.getpid(), "db": pool_stats()})
+
+# --------------------------------
+# Warm ASR models at boot
+# --------------------------------
+def start_asr_prewarm():
+    """
+    Load and warm the ASR models in a background thread, unless ASR_PREWARM=0
+    or an inference server (ASR_INFERENCE_ADDRESS) holds them instead.
+    Called by `python app.py` and by each gunicorn worker after the fork,
+    never on import.
+    """
+    if os.environ.get("ASR_PREWARM", "1") == "1" and not os.environ.get("ASR_INFERENCE_ADDRESS"):
+        from utils.asr_models import start_prewarm_thread
+        start_prewarm_thread()
 
 # --------------------------------
 # Init DB
 # --------------------------------
-@app.before_request
-def create_tables():
-    db.create_all()
+_db_ready = False
+_db_lock = threading.Lock()
+# Any fixed 64-bit key; serializes schema creation across gunicorn workers
+DB_BOOTSTRAP_LOCK_ID = 731902
+
+def bootstrap_db():
+    """
+    Create missing tables once per process, at startup rather than per request.
+    On Postgres a session advisory lock keeps workers from racing each other.
+    """
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if _db_ready:
+            return
+        with app.app_context():
+            if db.engine.dialect.name == "postgresql":
+                with db.engine.connect() as conn:
+                    conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": DB_BOOTSTRAP_LOCK_ID})
+                    try:
+                        db.metadata.create_all(conn)
+                        conn.commit()
+                    finally:
+                        conn.rollback()
+                        conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": DB_BOOTSTRAP_LOCK_ID})
+                        conn.commit()
+            else:
+                db.create_all()
+        _db_ready = True
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create the database tables."""
+    bootstrap_db()
+    print("Database tables created.")
+
+# Under gunicorn the schema is created by the release step (see Procfile);
+# DB_BOOTSTRAP=1 creates it when the app is imported instead.
+if os.environ.get("DB_BOOTSTRAP", "0") == "1":
+    try:
+        bootstrap_db()
+    except Exception as e:
+        print(f"Error creating database tables: {str(e)}")
 
 # --------------------------------
 # Entrypoint
 # --------------------------------
 if __name__ == "__main__":
+    # Single process: nothing else can race the schema creation
+    try:
+        bootstrap_db()
+    except Exception as e:
+        print(f"Error creating database tables: {str(e)}")
+    start_asr_prewarm()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
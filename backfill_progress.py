@@ -0,0 +1,40 @@
+"""
+Rebuild the per-user progress aggregates (user_progress, user_phrase_stats,
+user_phoneme_stats) from the existing practice history.
+
+The tables are created by migration 0002, not by this script; run
+"flask --app models.database:create_app db upgrade" first.
+
+Usage:
+    python backfill_progress.py              # every user
+    python backfill_progress.py --user 42    # one user
+"""
+import argparse
+import sys
+
+from sqlalchemy import inspect
+
+from models.database import create_app
+from models.models import UserPhonemeStats, UserPhraseStats, UserProgress, db
+from models.session_store import rebuild_progress
+
+AGGREGATE_TABLES = [model.__tablename__ for model in (UserProgress, UserPhraseStats, UserPhonemeStats)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild per-user progress aggregates")
+    parser.add_argument('--user', type=int, default=None, help="Only rebuild this user id")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        missing = [name for name in AGGREGATE_TABLES if not inspect(db.engine).has_table(name)]
+        if missing:
+            sys.exit(f"Missing tables: {', '.join(missing)}. Create them first with:\n"
+                     f"    flask --app models.database:create_app db upgrade")
+        rebuilt = rebuild_progress(args.user)
+    print(f"Rebuilt progress for {rebuilt} user(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import json
+import sys
+
+from utils.batch_scoring import read_manifest, score_batch
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score a manifest of (phrase, audio) pairs and write the results as JSON lines."
+    )
+    parser.add_argument("manifest", help="JSONL or CSV file with 'phrase' and 'audio' fields")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Decode/scoring processes (default: CPU count)")
+    parser.add_argument("-b", "--batch-size", type=int, default=8, help="Clips per ASR forward pass")
+    args = parser.parse_args()
+
+    items = read_manifest(args.manifest)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    def report(stats):
+        s = stats.as_dict()
+        print(f"[{s['done']}/{s['total']}] {s['clips_per_second']} clips/s, "
+              f"{s['audio_seconds_per_second']}x realtime, {s['failed']} failed", file=sys.stderr)
+
+    try:
+        for result in score_batch(items, workers=args.workers, batch_size=args.batch_size, on_progress=report):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+CPU latency, throughput and accuracy parity of the local ASR engines.
+
+For each engine (fp32 pipeline, int8 dynamically quantized pipeline, ONNX
+Runtime export) the script reports the load time, the p50/p95 latency of
+single clips, the throughput of batched transcription and, per clip, the
+word agreement with transcribe_audio_huggingface() running the fp32
+pipeline. Export the ONNX model first with convert_asr_model.py; engines
+that cannot be loaded are skipped. Pass real recordings with --audio for
+a meaningful parity check; the default synthetic clips only give timings.
+
+Usage:
+    python benchmarks/asr_engines.py [--audio a.wav b.wav ...] [--engines pipeline int8 onnx]
+                                     [--runs 5] [--batch-size 8] [--threads 4]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.asr_models import SAMPLE_RATE, configured_asr_models, load_asr_model
+from utils.audio_decode import DecodedAudio, decode_audio
+from utils.word_alignment import compare_words
+
+MIN_AGREEMENT = 0.95
+
+
+def _clips(paths):
+    if paths:
+        return [decode_audio(path) for path in paths]
+    # Two to six seconds of low noise stand in for recordings
+    rng = np.random.default_rng(0)
+    return [DecodedAudio((rng.standard_normal(seconds * SAMPLE_RATE) * 0.01).astype(np.float32), SAMPLE_RATE)
+            for seconds in (2, 4, 6)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", nargs="*", default=[], help="Recordings to transcribe")
+    parser.add_argument("--engines", nargs="+", default=["pipeline", "int8", "onnx"])
+    parser.add_argument("--runs", type=int, default=5, help="Passes over the clips")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None, help="torch and ONNX Runtime CPU threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+        os.environ["OMP_NUM_THREADS"] = str(args.threads)
+
+    name = configured_asr_models()[0]
+    clips = _clips(args.audio)
+    audio_seconds = sum(clip.duration for clip in clips)
+
+    # Reference transcripts: what the fp32 pipeline returns today
+    os.environ["ASR_ENGINE"] = "pipeline"
+    from utils.analysis_utils import transcribe_audio_huggingface
+    from utils.asr_backends import TranscriptionError
+    reference = []
+    for clip in clips:
+        try:
+            reference.append(transcribe_audio_huggingface(clip))
+        except TranscriptionError:
+            reference.append("")
+
+    print(f"model {name}, {len(clips)} clips, {audio_seconds:.1f}s of audio, {args.runs} runs")
+    failed = False
+    for engine in args.engines:
+        try:
+            model = load_asr_model(name, engine)
+        except Exception as e:
+            print(f"\n{engine}: skipped ({str(e)})")
+            continue
+        inputs = [clip.to_pipeline_input() for clip in clips]
+        model.prewarm()
+
+        latencies = []
+        for _ in range(args.runs):
+            for item in inputs:
+                start = time.perf_counter()
+                model.transcribe(item)
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            transcripts = model.transcribe_batch(inputs, batch_size=args.batch_size)
+        batched = time.perf_counter() - start
+
+        agreement = []
+        for expected, actual in zip(reference, transcripts):
+            agreement.append(compare_words(expected, actual).score() if expected or actual else 1.0)
+        mean_agreement = sum(agreement) / len(agreement)
+        failed = failed or mean_agreement < MIN_AGREEMENT
+
+        print(f"\n{engine}: loaded in {model.load_seconds:.1f}s, {model.memory_bytes / 1e6:.0f} MB")
+        print(f"  latency      p50 {statistics.median(latencies) * 1000:7.0f} ms   "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.0f} ms")
+        print(f"  throughput   {len(inputs) * args.runs / batched:7.2f} clips/s   "
+              f"{audio_seconds * args.runs / batched:6.1f}x realtime (batch {args.batch_size})")
+        print(f"  parity       {mean_agreement * 100:5.1f}% word agreement with the fp32 pipeline")
+        for clip, expected, actual, score in zip(clips, reference, transcripts, agreement):
+            if score < 1.0:
+                print(f"    {clip.source or 'clip'}: '{expected}' -> '{actual}'")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Sequential fallback vs. hedged ASR, fully offline.
+
+Google is replaced by the stub recognizer; the local model is either a
+sleep of --local-latency seconds or, with --real-model, the Wav2Vec2
+backend from the registry.
+
+Usage:
+    python benchmarks/asr_hedging.py [--hedge-delay 1.0] [--runs 3] [--real-model]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_recognizer import start_stub_recognizer
+from utils import metrics
+from utils.asr_backends import ASRBackend, GoogleBackend, HedgedTranscriber, TranscriptionError, Wav2Vec2Backend
+
+
+class SleepBackend(ASRBackend):
+    name = 'local-stub'
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _transcribe(self, audio, cancel_event=None):
+        time.sleep(self.latency)
+        return "hello from the local model"
+
+
+def write_clip():
+    path = os.path.join(tempfile.gettempdir(), "asr_hedging_clip.wav")
+    samples = (np.sin(np.linspace(0, 2000 * np.pi, 16000)) * 3000).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(samples.tobytes())
+    return path
+
+
+def sequential(google, local, audio):
+    try:
+        return google.transcribe(audio)
+    except TranscriptionError:
+        return local.transcribe(audio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hedge-delay", type=float, default=1.0)
+    parser.add_argument("--local-latency", type=float, default=0.8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    audio = write_clip()
+    local = Wav2Vec2Backend() if args.real_model else SleepBackend(args.local_latency)
+    scenarios = [
+        ("google fast", dict(delay=0.2)),
+        ("google slow", dict(delay=4.0)),
+        ("google down", dict(delay=0.1, fail=True)),
+    ]
+
+    print(f"{'scenario':<14} {'sequential s':>13} {'hedged s':>9}")
+    for label, options in scenarios:
+        server, endpoint = start_stub_recognizer("hello how are you", **options)
+        google = GoogleBackend(endpoint=endpoint, timeout=10)
+        hedged = HedgedTranscriber(google, [local], hedge_delay=args.hedge_delay)
+        seq_times, hedge_times = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            sequential(google, local, audio)
+            seq_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            hedged.transcribe(audio)
+            hedge_times.append(time.perf_counter() - start)
+        server.shutdown()
+        print(f"{label:<14} {np.mean(seq_times):>13.2f} {np.mean(hedge_times):>9.2f}")
+
+    print()
+    for name, snap in metrics.snapshot("asr_").items():
+        if isinstance(snap, dict):
+            print(f"{name}: count={snap['count']} mean={snap['mean']:.3f}s p95<={snap['p95']}s")
+        else:
+            print(f"{name}: {snap}")
+
+
+if __name__ == "__main__":
+    main()
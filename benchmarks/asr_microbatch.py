@@ -0,0 +1,99 @@
+"""
+ASR inference server: throughput and latency with and without micro-batching.
+
+Starts an ASRInferenceServer on a local socket and sends requests from
+several concurrent client threads, once per (max_batch, max_wait) setting.
+By default the model is a stand-in whose forward pass costs a fixed
+overhead plus a per-clip amount, like a CPU Wav2Vec2 pass; --real loads
+the configured Hugging Face model instead.
+
+Usage:
+    python benchmarks/asr_microbatch.py [--clients 8] [--requests 20] [--real]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.asr_models import SAMPLE_RATE, get_asr_model
+from utils.asr_server import ASRInferenceServer, InferenceClient
+
+SETTINGS = [(1, 0.0), (4, 0.005), (8, 0.01), (8, 0.025)]
+
+
+class SimulatedModel:
+    """Forward pass cost: fixed + per_clip * batch size, serialized like the real model."""
+
+    def __init__(self, fixed=0.06, per_clip=0.015):
+        self.fixed = fixed
+        self.per_clip = per_clip
+        self._lock = threading.Lock()
+
+    def transcribe_batch(self, inputs, batch_size=8):
+        with self._lock:
+            time.sleep(self.fixed + self.per_clip * len(inputs))
+        return ["hello world"] * len(inputs)
+
+
+def run(model, max_batch, max_wait, clients, requests, clip):
+    address = os.path.join(tempfile.mkdtemp(), "asr.sock")
+    authkey = os.urandom(32)
+    server = ASRInferenceServer(model, address, max_batch=max_batch, max_wait=max_wait, authkey=authkey)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while not os.path.exists(address):
+        time.sleep(0.01)
+
+    client = InferenceClient(address, authkey=authkey)
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def worker():
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.transcribe(clip)
+            elapsed = time.perf_counter() - start
+            with latencies_lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    server.close()
+
+    latencies.sort()
+    print(f"max_batch={max_batch:<2} max_wait={max_wait * 1000:4.0f}ms  "
+          f"{len(latencies) / wall:6.1f} clips/s  "
+          f"p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.0f} ms  "
+          f"mean batch {server.clips / server.batches:4.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--real", action="store_true", help="Use the configured Hugging Face model")
+    args = parser.parse_args()
+
+    model = get_asr_model() if args.real else SimulatedModel()
+    rng = np.random.default_rng(0)
+    clip = (rng.standard_normal(2 * SAMPLE_RATE) * 0.01).astype(np.float32)
+
+    print(f"{args.clients} clients x {args.requests} requests of {len(clip) / SAMPLE_RATE:.0f}s clips")
+    for max_batch, max_wait in SETTINGS:
+        run(model, max_batch, max_wait, args.clients, args.requests, clip)
+
+
+if __name__ == "__main__":
+    main()
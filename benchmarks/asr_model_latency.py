@@ -0,0 +1,65 @@
+"""
+Cold vs. warm latency of the local ASR model.
+
+Compares building a fresh transformers pipeline per call (the old
+behaviour of transcribe_audio_huggingface) with the shared registry.
+
+Usage:
+    python benchmarks/asr_model_latency.py [--audio clip.wav] [--runs 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.asr_models import SAMPLE_RATE, configured_asr_models, get_asr_model
+
+
+def _clip(audio_path):
+    if audio_path:
+        return audio_path
+    # Two seconds of low noise stands in for a recording
+    rng = np.random.default_rng(0)
+    return {"raw": (rng.standard_normal(2 * SAMPLE_RATE) * 0.01).astype(np.float32),
+            "sampling_rate": SAMPLE_RATE}
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="Audio file to transcribe (default: synthetic clip)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    name = configured_asr_models()[0]
+    clip = _clip(args.audio)
+
+    per_call = []
+    for _ in range(args.runs):
+        per_call.append(_timed(lambda: pipeline("automatic-speech-recognition", model=name)(clip)))
+
+    cold = _timed(lambda: get_asr_model(name).transcribe(clip))
+    warm = [_timed(lambda: get_asr_model(name).transcribe(clip)) for _ in range(args.runs)]
+
+    stats = get_asr_model(name).stats()
+    print(f"model:              {name}")
+    print(f"load time:          {stats['load_seconds']:.3f}s")
+    print(f"model memory:       {stats['memory_bytes'] / 1e6:.1f} MB")
+    print(f"per-call pipeline:  mean {np.mean(per_call):.3f}s  min {np.min(per_call):.3f}s")
+    print(f"registry cold:      {cold:.3f}s")
+    print(f"registry warm:      mean {np.mean(warm):.3f}s  min {np.min(warm):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Decode cost per request: old WAV re-export vs. the in-memory decode stage.
+
+The old path converted non-WAV input with pydub and exported a .wav next
+to the source once per recognizer (twice when the fallback ran). The new
+path decodes once into a float32 buffer and writes nothing.
+
+Usage:
+    python benchmarks/audio_decode.py clip.mp3 [clip.ogg ...] [--runs 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+from utils.audio_decode import decode_audio
+
+
+def old_path(audio_file, recognizers=2):
+    """Returns bytes written by the previous per-recognizer WAV export."""
+    from pydub import AudioSegment
+
+    written = 0
+    for _ in range(recognizers):
+        if os.path.splitext(audio_file)[1].lower() != '.wav':
+            wav_path = os.path.join(tempfile.gettempdir(), "bench_reexport.wav")
+            AudioSegment.from_file(audio_file).export(wav_path, format='wav')
+            written += os.path.getsize(wav_path)
+            os.remove(wav_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # The new path never writes: only its time and the bytes it reads are reported
+    print(f"{'file':<30} {'old ms':>8} {'old written':>12} {'new ms':>8} {'new read':>12}")
+    for path in args.files:
+        old_times, new_times, old_written = [], [], 0
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            old_written = old_path(path)
+            old_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            new_read = decode_audio(path).input_bytes
+            new_times.append(time.perf_counter() - start)
+        print(f"{os.path.basename(path):<30} {np.mean(old_times) * 1e3:>8.1f} {old_written:>12} "
+              f"{np.mean(new_times) * 1e3:>8.1f} {new_read:>12}")
+
+    print()
+    print("audio_decode_seconds:", metrics.histogram("audio_decode_seconds").snapshot()['mean'])
+    print("audio_decode_input_bytes:", metrics.counter("audio_decode_input_bytes").value)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Import-time profile of the web tier.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each module, prints the wall time of the import, the modules with the
+largest cumulative import time, and any part of the ML stack (torch,
+transformers, gradio, ...) that was pulled in. Boot-time work such as table
+creation is switched off so only imports are measured.
+
+The web tier (`app`) should import in under --target seconds (default 1.0)
+without loading any ML module; the script exits non-zero otherwise.
+
+Usage:
+    python benchmarks/import_time.py [--module app --module routes] [--top 15] [--target 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ML_MODULES = ('torch', 'transformers', 'tensorflow', 'gradio', 'speech_recognition',
+              'epitran', 'pandas', 'datasets', 'pydub')
+
+
+def profile(module):
+    """
+    Import module in a child interpreter with -X importtime.
+    Returns:
+        tuple: (wall seconds, {module name: cumulative seconds})
+    """
+    env = dict(os.environ)
+    env.setdefault("TTS_PRERENDER", "0")
+    env.setdefault("DB_BOOTSTRAP", "0")
+    env.setdefault("DATABASE_URL", "sqlite://")
+
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(total) / 1e6
+    return wall, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--target", type=float, default=1.0, help="Boot budget in seconds")
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.module or ["app"]:
+        try:
+            wall, cumulative = profile(module)
+        except RuntimeError as e:
+            print(f"{module}: import failed: {e}")
+            ok = False
+            continue
+
+        loaded_ml = sorted({name.split('.')[0] for name in cumulative} & set(ML_MODULES))
+        within = wall <= args.target and not loaded_ml
+        ok = ok and within
+        print(f"\n{module}: {wall:.2f}s wall, {cumulative.get(module, 0.0):.2f}s importing "
+              f"({len(cumulative)} modules) - {'OK' if within else 'OVER BUDGET'} (target {args.target:.1f}s, no ML)")
+        print(f"  ML modules loaded: {', '.join(loaded_ml) or 'none'}")
+        top_level = {name: seconds for name, seconds in cumulative.items() if '.' not in name and name != module}
+        for name, seconds in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
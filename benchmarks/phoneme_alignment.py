@@ -0,0 +1,73 @@
+"""
+Phoneme comparison: positional zip (old) vs. segment alignment (new).
+
+Runs on synthetic IPA so it needs neither epitran nor an ASR model.
+For each target length the spoken sequence has one phoneme inserted
+near the start plus a few random substitutions.
+
+Usage:
+    python benchmarks/phoneme_alignment.py [--lengths 30 300 3000] [--runs 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.phoneme_alignment import MATCH, align_ipa
+
+SYMBOLS = ['p', 'b', 't', 'd', 'k', 'ɡ', 'm', 'n', 'ŋ', 'f', 'v', 'θ', 'ð', 's', 'z', 'ʃ',
+           'h', 'l', 'ɹ', 'w', 'j', 'i', 'ɪ', 'ɛ', 'æ', 'ɑ', 'ʌ', 'ə', 'u', 'ʊ', 'ej', 'ow', 'aj', 't͡ʃ']
+
+
+def zip_compare(target, spoken):
+    """The previous get_phoneme_analysis comparison, without the DataFrame."""
+    max_len = max(len(target), len(spoken))
+    target = target.ljust(max_len)
+    spoken = spoken.ljust(max_len)
+    return [1 if t == s else 0 for t, s in zip(target, spoken)]
+
+
+def aligned_compare(target, spoken):
+    _, _, _, ops = align_ipa(target, spoken)
+    return [1 if op == MATCH else 0 for op, _, _ in ops]
+
+
+def make_pair(length, rng):
+    words, spoken_words = [], []
+    while sum(len(w) for w in words) < length:
+        word = [rng.choice(SYMBOLS) for _ in range(rng.randint(2, 6))]
+        words.append(word)
+        spoken_words.append([rng.choice(SYMBOLS) if rng.random() < 0.05 else s for s in word])
+    spoken_words[0] = [rng.choice(SYMBOLS)] + spoken_words[0]
+    return (' '.join(''.join(w) for w in words), ' '.join(''.join(w) for w in spoken_words))
+
+
+def bench(fn, target, spoken, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn(target, spoken)
+    elapsed = (time.perf_counter() - start) / runs
+    return elapsed, sum(result) / len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[30, 300, 3000])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'phonemes':>9} {'zip ms':>9} {'zip acc':>8} {'align ms':>9} {'align acc':>10}")
+    for length in args.lengths:
+        target, spoken = make_pair(length, rng)
+        runs = max(1, args.runs // max(1, length // 300))
+        zip_time, zip_acc = bench(zip_compare, target, spoken, runs)
+        align_time, align_acc = bench(aligned_compare, target, spoken, runs)
+        print(f"{length:>9} {zip_time * 1e3:>9.3f} {zip_acc:>8.2f} {align_time * 1e3:>9.3f} {align_acc:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Practice history queries with and without the access-path indexes.
+
+Seeds a database with synthetic users, sessions and phoneme details, runs
+the queries behind the progress and history pages without the indexes of
+migration 0003, then creates them and runs the queries again. Prints the
+query plan and the median latency of each query.
+
+Usage:
+    python benchmarks/progress_queries.py [--sessions 1000000] [--users 2000] [--runs 50]
+    python benchmarks/progress_queries.py --database-url postgresql://localhost/bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+
+from models.engine import create_engine
+from models.models import db, PhonemeDetail, PracticeSession, User
+
+NEW_INDEXES = {
+    'ix_practice_sessions_user_created',
+    'ix_practice_sessions_user_phrase',
+    'ix_phoneme_details_session_id',
+}
+
+PHRASES = ["Hello, how are you?", "Nice to meet you", "Thank you very much", "What time is it?",
+           "Where is the bathroom?", "I would like a coffee", "Can you help me?", "Good morning"]
+PHONEMES = ['θ', 'ð', 'ɹ', 'l', 'v', 'w', 'ʃ', 'ʒ', 'æ', 'ɪ', 'ʊ', 'ŋ']
+
+QUERIES = {
+    'recent sessions': """
+        SELECT id, target_phrase, overall_score, created_at FROM practice_sessions
+        WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 10""",
+    'phrase stats': """
+        SELECT target_phrase, count(id), avg(overall_score) FROM practice_sessions
+        WHERE user_id = :user_id GROUP BY target_phrase""",
+    'phoneme errors': """
+        SELECT d.target_phoneme, count(d.id) FROM phoneme_details d
+        JOIN practice_sessions s ON d.session_id = s.id
+        WHERE s.user_id = :user_id AND d.is_correct = false
+        GROUP BY d.target_phoneme""",
+}
+
+
+def new_indexes():
+    for table in (PracticeSession.__table__, PhonemeDetail.__table__):
+        for index in table.indexes:
+            if index.name in NEW_INDEXES:
+                yield index
+
+
+def seed(engine, sessions, users, chunk=20000):
+    rng = random.Random(13)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com'} for i in range(1, users + 1)
+        ])
+    epoch = datetime(2024, 1, 1)
+    detail_id = 1
+    for first in range(1, sessions + 1, chunk):
+        session_rows, detail_rows = [], []
+        for session_id in range(first, min(first + chunk, sessions + 1)):
+            score = rng.uniform(20, 100)
+            session_rows.append({
+                'id': session_id, 'user_id': rng.randint(1, users), 'target_phrase': rng.choice(PHRASES),
+                'spoken_phrase': '', 'overall_score': score, 'word_accuracy': score,
+                'phoneme_accuracy': score, 'completeness_score': 100.0,
+                'created_at': epoch + timedelta(seconds=rng.randint(0, 60 * 86400))
+            })
+            for _ in range(rng.randint(0, 3)):
+                detail_rows.append({
+                    'id': detail_id, 'session_id': session_id, 'target_phoneme': rng.choice(PHONEMES),
+                    'spoken_phoneme': rng.choice(PHONEMES), 'is_correct': rng.random() < 0.5,
+                    'created_at': epoch
+                })
+                detail_id += 1
+        with engine.begin() as conn:
+            conn.execute(insert(PracticeSession.__table__), session_rows)
+            conn.execute(insert(PhonemeDetail.__table__), detail_rows)
+    print(f"Seeded {sessions} sessions, {detail_id - 1} phoneme details, {users} users "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == 'postgresql':
+        rows = conn.execute(text("EXPLAIN ANALYZE " + sql), params)
+        return [row[0] for row in rows]
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)
+    return [row[-1] for row in rows]
+
+
+def run_queries(engine, users, runs, label):
+    rng = random.Random(7)
+    print(f"\n== {label} ==")
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            timings = []
+            for _ in range(runs):
+                params = {'user_id': rng.randint(1, users)}
+                start = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append(time.perf_counter() - start)
+            print(f"{name:<16} median {statistics.median(timings) * 1000:8.2f} ms")
+            for line in explain(conn, sql, {'user_id': 1}):
+                print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--database-url", default=None,
+                        help="Empty database to use (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    engine = create_engine(url)
+    try:
+        db.metadata.drop_all(engine)
+        db.metadata.create_all(engine)
+        for index in new_indexes():
+            index.drop(engine)
+        seed(engine, args.sessions, args.users)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        run_queries(engine, args.users, args.runs, "without indexes")
+
+        start = time.perf_counter()
+        for index in new_indexes():
+            index.create(engine)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print(f"\nCreated indexes in {time.perf_counter() - start:.1f}s")
+
+        run_queries(engine, args.users, args.runs, "with indexes")
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
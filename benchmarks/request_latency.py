@@ -0,0 +1,76 @@
+"""
+Per-request latency with and without db.create_all() in a before_request hook.
+
+Imports app.py against a throwaway database (or --database-url), then
+times a trivial /benchmark/ping route through Flask's test client: first
+as the app now runs, then with the old per-request create_all() hook put
+back. The route does no work of its own, so the difference is the hook.
+
+Usage:
+    python benchmarks/request_latency.py [--requests 500]
+    python benchmarks/request_latency.py --database-url postgresql://localhost/bench
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+PING_PATH = "/benchmark/ping"
+
+
+def measure(client, path, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code < 500, response.status_code
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--database-url", default=None,
+                        help="Database to use (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    try:
+        start = time.perf_counter()
+        from app import app, db
+        print(f"Imported app (including the one-time table bootstrap) in {time.perf_counter() - start:.2f}s")
+
+        app.add_url_rule(PING_PATH, "benchmark_ping", lambda: "ok")
+        client = app.test_client()
+        client.get(PING_PATH)  # first request opens the pool
+
+        median, p95 = measure(client, PING_PATH, args.requests)
+        print(f"bootstrap at startup     median {median * 1000:7.3f} ms   p95 {p95 * 1000:7.3f} ms")
+
+        def create_tables():
+            db.create_all()
+
+        app.before_request_funcs.setdefault(None, []).append(create_tables)
+        median, p95 = measure(client, PING_PATH, args.requests)
+        print(f"create_all per request   median {median * 1000:7.3f} ms   p95 {p95 * 1000:7.3f} ms")
+    finally:
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Local stand-in for the Google Web Speech API.
+
+Answers every POST with a fixed transcript in Google's v2 response format
+after an optional delay, so the ASR hedging can be exercised offline:
+
+    python benchmarks/stub_recognizer.py --transcript "hello how are you" --delay 2.5
+    GOOGLE_SPEECH_ENDPOINT=http://127.0.0.1:8765/recognize python app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(transcript, delay, fail):
+    class StubRecognizerHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            if fail:
+                self.send_response(503)
+                self.end_headers()
+                return
+            # Google streams an empty result line before the real one
+            lines = [{"result": []}]
+            if transcript:
+                lines.append({
+                    "result": [{"alternative": [{"transcript": transcript, "confidence": 0.9}], "final": True}],
+                    "result_index": 0
+                })
+            body = "\n".join(json.dumps(line) for line in lines).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubRecognizerHandler
+
+
+def start_stub_recognizer(transcript="hello", delay=0.0, fail=False, port=0):
+    """
+    Start the stub in a background thread.
+    Returns:
+        tuple: (server, endpoint_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(transcript, delay, fail))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/recognize"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcript", default="hello")
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--fail", action="store_true", help="Answer 503 like an unavailable service")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args.transcript, args.delay, args.fail))
+    print(f"Stub recognizer on http://127.0.0.1:{args.port}/recognize")
+    server.serve_forever()
@@ -0,0 +1,55 @@
+"""
+Time to first audio: whole-phrase synthesis vs. chunked streaming.
+
+Defaults to the fake backend with a simulated synthesis cost per word so
+it runs offline; pass --backend gtts or --backend pyttsx3 for real engines.
+
+Usage:
+    python benchmarks/tts_first_audio.py [--backend fake] [--seconds-per-word 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.tts_backends import BACKENDS, FakeTTSBackend
+
+PHRASES = [
+    "Hello, how are you today?",
+    "Thank you for your help.",
+    "The weather is beautiful, and we decided to walk along the river before dinner, "
+    "stopping now and then to watch the boats drift slowly past the old stone bridge.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="fake", choices=sorted(BACKENDS))
+    parser.add_argument("--seconds-per-word", type=float, default=0.05, help="Fake backend synthesis cost")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        backend = FakeTTSBackend(seconds_per_word=args.seconds_per_word)
+    else:
+        backend = BACKENDS[args.backend]()
+
+    print(f"{'words':>6} {'whole s':>8} {'first chunk s':>14} {'stream total s':>15} {'audio s':>8}")
+    for phrase in PHRASES:
+        start = time.perf_counter()
+        sample_rate, samples = backend.synthesize(phrase, speed=args.speed)
+        whole = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        for _ in backend.stream(phrase, speed=args.speed):
+            if first is None:
+                first = time.perf_counter() - start
+        total = time.perf_counter() - start
+        print(f"{len(phrase.split()):>6} {whole:>8.3f} {first:>14.3f} {total:>15.3f} {len(samples) / sample_rate:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Memory per worker with and without loading the model before fork.
+
+Mirrors gunicorn: a master forks N workers, each runs one transcription,
+and once all of them are up every worker reports its RSS, PSS (RSS with
+shared pages divided among the processes sharing them) and private memory
+from /proc/self/smaps_rollup. Without preload each worker loads its own
+model; with preload the master loads it, moves it to shared memory and
+freezes the GC before forking, as gunicorn.conf.py does.
+
+By default the model is a stand-in holding --model-mb of float32 weights
+(about the size of wav2vec2-base); --real loads the configured Hugging
+Face model. Linux only.
+
+Usage:
+    python benchmarks/worker_memory.py [--workers 1 2 4 8] [--model-mb 360] [--real]
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.asr_models import SAMPLE_RATE, get_asr_model
+
+
+class SimulatedModel:
+    """Weights in one float32 array; a transcription reads all of them."""
+
+    def __init__(self, megabytes):
+        self.weights = np.random.default_rng(0).standard_normal(
+            megabytes * 1024 * 1024 // 4, dtype=np.float32)
+
+    def share_memory(self):
+        self.weights.flags.writeable = False
+        return True
+
+    def transcribe(self, inputs):
+        return float(self.weights.sum(dtype=np.float64))
+
+
+def memory_mb():
+    """Rss, Pss and private memory of this process in MB."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': values.get('Rss', 0.0),
+        'pss': values.get('Pss', 0.0),
+        'private': values.get('Private_Clean', 0.0) + values.get('Private_Dirty', 0.0)
+    }
+
+
+def load(real, model_mb):
+    return get_asr_model() if real else SimulatedModel(model_mb)
+
+
+def worker(connection, model, real, model_mb):
+    if model is None:
+        model = load(real, model_mb)
+    model.transcribe({"raw": np.zeros(SAMPLE_RATE, dtype=np.float32), "sampling_rate": SAMPLE_RATE})
+    connection.send("ready")
+    connection.recv()  # measure only once every worker is up
+    connection.send(memory_mb())
+    connection.close()
+
+
+def run(workers, preload, real, model_mb):
+    context = multiprocessing.get_context("fork")
+    model = None
+    if preload:
+        model = load(real, model_mb)
+        model.share_memory()
+        gc.freeze()
+
+    connections, processes = [], []
+    for _ in range(workers):
+        parent_end, child_end = context.Pipe()
+        process = context.Process(target=worker, args=(child_end, model, real, model_mb))
+        process.start()
+        connections.append(parent_end)
+        processes.append(process)
+    for connection in connections:
+        connection.recv()
+    master = memory_mb()
+    for connection in connections:
+        connection.send("measure")
+    reports = [connection.recv() for connection in connections]
+    for process in processes:
+        process.join()
+    gc.unfreeze()
+
+    mean = {key: sum(report[key] for report in reports) / workers for key in ('rss', 'pss', 'private')}
+    total = master['pss'] + sum(report['pss'] for report in reports)
+    print(f"{'preload' if preload else 'per-worker':<10} workers={workers:<2}  "
+          f"RSS/worker {mean['rss']:7.0f} MB  PSS/worker {mean['pss']:7.0f} MB  "
+          f"private/worker {mean['private']:7.0f} MB  total PSS {total:7.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--model-mb", type=int, default=360, help="Size of the stand-in model")
+    parser.add_argument("--real", action="store_true", help="Use the configured Hugging Face model")
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        for workers in args.workers:
+            run(workers, preload, args.real, args.model_mb)
+
+
+if __name__ == "__main__":
+    main()
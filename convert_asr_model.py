@@ -0,0 +1,47 @@
+import argparse
+import sys
+import time
+
+from utils.asr_models import LoadedASRModel, configured_asr_models, load_asr_model
+from utils.audio_decode import decode_audio
+from utils.onnx_asr import OnnxCTCPipeline, default_onnx_dir, export_onnx
+from utils.word_alignment import compare_words
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the local ASR model to ONNX (fp32 and int8) for ASR_ENGINE=onnx."
+    )
+    parser.add_argument("model", nargs="?", default=None, help="Model name (default: first of ASR_MODELS)")
+    parser.add_argument("-o", "--output", help="Output directory (default: ASR_ONNX_DIR/<model>)")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    parser.add_argument("--check", nargs="*", default=[], metavar="AUDIO",
+                        help="Recordings to transcribe with both engines after the export")
+    args = parser.parse_args()
+
+    name = args.model or configured_asr_models()[0]
+    output_dir = export_onnx(name, args.output or default_onnx_dir(name), quantize=not args.no_quantize)
+    print(f"Exported {name} to {output_dir}")
+
+    if not args.check:
+        return
+    # The exported engine must hear what the pipeline hears
+    reference = load_asr_model(name, 'pipeline')
+    start = time.perf_counter()
+    onnx_pipeline = OnnxCTCPipeline(output_dir, quantized=not args.no_quantize)
+    exported = LoadedASRModel(name, onnx_pipeline, time.perf_counter() - start, engine='onnx')
+    print(f"Loaded the export in {exported.load_seconds:.2f}s (pipeline: {reference.load_seconds:.2f}s)")
+    # Decoded once here, so neither engine needs ffmpeg to read the files;
+    # each gets its own inputs because the pipeline consumes them
+    clips = [decode_audio(path) for path in args.check]
+    expected = reference.transcribe_batch([clip.to_pipeline_input() for clip in clips])
+    actual = exported.transcribe_batch([clip.to_pipeline_input() for clip in clips])
+    agreement = [compare_words(e, a).score() if e or a else 1.0 for e, a in zip(expected, actual)]
+    for path, e, a, score in zip(args.check, expected, actual, agreement):
+        print(f"{score * 100:5.1f}%  {path}\n        pipeline: {e}\n        onnx:     {a}")
+    mean = sum(agreement) / len(agreement)
+    print(f"Word agreement with the pipeline: {mean * 100:.1f}%")
+    if mean < 0.95:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 import gradio as gr
+import os
 import socket
-from utils.audio_utils import text_to_speech
+from utils.audio_utils import start_prerender_thread, stream_speech, text_to_speech
 from utils.analysis_utils import analyze_pronunciation
-from models.models import db, User, PracticeSession, PhonemeDetail
+from utils.asr_models import start_prewarm_thread
+from utils.g2p import get_g2p
+from utils.streaming import StreamingScorer
+from utils import metrics
+from utils.jobs import FAILED, QUEUED, RUNNING, QueueFull, get_job_queue
+from models.models import User
+from models.session_store import FAILED as SAVE_FAILED, QUEUED as SAVE_QUEUED, SAVED, get_write_queue, save_session_bulk
 
 # Global variable to store Flask app instance
 app = None
@@ -41,6 +48,19 @@ PREDEFINED_PHRASES = [
 ]
 
 
+def warm_phrase_cache():
+    """
+    Transliterate the predefined phrases once so scoring them does no G2P work,
+    and pre-render their audio so "Play Phrase" is a cache lookup.
+    """
+    try:
+        get_g2p().transliterate_many(PREDEFINED_PHRASES[1:])
+    except Exception as e:
+        print(f"Error warming phrase cache: {str(e)}")
+    if os.environ.get("TTS_PRERENDER", "1") == "1":
+        start_prerender_thread(PREDEFINED_PHRASES[1:])
+
+
 def play_phrase(phrase):
     """Generate TTS audio for the phrase."""
     if phrase:
@@ -49,48 +69,59 @@ def play_phrase(phrase):
     return None, "No phrase selected."
 
 
+def stream_phrase(phrase):
+    """Stream TTS audio for the phrase so playback starts with the first chunk."""
+    if not phrase:
+        yield None, "No phrase selected."
+        return
+    try:
+        for chunk in stream_speech(phrase):
+            yield chunk, "Playing..."
+        yield gr.update(), "Audio generated. Listen above."
+    except Exception as e:
+        yield None, f"Error generating audio: {str(e)}"
+
+
 def save_practice_session(phrase, result, user_id):
-    """Save the practice session to database."""
+    """
+    Save the practice session to database.
+    With PRACTICE_WRITE_BEHIND=1 the write is queued and this returns at once.
+    Returns:
+        str: SAVED, SAVE_QUEUED or SAVE_FAILED
+    """
     global app
 
     if user_id is None or app is None:
-        return False
+        return SAVE_FAILED
+
+    session_fields = {
+        'user_id': user_id,
+        'target_phrase': phrase,
+        'spoken_phrase': result.get('transcript', ''),
+        'overall_score': result['scores']['overall'],
+        'word_accuracy': result['scores']['word_accuracy'],
+        'phoneme_accuracy': result['scores']['phoneme_accuracy'],
+        'completeness_score': result['scores']['completeness']
+    }
+
+    comparison = result.get('phoneme_comparison')
+    if comparison is not None:
+        details = [(target, spoken, False) for target, spoken, _ in comparison.mistakes()]
+    else:
+        details = [(issue.get('target_phoneme', ''), issue.get('spoken_phoneme', ''), False)
+                   for issue in result['feedback']['phoneme_issues']]
+
+    if os.environ.get("PRACTICE_WRITE_BEHIND") == "1":
+        return get_write_queue(app).submit(session_fields, details)
 
     with app.app_context():
         try:
-            user = db.session.get(User, user_id)
-            if not user:
-                print(f"Warning: Could not find user with ID {user_id}")
-                return False
-
-            practice_session = PracticeSession(
-                user_id=user.id,
-                target_phrase=phrase,
-                spoken_phrase=result.get('transcript', ''),
-                overall_score=result['scores']['overall'],
-                word_accuracy=result['scores']['word_accuracy'],
-                phoneme_accuracy=result['scores']['phoneme_accuracy'],
-                completeness_score=result['scores']['completeness']
-            )
-
-            db.session.add(practice_session)
-            db.session.flush()
-
-            if result['feedback']['phoneme_issues']:
-                for issue in result['feedback']['phoneme_issues']:
-                    phoneme_detail = PhonemeDetail(
-                        session_id=practice_session.id,
-                        target_phoneme=issue.get('target_phoneme', ''),
-                        spoken_phoneme=issue.get('spoken_phoneme', ''),
-                        is_correct=False
-                    )
-                    db.session.add(phoneme_detail)
-
-            db.session.commit()
-            return True
-        except Exception:
-            db.session.rollback()
-            return False
+            # The user_id foreign key rejects unknown users
+            save_session_bulk(session_fields, details)
+            return SAVED
+        except Exception as e:
+            print(f"Error saving practice session: {str(e)}")
+            return SAVE_FAILED
 
 
 def format_detailed_feedback(result):
@@ -115,6 +146,11 @@ def format_detailed_feedback(result):
                 safe_tip = ''.join(c for c in tip if ord(c) < 128)
                 feedback += f"* {safe_tip}\n"
 
+        practice_words = [word['word'] for word in result['feedback'].get('words', [])
+                          if word['status'] in ('missed', 'substituted')]
+        if practice_words:
+            feedback += "\nWords to Practice: " + ", ".join(practice_words) + "\n"
+
         if result['feedback']['phoneme_issues']:
             feedback += "\nSound Improvements:\n"
             for issue in result['feedback']['phoneme_issues']:
@@ -126,74 +162,163 @@ def format_detailed_feedback(result):
         return f"Error formatting feedback: {str(e)}"
 
 
+def analyze_and_save(phrase, audio_input, user_id):
+    """Job body: analyze the recording, save the session and format the feedback."""
+    return feedback_and_save(phrase, analyze_pronunciation(phrase, audio_input), user_id)
+
+
+def feedback_and_save(phrase, result, user_id):
+    """Format an analysis result and save it as a practice session."""
+    if not result['success']:
+        return "Error analyzing pronunciation. Please try again."
+
+    feedback = format_detailed_feedback(result)
+
+    # Save to database if we have a user_id
+    if user_id:
+        result['target_phrase'] = phrase
+        status = save_practice_session(phrase, result, user_id)
+        if status == SAVED:
+            feedback += "\n\nPractice session saved successfully!"
+        elif status == SAVE_QUEUED:
+            feedback += "\n\nPractice session queued for saving."
+        else:
+            feedback += "\n\nWarning: Failed to save practice session."
+    else:
+        feedback += "\n\nNote: Practice session not saved (not logged in)."
+
+    return feedback
+
+
 def process_audio(phrase, audio, user_id):
-    """Process the recorded audio and provide feedback."""
+    """
+    Process the recorded audio and provide feedback.
+    The analysis runs on the shared job queue; this yields its progress.
+    """
     global app
 
     if not phrase:
-        return "Please select or enter a phrase first."
+        yield "Please select or enter a phrase first."
+        return
     if audio is None:
-        return "Please record your audio."
+        yield "Please record your audio."
+        return
 
     # If no user_id provided, try to get the default user
     if user_id is None and app:
         with app.app_context():
             user_id = get_default_user()
 
-    import os
-    import wave
-    import tempfile
-
-    # Handle tuple of (sample_rate, numpy_array)
+    # Microphone input arrives as (sample_rate, numpy_array) and is analyzed in memory
     if isinstance(audio, tuple) and len(audio) == 2:
-        sample_rate, audio_data = audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            temp_path = temp_file.name
-            with wave.open(temp_path, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(sample_rate)
-                wav_file.writeframes(audio_data.tobytes())
-        audio_path = temp_path
+        audio_input = audio
     else:
         if isinstance(audio, str):
-            audio_path = audio
+            audio_input = audio
         elif isinstance(audio, dict) and ('path' in audio or 'name' in audio):
-            audio_path = audio.get('path') or audio.get('name')
+            audio_input = audio.get('path') or audio.get('name')
         else:
-            return "Error: Unsupported audio format"
+            yield "Error: Unsupported audio format"
+            return
 
-    if not audio_path or not os.path.exists(audio_path):
-        return "Error: Audio file path is invalid or does not exist"
+        if not audio_input or not os.path.exists(audio_input):
+            yield "Error: Audio file path is invalid or does not exist"
+            return
 
+    job_queue = get_job_queue()
     try:
-        result = analyze_pronunciation(phrase, audio_path)
+        job = job_queue.submit(analyze_and_save, phrase, audio_input, user_id, owner=user_id)
+    except QueueFull:
+        yield "The server is busy analyzing other recordings. Please try again in a moment."
+        return
+
+    for state in job.watch(timeout=1.0):
+        if job.status == QUEUED:
+            yield f"Waiting to be analyzed ({job_queue.position(job)} ahead of you)..."
+        elif job.status == RUNNING:
+            yield "Analyzing your pronunciation..."
+        elif job.status == FAILED:
+            yield f"Error during analysis: {job.error}"
+        else:
+            yield job.result
 
-        if audio_path.endswith('.wav') and tempfile.gettempdir() in audio_path:
-            try:
-                os.remove(audio_path)
-            except:
-                pass
-
-        if not result['success']:
-            return "Error analyzing pronunciation. Please try again."
-
-        feedback = format_detailed_feedback(result)
-
-        # Save to database if we have a user_id
-        if user_id:
-            result['target_phrase'] = phrase
-            if save_practice_session(phrase, result, user_id):
-                feedback += "\n\nPractice session saved successfully!"
-            else:
-                feedback += "\n\nWarning: Failed to save practice session."
+
+def format_partial_feedback(partial):
+    """Format StreamingScorer.partial() for the live feedback box."""
+    if not partial['transcript']:
+        return "Listening..."
+    feedback = f"Heard so far: {partial['transcript']}\n"
+    feedback += f"* Phrase covered: {partial['progress']:.0f}%\n"
+    feedback += f"* Word Accuracy: {partial['word_accuracy']:.1f}%\n"
+    feedback += f"* Phoneme Accuracy: {partial['phoneme_accuracy']:.1f}%\n"
+    issues = partial['phoneme_issues'][:3]
+    if issues:
+        feedback += "Watch out for: " + ", ".join(
+            f"'{issue['target_phoneme'] or issue['spoken_phoneme']}'" for issue in issues)
+    return feedback
+
+
+def stream_audio_chunk(phrase, chunk, scorer):
+    """
+    Feed one streamed microphone chunk to the phrase's StreamingScorer.
+    Transcription runs on the shared job queue, like every other analysis:
+    this only buffers the chunk, starts a refresh when one is due and none
+    is running, and shows the result of the last finished refresh. When the
+    queue is full the refresh is skipped; the audio is kept for the next one.
+    Returns:
+        tuple: (live feedback text or gr.update(), scorer to keep in session state)
+    """
+    if not phrase:
+        return "Please select or enter a phrase first.", None
+    if chunk is None:
+        return gr.update(), scorer
+    if scorer is None or scorer.target_text != phrase:
+        scorer = StreamingScorer(phrase)
+    try:
+        due = scorer.append(chunk)
+    except Exception as e:
+        return f"Error during live analysis: {str(e)}", scorer
+
+    feedback = gr.update()
+    job = scorer.refresh_job
+    if job is not None and job.finished:
+        scorer.refresh_job = None
+        if job.status == FAILED:
+            feedback = f"Error during live analysis: {job.error}"
         else:
-            feedback += "\n\nNote: Practice session not saved (not logged in)."
+            feedback = format_partial_feedback(job.result)
+    if due and scorer.refresh_job is None:
+        try:
+            scorer.refresh_job = get_job_queue().submit(scorer.refresh)
+        except QueueFull:
+            metrics.counter("streaming_refreshes_skipped").inc()
+    return feedback, scorer
 
-        return feedback
 
+def finish_stream(scorer, user_id):
+    """Score the finished live recording and save it like a submitted one."""
+    global app
+
+    if scorer is None:
+        return "Please record your audio.", None
+    if user_id is None and app:
+        with app.app_context():
+            user_id = get_default_user()
+    # Refreshes change the scorer's state: let the last one finish first
+    if scorer.refresh_job is not None:
+        scorer.refresh_job.wait()
+        scorer.refresh_job = None
+    try:
+        job = get_job_queue().submit(scorer.finish)
+    except QueueFull:
+        return "The server is busy analyzing other recordings. Please try again in a moment.", None
+    job.wait()
+    if job.status == FAILED:
+        return f"Error during analysis: {job.error}", None
+    try:
+        return feedback_and_save(scorer.target_text, job.result, user_id), None
     except Exception as e:
-        return f"Error during analysis: {str(e)}"
+        return f"Error during analysis: {str(e)}", None
 
 
 def create_interface(user_id):
@@ -219,13 +344,19 @@ def create_interface(user_id):
             )
 
         play_btn = gr.Button("Play Phrase")
-        audio_player = gr.Audio(label="Phrase Audio")
+        audio_player = gr.Audio(label="Phrase Audio", streaming=True, autoplay=True)
         play_output = gr.Textbox(label="Status", interactive=False)
 
         gr.Markdown("### Record Your Pronunciation")
         audio_recorder = gr.Audio(sources="microphone", label="Record here")
 
         submit_btn = gr.Button("Analyze Pronunciation")
+
+        gr.Markdown("### Or Get Live Feedback While You Speak")
+        live_recorder = gr.Audio(sources="microphone", streaming=True, label="Live practice")
+        live_output = gr.Textbox(label="Live Feedback", lines=5, interactive=False)
+        scorer_state = gr.State(None)
+
         result_output = gr.Textbox(label="Feedback", lines=10)
 
         def get_active_phrase(custom_phrase, dropdown_phrase):
@@ -240,17 +371,37 @@ def create_interface(user_id):
                 return gr.update(value=dropdown_value)
             return gr.update()
 
+        def on_play(custom_phrase, dropdown_phrase):
+            yield from stream_phrase(get_active_phrase(custom_phrase, dropdown_phrase))
+
+        def on_submit(custom_phrase, dropdown_phrase, audio):
+            yield from process_audio(get_active_phrase(custom_phrase, dropdown_phrase), audio, user_id)
+
+        def on_live_chunk(custom_phrase, dropdown_phrase, chunk, scorer):
+            return stream_audio_chunk(get_active_phrase(custom_phrase, dropdown_phrase), chunk, scorer)
+
+        def on_live_stop(scorer):
+            return finish_stream(scorer, user_id)
+
         phrase_dropdown.change(on_dropdown_select, inputs=[phrase_dropdown], outputs=[phrase_input])
         play_btn.click(
-            lambda x, y: play_phrase(get_active_phrase(x, y)),
+            on_play,
             inputs=[phrase_input, phrase_dropdown],
             outputs=[audio_player, play_output]
         )
         submit_btn.click(
-            lambda x, y, z: process_audio(get_active_phrase(x, y), z, user_id),
+            on_submit,
             inputs=[phrase_input, phrase_dropdown, audio_recorder],
             outputs=result_output
         )
+        live_recorder.start_recording(lambda: (None, "Listening..."), outputs=[scorer_state, live_output])
+        live_recorder.stream(
+            on_live_chunk,
+            inputs=[phrase_input, phrase_dropdown, live_recorder, scorer_state],
+            outputs=[live_output, scorer_state],
+            stream_every=0.5
+        )
+        live_recorder.stop_recording(on_live_stop, inputs=[scorer_state], outputs=[result_output, scorer_state])
 
     return interface
 
@@ -264,6 +415,8 @@ def get_gradio_app(flask_app=None, current_user=None):
     global app
     app = flask_app
 
+    warm_phrase_cache()
+
     user_id = None
     if flask_app:
         with flask_app.app_context():
@@ -286,6 +439,10 @@ def launch_server(flask_app=None, current_user=None):
             with app.app_context():
                 user_id = current_user.id if current_user and getattr(current_user, "is_authenticated", False) else get_default_user()
 
+        if os.environ.get("ASR_PREWARM", "1") == "1" and not os.environ.get("ASR_INFERENCE_ADDRESS"):
+            start_prewarm_thread()
+        warm_phrase_cache()
+
         interface = create_interface(user_id)
         interface.launch(
             server_name="0.0.0.0",
@@ -0,0 +1,86 @@
+"""
+Gunicorn settings for app.py.
+
+With GUNICORN_PRELOAD=1 (the default) the app is imported once in the
+master, which also loads the ASR models and the G2P tables before any
+worker is forked. The model weights are moved to shared memory and the
+garbage collector is frozen before each fork, so the workers share one
+copy of everything loaded here instead of each loading its own. Each
+worker then warms the model up in a background thread after the fork
+(loading it first without preloading), unless ASR_PREWARM=0.
+
+Several workers need the shared job store (utils/jobs.py) so that any of
+them can answer for a job; without a database for it there is one worker.
+Each worker writes its metrics to METRICS_DIR (a temporary directory
+unless set), which /metrics adds up across the workers.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+- WEB_CONCURRENCY: worker processes (default 2, or 1 without JOB_STORE_URL/DATABASE_URL or with JOB_STORE=0)
+- GUNICORN_THREADS: threads per worker (default 2)
+- GUNICORN_PRELOAD: set to 0 to import the app and load the models in every worker
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+_shared_jobs = (os.environ.get("JOB_STORE", "1") == "1"
+                and bool(os.environ.get("JOB_STORE_URL") or os.environ.get("DATABASE_URL")))
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 if _shared_jobs else 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+timeout = 120
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Loaded by the master below; importing the app starts no threads, so
+# nothing is holding locks at fork
+_load_models = (preload_app and os.environ.get("ASR_PREWARM", "1") == "1"
+                and not os.environ.get("ASR_INFERENCE_ADDRESS"))
+
+# Inherited by the workers; removed at exit only if created here
+_own_metrics_dir = workers > 1 and not os.environ.get("METRICS_DIR")
+if _own_metrics_dir:
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="pronunciation-metrics-")
+
+
+def when_ready(server):
+    if not _load_models:
+        return
+    from utils.asr_models import preload_for_fork
+    from utils.g2p import get_g2p
+
+    for stats in preload_for_fork():
+        server.log.info("Preloaded ASR model %s (%.0f MB) in %.1fs", stats['name'],
+                        stats['memory_bytes'] / (1024 * 1024), stats['load_seconds'])
+    try:
+        get_g2p().prewarm()
+    except Exception as e:
+        server.log.warning("Error preloading G2P: %s", e)
+
+
+def pre_fork(server, worker):
+    # Objects that exist now are never collected, so the GC never writes
+    # to (and thereby copies) the pages they live on in the worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import start_asr_prewarm
+    start_asr_prewarm()
+    if os.environ.get("METRICS_DIR"):
+        from utils import metrics
+        # Values inherited from the master would be counted once per worker
+        metrics.reset()
+        metrics.start_exporter(os.environ["METRICS_DIR"])
+
+
+def child_exit(server, worker):
+    if os.environ.get("METRICS_DIR"):
+        from utils.metrics import remove_snapshot
+        remove_snapshot(os.environ["METRICS_DIR"], worker.pid)
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
@@ -0,0 +1,61 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 22:46:45.188824
+
+The schema of models.models as it stood before the progress aggregate
+tables and the indexes were added: what db.create_all() built until then.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=128), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('practice_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('target_phrase', sa.Text(), nullable=False),
+    sa.Column('spoken_phrase', sa.Text(), nullable=True),
+    sa.Column('overall_score', sa.Float(), nullable=True),
+    sa.Column('word_accuracy', sa.Float(), nullable=True),
+    sa.Column('phoneme_accuracy', sa.Float(), nullable=True),
+    sa.Column('completeness_score', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('phoneme_details',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('target_phoneme', sa.String(length=10), nullable=True),
+    sa.Column('spoken_phoneme', sa.String(length=10), nullable=True),
+    sa.Column('is_correct', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['practice_sessions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('phoneme_details')
+    op.drop_table('practice_sessions')
+    op.drop_table('users')
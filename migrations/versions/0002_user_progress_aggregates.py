@@ -0,0 +1,70 @@
+"""user progress aggregates
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 22:46:48.730215
+
+Per-user aggregate tables kept up to date by every session write, so the
+progress page reads one row per user instead of scanning the history.
+Fill them for existing sessions with backfill_progress.py.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_phoneme_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('target_phoneme', sa.String(length=10), nullable=False),
+    sa.Column('error_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'target_phoneme', name='uq_user_phoneme_stats_user_phoneme')
+    )
+    with op.batch_alter_table('user_phoneme_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_user_phoneme_stats_user_errors', ['user_id', 'error_count'], unique=False)
+
+    op.create_table('user_phrase_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('target_phrase', sa.Text(), nullable=False),
+    sa.Column('practice_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'target_phrase', name='uq_user_phrase_stats_user_phrase')
+    )
+    with op.batch_alter_table('user_phrase_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_user_phrase_stats_user_count', ['user_id', 'practice_count'], unique=False)
+
+    op.create_table('user_progress',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_sessions', sa.Integer(), nullable=False),
+    sa.Column('overall_score_sum', sa.Float(), nullable=False),
+    sa.Column('word_accuracy_sum', sa.Float(), nullable=False),
+    sa.Column('phoneme_accuracy_sum', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_progress')
+    with op.batch_alter_table('user_phrase_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_phrase_stats_user_count')
+
+    op.drop_table('user_phrase_stats')
+    with op.batch_alter_table('user_phoneme_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_phoneme_stats_user_errors')
+
+    op.drop_table('user_phoneme_stats')
@@ -0,0 +1,46 @@
+"""practice session indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 22:46:52.501114
+
+Indexes for the practice history access paths: a user's sessions newest
+first, per-user grouping by phrase, and the phoneme details of a session.
+On PostgreSQL the indexes are built CONCURRENTLY so existing tables stay
+writable during the upgrade.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def _create_indexes():
+    op.create_index('ix_practice_sessions_user_created', 'practice_sessions',
+                    ['user_id', sa.literal_column('created_at DESC')],
+                    postgresql_concurrently=True)
+    op.create_index('ix_practice_sessions_user_phrase', 'practice_sessions',
+                    ['user_id', 'target_phrase'], postgresql_concurrently=True)
+    op.create_index('ix_phoneme_details_session_id', 'phoneme_details',
+                    ['session_id'], postgresql_concurrently=True)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            _create_indexes()
+    else:
+        _create_indexes()
+
+
+def downgrade():
+    op.drop_index('ix_phoneme_details_session_id', table_name='phoneme_details')
+    op.drop_index('ix_practice_sessions_user_phrase', table_name='practice_sessions')
+    op.drop_index('ix_practice_sessions_user_created', table_name='practice_sessions')
@@ -0,0 +1,44 @@
+"""analysis jobs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 23:31:07.412958
+
+The state of queued analysis jobs (utils/jobs.py), so every web worker can
+answer for a job that another worker runs.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('owner', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.Float(), nullable=False),
+    sa.Column('started_at', sa.Float(), nullable=True),
+    sa.Column('finished_at', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_jobs_finished_at', ['finished_at'], unique=False)
+        batch_op.create_index('ix_analysis_jobs_status_created', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_analysis_jobs_status_created')
+        batch_op.drop_index('ix_analysis_jobs_finished_at')
+
+    op.drop_table('analysis_jobs')
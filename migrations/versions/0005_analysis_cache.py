@@ -0,0 +1,41 @@
+"""analysis cache
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 23:58:42.107316
+
+The shared tier of the analysis result cache (utils/result_cache.py).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_cache',
+    sa.Column('namespace', sa.String(length=16), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.Float(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('namespace', 'key')
+    )
+    with op.batch_alter_table('analysis_cache', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_cache_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_analysis_cache_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_cache', schema=None) as batch_op:
+        batch_op.drop_index('ix_analysis_cache_expires_at')
+        batch_op.drop_index('ix_analysis_cache_created_at')
+
+    op.drop_table('analysis_cache')
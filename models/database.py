@@ -11,6 +11,7 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from models.models import db
+from models.engine import init_app_db
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +25,7 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
     
     # Initialize extensions
-    db.init_app(app)
+    init_app_db(app, db)
     migrate = Migrate(app, db)
     
     return app
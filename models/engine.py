@@ -0,0 +1,154 @@
+"""
+Central SQLAlchemy engine configuration.
+
+Every entry point builds its engine from engine_options(), so pool sizing,
+recycling and pre-ping are set in one place from the environment:
+
+- DB_POOL_SIZE: connections kept open per process (default 5)
+- DB_MAX_OVERFLOW: extra connections allowed under load (default 10)
+- DB_POOL_TIMEOUT: seconds to wait for a free connection (default 30)
+- DB_POOL_RECYCLE: seconds after which a connection is replaced (default 1800)
+- DB_POOL_PRE_PING: set to 0 to skip the liveness check on checkout
+
+Pool events feed the db_pool_* metrics: connections opened, checkouts,
+checkins, invalidations, the number currently checked out and how long
+each one was held. On QueuePool engines the time each checkout took,
+waiting for a free connection included, goes to the
+db_pool_checkout_wait_seconds histogram. Engines are disposed in forked
+children so gunicorn workers never share sockets with the master.
+"""
+import os
+import time
+import weakref
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from utils import metrics
+
+_engines = weakref.WeakSet()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times connect(), its public checkout method. The time
+    covers waiting for a free connection and, when the pool has to open
+    one, connecting and the pre-ping.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            metrics.counter("db_pool_timeouts").inc()
+            raise
+        finally:
+            metrics.histogram("db_pool_checkout_wait_seconds").observe(time.perf_counter() - start)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    metrics.counter("db_pool_connects").inc()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+    metrics.counter("db_pool_checkouts").inc()
+    metrics.gauge("db_pool_checked_out").inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop('checked_out_at', None)
+    if checked_out_at is not None:
+        metrics.gauge("db_pool_checked_out").dec()
+        metrics.histogram("db_pool_checkout_held_seconds").observe(time.perf_counter() - checked_out_at)
+
+
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    metrics.counter("db_pool_invalidations").inc()
+
+
+_POOL_EVENTS = {'connect': _on_connect, 'checkout': _on_checkout,
+                'checkin': _on_checkin, 'invalidate': _on_invalidate}
+
+
+def instrument_pool(engine):
+    """Listen to engine's pool events; they carry over to pools recreated by dispose()."""
+    for name, listener in _POOL_EVENTS.items():
+        if not event.contains(engine.pool, name, listener):
+            event.listen(engine.pool, name, listener)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(url):
+    """
+    Engine keyword arguments for url, read from the DB_POOL_* variables.
+    SQLite keeps SQLAlchemy's own pool, which suits a file or memory database.
+    """
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1'}
+    if url and make_url(url).get_backend_name() != 'sqlite':
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        })
+    return options
+
+
+def register_engine(engine):
+    """Instrument engine's pool and dispose engine in every process forked from this one."""
+    instrument_pool(engine)
+    _engines.add(engine)
+    return engine
+
+
+def create_engine(url, **kwargs):
+    """Create a standalone engine with the configured pool settings."""
+    return register_engine(sqlalchemy.create_engine(url, **{**engine_options(url), **kwargs}))
+
+
+def init_app_db(flask_app, db):
+    """
+    Attach a Flask-SQLAlchemy instance to flask_app with the configured
+    engine options (unless the app already sets SQLALCHEMY_ENGINE_OPTIONS).
+    """
+    flask_app.config.setdefault(
+        'SQLALCHEMY_ENGINE_OPTIONS', engine_options(flask_app.config.get('SQLALCHEMY_DATABASE_URI'))
+    )
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        for engine in db.engines.values():
+            register_engine(engine)
+
+
+def pool_stats():
+    """Checkout counts of every registered engine's pool plus the wait histogram."""
+    pools = {}
+    for engine in list(_engines):
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            pools[engine.url.render_as_string(hide_password=True)] = {
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'idle': pool.checkedin()
+            }
+    return {'pools': pools, **metrics.snapshot('db_pool_')}
+
+
+def _dispose_in_child():
+    # close=False: the parent still owns those sockets; just drop them here
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_in_child)
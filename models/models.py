@@ -35,6 +35,13 @@ class PracticeSession(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     phoneme_details = db.relationship('PhonemeDetail', backref='practice_session', lazy=True)
 
+    __table_args__ = (
+        # A user's history, newest first (progress page, history paging)
+        db.Index('ix_practice_sessions_user_created', user_id, created_at.desc()),
+        # Per-user grouping by phrase (progress backfill)
+        db.Index('ix_practice_sessions_user_phrase', user_id, target_phrase),
+    )
+
     def __init__(self, user_id, target_phrase, spoken_phrase=None, overall_score=None,
                  word_accuracy=None, phoneme_accuracy=None, completeness_score=None):
         self.user_id = user_id
@@ -55,8 +62,70 @@ class PhonemeDetail(db.Model):
     is_correct = db.Column(db.Boolean)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_phoneme_details_session_id', session_id),
+    )
+
     def __init__(self, session_id, target_phoneme=None, spoken_phoneme=None, is_correct=False):
         self.session_id = session_id
         self.target_phoneme = target_phoneme
         self.spoken_phoneme = spoken_phoneme
-        self.is_correct = is_correct
\ No newline at end of file
+        self.is_correct = is_correct
+
+
+class UserProgress(db.Model):
+    """Running totals of a user's practice sessions, updated on every save."""
+    __tablename__ = 'user_progress'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_sessions = db.Column(db.Integer, nullable=False, default=0)
+    overall_score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    word_accuracy_sum = db.Column(db.Float, nullable=False, default=0.0)
+    phoneme_accuracy_sum = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def _mean(self, total):
+        return total / self.total_sessions if self.total_sessions else 0.0
+
+    @property
+    def avg_overall_score(self):
+        return self._mean(self.overall_score_sum)
+
+    @property
+    def avg_word_accuracy(self):
+        return self._mean(self.word_accuracy_sum)
+
+    @property
+    def avg_phoneme_accuracy(self):
+        return self._mean(self.phoneme_accuracy_sum)
+
+class UserPhraseStats(db.Model):
+    """How often a user practiced a phrase and their score total for it."""
+    __tablename__ = 'user_phrase_stats'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'target_phrase', name='uq_user_phrase_stats_user_phrase'),
+        db.Index('ix_user_phrase_stats_user_count', 'user_id', 'practice_count'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    target_phrase = db.Column(db.Text, nullable=False)
+    practice_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    @property
+    def avg_score(self):
+        return self.score_sum / self.practice_count if self.practice_count else 0.0
+
+class UserPhonemeStats(db.Model):
+    """How many times a user mispronounced a target phoneme."""
+    __tablename__ = 'user_phoneme_stats'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'target_phoneme', name='uq_user_phoneme_stats_user_phoneme'),
+        db.Index('ix_user_phoneme_stats_user_errors', 'user_id', 'error_count'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    target_phoneme = db.Column(db.String(10), nullable=False)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
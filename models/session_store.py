@@ -0,0 +1,298 @@
+"""
+Bulk persistence for practice sessions and their phoneme details.
+
+A session is written with one INSERT ... RETURNING id and its details
+with one multi-row INSERT, instead of one ORM flush per row. The per-user
+progress aggregates are upserted in the same transaction, so the progress
+page never has to scan a user's history. Writes can also go through a
+background write-behind queue.
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models.models import (db, PracticeSession, PhonemeDetail, UserProgress,
+                           UserPhraseStats, UserPhonemeStats)
+from utils import metrics
+
+# Outcomes of SessionWriteQueue.submit()
+SAVED = 'saved'
+QUEUED = 'queued'
+FAILED = 'failed'
+
+_UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def _upsert(table, keys, rows, increments):
+    """
+    Insert rows, or add their increment columns onto the rows already stored
+    under the same keys. Other columns are overwritten.
+    """
+    if not rows:
+        return
+    dialect = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(table)
+        set_ = {
+            column: table.c[column] + stmt.excluded[column] if column in increments else stmt.excluded[column]
+            for column in rows[0] if column not in keys
+        }
+        db.session.execute(stmt.on_conflict_do_update(index_elements=keys, set_=set_), rows)
+        return
+
+    # No native upsert: update first, insert when nothing matched
+    for row in rows:
+        values = {
+            column: table.c[column] + row[column] if column in increments else row[column]
+            for column in row if column not in keys
+        }
+        result = db.session.execute(
+            update(table).where(and_(*(table.c[key] == row[key] for key in keys))).values(values)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+
+def update_progress(session_fields, details, now=None):
+    """
+    Fold one practice session into its user's aggregate tables.
+    Runs in the caller's transaction.
+    Args:
+        session_fields (dict): PracticeSession column values
+        details (list): (target_phoneme, spoken_phoneme, is_correct) tuples
+    """
+    now = now or datetime.utcnow()
+    user_id = session_fields['user_id']
+    overall = session_fields.get('overall_score') or 0.0
+
+    _upsert(UserProgress.__table__, ['user_id'], [{
+        'user_id': user_id,
+        'total_sessions': 1,
+        'overall_score_sum': overall,
+        'word_accuracy_sum': session_fields.get('word_accuracy') or 0.0,
+        'phoneme_accuracy_sum': session_fields.get('phoneme_accuracy') or 0.0,
+        'updated_at': now
+    }], increments={'total_sessions', 'overall_score_sum', 'word_accuracy_sum', 'phoneme_accuracy_sum'})
+
+    _upsert(UserPhraseStats.__table__, ['user_id', 'target_phrase'], [{
+        'user_id': user_id,
+        'target_phrase': session_fields['target_phrase'],
+        'practice_count': 1,
+        'score_sum': overall
+    }], increments={'practice_count', 'score_sum'})
+
+    errors = Counter(target for target, _, is_correct in details if target and not is_correct)
+    _upsert(UserPhonemeStats.__table__, ['user_id', 'target_phoneme'], [
+        {'user_id': user_id, 'target_phoneme': phoneme, 'error_count': count}
+        for phoneme, count in sorted(errors.items())
+    ], increments={'error_count'})
+
+
+def rebuild_progress(user_id=None):
+    """
+    Recompute the aggregate tables from practice_sessions and
+    phoneme_details, for one user or for everybody.
+    Must run inside an application context.
+    Returns:
+        int: Number of users whose progress was rebuilt
+    """
+    sessions = PracticeSession.__table__
+    details = PhonemeDetail.__table__
+    tables = [UserProgress.__table__, UserPhraseStats.__table__, UserPhonemeStats.__table__]
+
+    def scoped(query, column):
+        return query if user_id is None else query.where(column == user_id)
+
+    try:
+        for table in tables:
+            db.session.execute(scoped(delete(table), table.c.user_id))
+
+        db.session.execute(insert(UserProgress.__table__).from_select(
+            ['user_id', 'total_sessions', 'overall_score_sum', 'word_accuracy_sum',
+             'phoneme_accuracy_sum', 'updated_at'],
+            scoped(select(
+                sessions.c.user_id,
+                func.count(sessions.c.id),
+                func.coalesce(func.sum(sessions.c.overall_score), 0.0),
+                func.coalesce(func.sum(sessions.c.word_accuracy), 0.0),
+                func.coalesce(func.sum(sessions.c.phoneme_accuracy), 0.0),
+                literal(datetime.utcnow())
+            ), sessions.c.user_id).group_by(sessions.c.user_id)
+        ))
+
+        db.session.execute(insert(UserPhraseStats.__table__).from_select(
+            ['user_id', 'target_phrase', 'practice_count', 'score_sum'],
+            scoped(select(
+                sessions.c.user_id,
+                sessions.c.target_phrase,
+                func.count(sessions.c.id),
+                func.coalesce(func.sum(sessions.c.overall_score), 0.0)
+            ), sessions.c.user_id).group_by(sessions.c.user_id, sessions.c.target_phrase)
+        ))
+
+        db.session.execute(insert(UserPhonemeStats.__table__).from_select(
+            ['user_id', 'target_phoneme', 'error_count'],
+            scoped(select(
+                sessions.c.user_id,
+                details.c.target_phoneme,
+                func.count(details.c.id)
+            ).select_from(details.join(sessions, details.c.session_id == sessions.c.id))
+             .where(details.c.is_correct == False)  # noqa: E712
+             .where(details.c.target_phoneme != ''), sessions.c.user_id)
+            .group_by(sessions.c.user_id, details.c.target_phoneme)
+        ))
+
+        rebuilt = db.session.execute(
+            scoped(select(func.count()).select_from(UserProgress.__table__), UserProgress.__table__.c.user_id)
+        ).scalar_one()
+        db.session.commit()
+        return rebuilt
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def save_session_bulk(session_fields, details):
+    """
+    Insert a practice session and its phoneme details.
+    Must run inside an application context.
+    Args:
+        session_fields (dict): PracticeSession column values
+        details (list): (target_phoneme, spoken_phoneme, is_correct) tuples
+    Returns:
+        int: The new session id
+    """
+    now = datetime.utcnow()
+    session_table = PracticeSession.__table__
+    detail_table = PhonemeDetail.__table__
+    try:
+        session_id = db.session.execute(
+            insert(session_table).values(created_at=now, **session_fields).returning(session_table.c.id)
+        ).scalar_one()
+        if details:
+            # executemany; SQLAlchemy batches these into multi-row VALUES on Postgres
+            db.session.execute(insert(detail_table), [
+                {
+                    'session_id': session_id,
+                    'target_phoneme': target,
+                    'spoken_phoneme': spoken,
+                    'is_correct': is_correct,
+                    'created_at': now
+                }
+                for target, spoken, is_correct in details
+            ])
+        update_progress(session_fields, details, now)
+        db.session.commit()
+        return session_id
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+class SessionWriteQueue:
+    """
+    Write-behind queue: sessions are saved by a background thread so the
+    caller does not wait on the database. When the queue is full, writes
+    fall back to being synchronous. A failed write is retried with
+    exponential backoff (1 s, 2 s, 4 s by default) unless the database
+    rejected the row itself; writes that still fail are logged through
+    the app logger and counted under session_writes_failed.
+    """
+
+    def __init__(self, flask_app, maxsize=1000, retries=3, backoff=1.0):
+        self.app = flask_app
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.retries = retries
+        self.backoff = backoff
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self._thread = threading.Thread(target=self._run, name="session-writer")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _write(self, session_fields, details):
+        with self.app.app_context():
+            save_session_bulk(session_fields, details)
+
+    def _write_with_retries(self, session_fields, details):
+        for attempt in range(self.retries + 1):
+            try:
+                self._write(session_fields, details)
+                return
+            except IntegrityError:
+                # e.g. an unknown user: retrying cannot help
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                metrics.counter("session_writes_retried").inc()
+                self.app.logger.warning("Retrying practice session write for user %s: %s",
+                                        session_fields.get('user_id'), e)
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _run(self):
+        while True:
+            session_fields, details = self.queue.get()
+            try:
+                self._write_with_retries(session_fields, details)
+                self.written += 1
+                metrics.counter("session_writes_written").inc()
+            except Exception as e:
+                self.failed += 1
+                metrics.counter("session_writes_failed").inc()
+                self.app.logger.error("Dropped practice session of user %s ('%s'): %s",
+                                      session_fields.get('user_id'), session_fields.get('target_phrase'), e)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, session_fields, details):
+        """
+        Queue a session for writing.
+        Returns:
+            str: QUEUED if it will be written in the background, SAVED if the
+                 queue was full and it was written right away, FAILED if that
+                 synchronous write failed
+        """
+        try:
+            self.queue.put_nowait((session_fields, details))
+            return QUEUED
+        except queue.Full:
+            try:
+                self._write(session_fields, details)
+                return SAVED
+            except Exception as e:
+                metrics.counter("session_writes_failed").inc()
+                self.app.logger.error("Error writing practice session: %s", e)
+                return FAILED
+
+    def flush(self):
+        """Block until every queued session has been written."""
+        self.queue.join()
+
+    def stats(self):
+        return {'pending': self.queue.qsize(), 'written': self.written,
+                'failed': self.failed, 'retried': self.retried}
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue(flask_app):
+    """Get the process-wide write-behind queue for flask_app."""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = SessionWriteQueue(flask_app)
+    return _write_queue
@@ -1,99 +1,178 @@
-from flask import Blueprint, render_template
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from models.models import PracticeSession, PhonemeDetail
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_
+from models.models import db, PracticeSession, UserProgress, UserPhraseStats, UserPhonemeStats
 
 bp = Blueprint('routes', __name__)
 
+RECENT_SESSIONS = 10
+TOP_ITEMS = 5
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+DEFAULT_SERIES_DAYS = 90
+MAX_SERIES_BUCKETS = 1000
+BUCKET_DAYS = {'day': 1, 'week': 7}
+
+def session_to_dict(session):
+    return {
+        'id': session.id,
+        'created_at': session.created_at.isoformat() if session.created_at else None,
+        'target_phrase': session.target_phrase,
+        'overall_score': float(session.overall_score) if session.overall_score else 0,
+        'word_accuracy': float(session.word_accuracy) if session.word_accuracy else 0,
+        'phoneme_accuracy': float(session.phoneme_accuracy) if session.phoneme_accuracy else 0
+    }
+
+def encode_cursor(session):
+    return f"{session.created_at.isoformat()}_{session.id}"
+
+def decode_cursor(cursor):
+    """Split a '<created_at ISO>_<id>' cursor; raises ValueError when malformed."""
+    created_at, _, session_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(session_id)
+
+def bucket_start(column, bucket):
+    """SQL expression truncating column to the start of its day or (Monday) week."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return func.date_trunc(bucket, column)
+    if dialect == 'sqlite':
+        if bucket == 'week':
+            return func.date(column, '-6 days', 'weekday 1')
+        return func.date(column)
+    return func.date(column) if bucket == 'day' else None
+
 @bp.route('/progress')
 @login_required
 def progress():
-    print(f"Fetching progress for user {current_user.id}")
-    print(f"User authenticated: {current_user.is_authenticated}")
-    
+    # Everything here reads the per-user aggregate tables or a bounded
+    # number of rows, so the page costs the same however long the history is.
     try:
-        # Get user's practice sessions
-        practice_sessions = PracticeSession.query.filter_by(user_id=current_user.id).order_by(
-            PracticeSession.created_at.desc()
-        ).all()
-        
-        # Convert sessions to JSON-serializable format, but keep created_at as datetime
-        sessions_data = []
-        for session in practice_sessions:
-            sessions_data.append({
-                'created_at': session.created_at,  # Pass as datetime object
-                'target_phrase': session.target_phrase,
-                'overall_score': float(session.overall_score) if session.overall_score else 0,
-                'word_accuracy': float(session.word_accuracy) if session.word_accuracy else 0,
-                'phoneme_accuracy': float(session.phoneme_accuracy) if session.phoneme_accuracy else 0
-            })
-        practice_sessions = sessions_data
-        print(f"Found {len(practice_sessions)} practice sessions")
-        
-        # Print details of each session (using dictionary access)
-        for session in practice_sessions:
-            print(f"Session: Phrase='{session['target_phrase']}', Score={session['overall_score']}, Created={session['created_at']}")
-            
-        # Debug information about the save_practice_session function
-        print("\nChecking recent database activity:")
-        all_sessions = PracticeSession.query.order_by(PracticeSession.created_at.desc()).limit(5).all()
-        print(f"Last 5 practice sessions across all users:")
-        for session in all_sessions:
-            print(f"Session {session.id}: User={session.user_id}, Phrase='{session.target_phrase}', Score={session.overall_score}, Created={session.created_at}")
-            
-    except Exception as e:
-        print(f"Error fetching practice sessions: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        practice_sessions = []
-    
-    # Calculate overall stats
-    total_sessions = len(practice_sessions)
-    if total_sessions > 0:
-        avg_overall_score = sum(session['overall_score'] for session in practice_sessions) / total_sessions
-        avg_word_accuracy = sum(session['word_accuracy'] for session in practice_sessions) / total_sessions
-        avg_phoneme_accuracy = sum(session['phoneme_accuracy'] for session in practice_sessions) / total_sessions
-        
-        # Get most practiced phrases
+        recent = PracticeSession.query.filter_by(user_id=current_user.id).order_by(
+            PracticeSession.created_at.desc(), PracticeSession.id.desc()
+        ).limit(RECENT_SESSIONS + 1).all()
+        next_cursor = encode_cursor(recent[RECENT_SESSIONS - 1]) if len(recent) > RECENT_SESSIONS else None
+
+        # Keep created_at as a datetime for the template
+        practice_sessions = [dict(session_to_dict(session), created_at=session.created_at)
+                             for session in recent[:RECENT_SESSIONS]]
+
+        user_progress = db.session.get(UserProgress, current_user.id)
+
         most_practiced = (
-            PracticeSession.query.filter_by(user_id=current_user.id)
-            .with_entities(
-                PracticeSession.target_phrase,
-                func.count(PracticeSession.id).label('count'),
-                func.avg(PracticeSession.overall_score).label('avg_score')
-            )
-            .group_by(PracticeSession.target_phrase)
-            .order_by(func.count(PracticeSession.id).desc())
-            .limit(5)
+            UserPhraseStats.query.filter_by(user_id=current_user.id)
+            .order_by(UserPhraseStats.practice_count.desc())
+            .limit(TOP_ITEMS)
             .all()
         )
-        
-        # Get problematic phonemes
+
         problematic_phonemes = (
-            PhonemeDetail.query.join(PracticeSession)
-            .filter(PracticeSession.user_id == current_user.id)
-            .filter(PhonemeDetail.is_correct == False)
-            .with_entities(
-                PhonemeDetail.target_phoneme,
-                func.count(PhonemeDetail.id).label('error_count')
-            )
-            .group_by(PhonemeDetail.target_phoneme)
-            .order_by(func.count(PhonemeDetail.id).desc())
-            .limit(5)
+            UserPhonemeStats.query.filter_by(user_id=current_user.id)
+            .order_by(UserPhonemeStats.error_count.desc())
+            .limit(TOP_ITEMS)
             .all()
         )
-    else:
-        avg_overall_score = 0
-        avg_word_accuracy = 0
-        avg_phoneme_accuracy = 0
+    except Exception as e:
+        print(f"Error fetching progress: {str(e)}")
+        practice_sessions = []
+        next_cursor = None
+        user_progress = None
         most_practiced = []
         problematic_phonemes = []
-    
+
     return render_template('progress.html',
                          practice_sessions=practice_sessions,
-                         total_sessions=total_sessions,
-                         avg_overall_score=avg_overall_score,
-                         avg_word_accuracy=avg_word_accuracy,
-                         avg_phoneme_accuracy=avg_phoneme_accuracy,
+                         next_cursor=next_cursor,
+                         total_sessions=user_progress.total_sessions if user_progress else 0,
+                         avg_overall_score=user_progress.avg_overall_score if user_progress else 0,
+                         avg_word_accuracy=user_progress.avg_word_accuracy if user_progress else 0,
+                         avg_phoneme_accuracy=user_progress.avg_phoneme_accuracy if user_progress else 0,
                          most_practiced=most_practiced,
-                         problematic_phonemes=problematic_phonemes)
\ No newline at end of file
+                         problematic_phonemes=problematic_phonemes)
+
+@bp.route('/progress/history')
+@login_required
+def progress_history():
+    """
+    One page of the user's sessions, newest first.
+    Pages are keyed on (created_at, id) so each page is an index range scan,
+    however deep into the history it is.
+    Query args:
+        limit: Page size (default 50, at most 200)
+        cursor: next_cursor of the previous page
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    query = PracticeSession.query.filter(PracticeSession.user_id == current_user.id)
+    if after:
+        created_at, session_id = after
+        query = query.filter(or_(
+            PracticeSession.created_at < created_at,
+            and_(PracticeSession.created_at == created_at, PracticeSession.id < session_id)
+        ))
+    # One extra row tells whether there is another page
+    rows = query.order_by(PracticeSession.created_at.desc(), PracticeSession.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    return jsonify({
+        'sessions': [session_to_dict(session) for session in page],
+        'next_cursor': encode_cursor(page[-1]) if len(rows) > limit else None
+    })
+
+@bp.route('/progress/series')
+@login_required
+def progress_series():
+    """
+    Average scores per day or week over a time window, for the progress chart.
+    Query args:
+        bucket: 'day' or 'week' (default 'day')
+        start, end: ISO datetimes bounding the window (default: the last 90 days)
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKET_DAYS:
+        return jsonify({'error': "bucket must be 'day' or 'week'"}), 400
+    try:
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = (datetime.fromisoformat(request.args['start']) if 'start' in request.args
+                 else end - timedelta(days=DEFAULT_SERIES_DAYS))
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end'}), 400
+    if (end - start).days / BUCKET_DAYS[bucket] > MAX_SERIES_BUCKETS:
+        return jsonify({'error': 'Window too large for this bucket size'}), 400
+
+    period = bucket_start(PracticeSession.created_at, bucket)
+    if period is None:
+        return jsonify({'error': 'Weekly buckets are not supported on this database'}), 400
+    rows = (
+        db.session.query(
+            period.label('period'),
+            func.count(PracticeSession.id),
+            func.avg(PracticeSession.overall_score),
+            func.avg(PracticeSession.word_accuracy),
+            func.avg(PracticeSession.phoneme_accuracy)
+        )
+        .filter(PracticeSession.user_id == current_user.id)
+        .filter(PracticeSession.created_at >= start, PracticeSession.created_at < end)
+        .group_by(period)
+        .order_by(period)
+        .all()
+    )
+
+    return jsonify({
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'points': [{
+            'period': period.isoformat() if hasattr(period, 'isoformat') else str(period),
+            'sessions': count,
+            'overall_score': float(overall or 0),
+            'word_accuracy': float(word or 0),
+            'phoneme_accuracy': float(phoneme or 0)
+        } for period, count, overall, word, phoneme in rows]
+    })
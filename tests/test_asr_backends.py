@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from utils.asr_backends import ASRBackend, HedgedTranscriber, TranscriptionError
+from utils.asr_models import TranscriptionCancelled
+
+
+class FixedBackend(ASRBackend):
+    def __init__(self, name, transcript=None, error=None):
+        self.name = name
+        self.transcript = transcript
+        self.error = error
+
+    def _transcribe(self, audio, cancel_event=None):
+        if self.error is not None:
+            raise self.error
+        return self.transcript
+
+
+def test_transcript_that_looks_like_an_error_is_accepted():
+    backend = FixedBackend("test-text", "audio processing error: the word was fine")
+    assert backend.transcribe(None) == "audio processing error: the word was fine"
+
+
+@pytest.mark.parametrize("transcript", ["", "   "])
+def test_empty_transcript_raises(transcript):
+    with pytest.raises(TranscriptionError, match="Could not understand audio"):
+        FixedBackend("test-empty", transcript).transcribe(None)
+
+
+def test_cancelled_backend_raises():
+    with pytest.raises(TranscriptionError, match="Cancelled"):
+        FixedBackend("test-cancel", error=TranscriptionCancelled()).transcribe(None)
+    event = threading.Event()
+    event.set()
+    with pytest.raises(TranscriptionError, match="Cancelled"):
+        FixedBackend("test-cancel", "hello").transcribe(None, event)
+
+
+def test_hedge_wins_when_primary_fails():
+    primary = FixedBackend("test-primary", error=TranscriptionError("Service unavailable"))
+    hedge = FixedBackend("test-hedge", "hello")
+    assert HedgedTranscriber(primary, [hedge], hedge_delay=5.0).transcribe(None) == ("hello", "test-hedge")
+
+
+def test_all_failing_returns_last_error():
+    primary = FixedBackend("test-primary", error=TranscriptionError("Service unavailable"))
+    assert HedgedTranscriber(primary, [], hedge_delay=0).transcribe(None) == ("Service unavailable", None)
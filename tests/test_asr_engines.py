@@ -0,0 +1,111 @@
+"""
+Parity of the int8 and ONNX engines with transcribe_audio_huggingface().
+
+A tiny randomly initialized Wav2Vec2 model is built and saved locally, so
+no download is needed. Its transcripts are gibberish, so they are compared
+character by character rather than word by word.
+"""
+import json
+import os
+from difflib import SequenceMatcher
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from utils.analysis_utils import transcribe_audio_huggingface
+from utils.asr_models import SAMPLE_RATE, load_asr_model, pipeline_text
+from utils.audio_decode import DecodedAudio
+
+MIN_SIMILARITY = 0.9
+
+
+def similarity(expected, actual):
+    return SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiny-wav2vec2"))
+    vocab = {"<pad>": 0, "<s>": 1, "</s>": 2, "<unk>": 3, "|": 4}
+    for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ'":
+        vocab[letter] = len(vocab)
+    with open(os.path.join(path, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    tokenizer = transformers.Wav2Vec2CTCTokenizer(os.path.join(path, "vocab.json"), word_delimiter_token="|")
+    feature_extractor = transformers.Wav2Vec2FeatureExtractor(
+        feature_size=1, sampling_rate=SAMPLE_RATE, padding_value=0.0, do_normalize=True,
+        return_attention_mask=False)
+    transformers.Wav2Vec2Processor(feature_extractor=feature_extractor, tokenizer=tokenizer).save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = transformers.Wav2Vec2Config(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, conv_dim=(32, 32, 32), conv_stride=(5, 4, 4), conv_kernel=(10, 8, 8),
+        num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2, pad_token_id=0)
+    model = transformers.Wav2Vec2ForCTC(config).eval()
+    with torch.no_grad():
+        # Wide logit margins, so rounding the weights rarely changes a character
+        model.lm_head.weight.mul_(20)
+    model.save_pretrained(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def clips():
+    t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+    return [DecodedAudio((0.3 * np.sin(2 * np.pi * pitch * t) * np.sin(np.pi * 3 * t) ** 2).astype(np.float32),
+                         SAMPLE_RATE)
+            for pitch in (120, 220, 440)]
+
+
+@pytest.fixture(scope="module")
+def environment(model_dir, tmp_path_factory):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("ASR_MODELS", model_dir)
+        patch.setenv("ASR_ENGINE", "pipeline")
+        patch.setenv("ASR_ONNX_DIR", str(tmp_path_factory.mktemp("onnx")))
+        yield patch
+
+
+@pytest.fixture(scope="module")
+def reference(environment, clips):
+    return [transcribe_audio_huggingface(clip) for clip in clips]
+
+
+@pytest.fixture(scope="module")
+def onnx_export(environment, model_dir):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from utils.onnx_asr import export_onnx
+
+    return export_onnx(model_dir)
+
+
+def transcribe(model, clips):
+    return [pipeline_text(model.transcribe(clip.to_pipeline_input())).lower() for clip in clips]
+
+
+def test_int8_matches_pipeline(model_dir, clips, reference):
+    model = load_asr_model(model_dir, "int8")
+    assert model.engine == "int8"
+    assert "quantized" in type(model.pipeline.model.lm_head).__module__
+    for expected, actual in zip(reference, transcribe(model, clips)):
+        assert similarity(expected, actual) >= MIN_SIMILARITY
+
+
+def test_onnx_fp32_matches_pipeline(environment, onnx_export, model_dir, clips, reference):
+    environment.setenv("ASR_ONNX_QUANTIZED", "0")
+    model = load_asr_model(model_dir, "onnx")
+    assert transcribe(model, clips) == reference
+    assert model.transcribe_batch([clip.to_pipeline_input() for clip in clips]) == reference
+
+
+def test_onnx_int8_matches_pipeline(environment, onnx_export, model_dir, clips, reference):
+    environment.setenv("ASR_ONNX_QUANTIZED", "1")
+    model = load_asr_model(model_dir, "onnx")
+    assert model.pipeline.memory_bytes < os.path.getsize(os.path.join(onnx_export, "model.onnx"))
+    for expected, actual in zip(reference, transcribe(model, clips)):
+        assert similarity(expected, actual) >= MIN_SIMILARITY
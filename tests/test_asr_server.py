@@ -0,0 +1,83 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import numpy as np
+import pytest
+
+from utils.asr_server import ASRInferenceServer, InferenceClient
+
+AUTHKEY = b"test-key"
+
+
+def test_requests_on_a_dropped_connection_fail_after_a_reconnect(tmp_path):
+    address = str(tmp_path / "asr.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=AUTHKEY)
+    client = InferenceClient(address, authkey=AUTHKEY, timeout=10)
+    outcome = {}
+
+    def first_request():
+        started = time.perf_counter()
+        try:
+            client.transcribe(np.zeros(10, dtype=np.float32))
+        except Exception as e:
+            outcome["error"] = e
+        outcome["seconds"] = time.perf_counter() - started
+
+    thread = threading.Thread(target=first_request)
+    thread.start()
+    old = listener.accept()
+    old.recv()  # the first request, never answered
+
+    # Another thread reconnects, as transcribe() does after a failed send
+    with client._lock:
+        client._connection = None
+    second = threading.Thread(target=lambda: outcome.setdefault("text", client.transcribe(np.zeros(10))))
+    second.start()
+    new = listener.accept()
+    request_id, _ = new.recv()
+    new.send((request_id, "hello", None))
+    second.join(5)
+    assert outcome["text"] == "hello"
+
+    old.close()
+    thread.join(5)
+    assert isinstance(outcome["error"], ConnectionError)
+    assert outcome["seconds"] < 5
+    new.close()
+    listener.close()
+
+
+class BlockingModel:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def transcribe_batch(self, inputs, batch_size=8):
+        self.release.wait(10)
+        return ["ok"] * len(inputs)
+
+
+def test_full_server_queue_answers_with_an_error(tmp_path):
+    model = BlockingModel()
+    address = str(tmp_path / "asr.sock")
+    server = ASRInferenceServer(model, address, max_batch=1, max_wait=0, authkey=AUTHKEY, max_queue=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for _ in range(50):
+        if server._listener is not None:
+            break
+        time.sleep(0.05)
+    client = InferenceClient(address, authkey=AUTHKEY, timeout=10)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.transcribe(np.zeros(10)))) for _ in range(2)]
+    for thread in threads:
+        # One clip held by the model, one waiting in the queue
+        thread.start()
+        time.sleep(0.2)
+    with pytest.raises(RuntimeError, match="server busy"):
+        client.transcribe(np.zeros(10))
+    model.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["ok", "ok"]
+    server.close()
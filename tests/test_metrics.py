@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+
+import pytest
+
+from utils import metrics
+
+
+def _worker(directory, amount):
+    metrics.counter("test_requests").inc(amount)
+    metrics.gauge("test_running").set(1)
+    metrics.histogram("test_seconds").observe(0.02 * amount)
+    metrics.write_snapshot(directory)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_combined_snapshot_sums_workers(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_worker, args=(str(tmp_path), amount)) for amount in (1, 2, 3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    combined = metrics.combined_snapshot(str(tmp_path), prefix="test_")
+    assert sorted(combined["workers"]) == sorted([process.pid for process in processes] + [os.getpid()])
+    assert combined["metrics"]["test_requests"] == 6
+    assert combined["metrics"]["test_running"] == 3
+    assert combined["metrics"]["test_seconds"]["count"] == 3
+
+    metrics.remove_snapshot(str(tmp_path), processes[0].pid)
+    combined = metrics.combined_snapshot(str(tmp_path), prefix="test_")
+    assert combined["metrics"]["test_requests"] == 5
+
+
+def _forked_worker(directory):
+    metrics.reset()
+    metrics.counter("test_forked").inc()
+    metrics.write_snapshot(directory)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_reset_drops_values_inherited_at_fork(tmp_path):
+    metrics.counter("test_forked").inc(5)
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_forked_worker, args=(str(tmp_path),)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    combined = metrics.combined_snapshot(str(tmp_path), prefix="test_forked")
+    assert combined["metrics"]["test_forked"] == 7
+
+
+def test_without_directory_reports_this_process(monkeypatch):
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    metrics.counter("test_local").inc()
+    combined = metrics.combined_snapshot(prefix="test_local")
+    assert combined == {"workers": [os.getpid()], "metrics": {"test_local": 1}}
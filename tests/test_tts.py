@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from utils import audio_utils, tts_backends, tts_cache
+from utils.tts_backends import FakeTTSBackend
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = FakeTTSBackend()
+    monkeypatch.setenv("TTS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(tts_backends, "_backend", backend)
+    monkeypatch.setattr(tts_cache, "_caches", {})
+    return backend
+
+
+def test_text_to_speech_is_cached(backend):
+    first = audio_utils.text_to_speech("hello there")
+    second = audio_utils.text_to_speech("hello there")
+    assert first == second
+    stats = tts_cache.get_tts_cache(backend).stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    sample_rate, samples = backend.load(first)
+    assert sample_rate == backend.sample_rate
+    np.testing.assert_array_equal(samples, backend.synthesize("hello there")[1])
+
+
+def test_stream_speech_yields_chunks_on_miss_and_hit(backend):
+    text = "one two three, four five six seven eight nine ten"
+    streamed = list(audio_utils.stream_speech(text))
+    assert len(streamed) > 1
+    cached = list(audio_utils.stream_speech(text))
+    assert len(cached) == 1
+
+    for chunk in streamed + cached:
+        assert isinstance(chunk, tuple)
+        sample_rate, samples = chunk
+        assert sample_rate == backend.sample_rate
+        assert samples.dtype == np.int16
+    np.testing.assert_array_equal(cached[0][1], np.concatenate([samples for _, samples in streamed]))
+
+
+def test_speed_changes_length(backend):
+    _, normal = backend.synthesize("a b c", speed=1.0)
+    _, fast = backend.synthesize("a b c", speed=2.0)
+    assert len(fast) < len(normal)
+    assert len(tts_backends.change_speed(normal, backend.sample_rate, 0.5)) > len(normal)
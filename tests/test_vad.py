@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from utils.audio_decode import DecodedAudio
+from utils.vad import normalize_loudness, prepare_for_asr
+
+RATE = 16000
+
+
+def noise(seconds, rms, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(seconds * RATE)) * rms).astype(np.float32)
+
+
+def speech(seconds, level=0.2):
+    """A voiced tone whose loudness rises and falls four times a second, like syllables."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    envelope = np.sin(np.pi * 4 * t) ** 2
+    return (level * envelope * np.sin(2 * np.pi * 150 * t)).astype(np.float32)
+
+
+def run(*parts):
+    samples = np.concatenate(parts)
+    return prepare_for_asr(DecodedAudio(samples, RATE))
+
+
+@pytest.fixture(autouse=True)
+def vad_enabled(monkeypatch):
+    monkeypatch.setenv("AUDIO_VAD", "1")
+
+
+def test_trims_silence_around_speech():
+    audio, vad = run(noise(1.0, 0.002, 1), speech(1.0), noise(1.0, 0.002, 2))
+    assert not vad.is_empty
+    assert 0.9 <= vad.speech_seconds <= 1.3
+    assert vad.removed_seconds >= 1.7
+    assert len(audio.samples) == int(round(vad.speech_seconds * RATE))
+
+
+def test_short_word_in_long_recording_is_trimmed():
+    # 0.3 s of speech is 1% of the frames: every percentile of the clip is silence
+    _, vad = run(noise(15.0, 0.01, 1), speech(0.3), noise(15.0, 0.01, 2))
+    assert not vad.is_empty
+    assert vad.speech_seconds < 1.0
+
+
+def test_speech_only_clip_is_kept():
+    _, vad = run(speech(3.0))
+    assert vad.speech_seconds == pytest.approx(3.0, abs=0.05)
+
+
+@pytest.mark.parametrize("level", [0.01, 0.05, 0.3])
+def test_steady_hum_is_rejected(level):
+    t = np.arange(3 * RATE) / RATE
+    hum = (level * (np.sin(2 * np.pi * 50 * t) + 0.3 * np.sin(2 * np.pi * 150 * t))).astype(np.float32)
+    audio, vad = run(hum)
+    assert vad.is_empty
+    assert len(audio.samples) == 0
+
+
+def test_steady_noise_is_rejected():
+    _, vad = run(noise(3.0, 0.05))
+    assert vad.is_empty
+
+
+def test_silence_is_rejected():
+    _, vad = run(np.zeros(2 * RATE, dtype=np.float32))
+    assert vad.is_empty
+
+
+def test_speech_over_hum_is_kept():
+    t = np.arange(3 * RATE) / RATE
+    hum = (0.01 * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+    samples = hum + np.concatenate([np.zeros(RATE, np.float32), speech(1.0), np.zeros(RATE, np.float32)])
+    _, vad = run(samples)
+    assert 0.9 <= vad.speech_seconds <= 1.3
+
+
+def test_disabled_passes_audio_through(monkeypatch):
+    monkeypatch.setenv("AUDIO_VAD", "0")
+    audio, vad = run(noise(2.0, 0.05))
+    assert len(audio.samples) == 2 * RATE
+    assert vad.speech_seconds == vad.original_seconds
+
+
+def test_normalize_loudness_limits_gain_and_peak():
+    quiet = speech(1.0, level=0.001)
+    _, gain = normalize_loudness(quiet)
+    assert gain == 20.0
+    loud, gain = normalize_loudness(speech(1.0, level=0.9))
+    assert np.max(np.abs(loud)) <= 0.99
@@ -0,0 +1,72 @@
+import numpy as np
+
+from utils import word_alignment
+from utils.phoneme_alignment import align
+from utils.word_alignment import CORRECT, EXTRA, MISSED, SUBSTITUTED, compare_words, compare_words_prefix, intern_words
+
+
+def statuses(alignment):
+    return [(entry['word'], entry['spoken'], entry['status']) for entry in alignment.words()]
+
+
+def test_skipped_word_is_missed_not_substituted():
+    alignment = compare_words("Hello, how are you?", "hello how you today")
+    assert statuses(alignment) == [
+        ('hello', 'hello', CORRECT),
+        ('how', 'how', CORRECT),
+        ('are', None, MISSED),
+        ('you', 'you', CORRECT),
+        (None, 'today', EXTRA),
+    ]
+    assert alignment.completeness() == 0.75
+
+
+def test_mispronounced_word_is_substituted():
+    alignment = compare_words("the cat sat", "the cut sat")
+    assert statuses(alignment)[1] == ('cat', 'cut', SUBSTITUTED)
+    assert alignment.completeness() == 1.0
+
+
+def test_prefer_matches_keeps_the_edit_distance():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        target = rng.integers(0, 4, rng.integers(0, 9))
+        spoken = rng.integers(0, 4, rng.integers(0, 9))
+        distance, ops = align(target, spoken)
+        best, preferred = align(target, spoken, prefer_matches=True)
+        assert best == distance
+        assert sum(op == 'match' for op, _, _ in preferred) >= sum(op == 'match' for op, _, _ in ops)
+
+
+def test_word_ids_are_per_call():
+    target, spoken = intern_words(["a", "b", "a"], ["c", "b"])
+    assert target.tolist() == [0, 1, 0]
+    assert spoken.tolist() == [2, 1]
+
+    # Words from an earlier call leave later ids dense from 0
+    intern_words(["one", "two", "three", "four"], ["five"])
+    target, spoken = intern_words(["four", "five"], ["five", "four"])
+    assert target.tolist() == [0, 1]
+    assert spoken.tolist() == [1, 0]
+
+    # and no module level vocabulary keeps them
+    assert not any(isinstance(value, dict) and "four" in value for value in vars(word_alignment).values())
+
+
+def test_prefix_ignores_words_not_yet_spoken():
+    alignment = compare_words_prefix("the quick brown fox jumps over the dog", "the quick brown")
+    assert alignment.target_words == ["the", "quick", "brown"]
+    assert alignment.score() == 1.0
+
+
+def test_prefix_skipped_word_does_not_shift_the_rest():
+    alignment = compare_words_prefix("the quick brown fox jumps over the dog", "the brown fox jumps")
+    assert alignment.target_words == ["the", "quick", "brown", "fox", "jumps"]
+    assert statuses(alignment)[1] == ("quick", None, MISSED)
+    assert alignment.score() == 0.8
+
+
+def test_prefix_extra_word_does_not_shift_the_rest():
+    alignment = compare_words_prefix("the quick brown fox jumps", "the um quick brown fox")
+    assert alignment.count(CORRECT) == 4
+    assert alignment.count(EXTRA) == 1
@@ -1,80 +1,61 @@
-import difflib
-import speech_recognition as sr
-from transformers import pipeline
-import epitran
-import pandas as pd
-import numpy as np
+import math
+from utils.asr_backends import TranscriptionError, get_transcriber, transcriber_version
+from utils.asr_models import TranscriptionCancelled, get_asr_model, pipeline_text
+from utils.audio_decode import decode_audio
+from utils.g2p import get_g2p, normalize_text
+from utils.phoneme_alignment import DELETE, INSERT, PhonemeComparison, compare_ipa
+from utils.result_cache import SCORES, TRANSCRIPTS, content_key, get_result_cache
+from utils.vad import prepare_for_asr
+from utils.word_alignment import compare_words
+
+# Bump when scoring changes so cached scores are recomputed
+SCORER_VERSION = '3'
 
 def get_phoneme_analysis(text, transcript):
     """
     Analyze pronunciation at the phoneme level.
-    Returns detailed phoneme comparison and scores.
+    Returns a PhonemeComparison of the aligned target and spoken phonemes.
     """
     try:
-        epi = epitran.Epitran('eng-Latn')
-        
-        # Clean and normalize input text
-        def clean_text(input_text):
-            if not isinstance(input_text, str):
-                return ""
-            # Remove non-alphabetic characters except spaces
-            cleaned = ''.join(c for c in input_text.lower() if c.isalpha() or c.isspace())
-            # Remove multiple spaces
-            cleaned = ' '.join(cleaned.split())
-            return cleaned
+        g2p = get_g2p()
         
-        cleaned_text = clean_text(text)
-        cleaned_transcript = clean_text(transcript)
+        cleaned_text = normalize_text(text)
+        cleaned_transcript = normalize_text(transcript)
         
         if not cleaned_text or not cleaned_transcript:
-            return pd.DataFrame({'target': [], 'spoken': [], 'correct': []})
+            return PhonemeComparison.empty()
         
-        # Get phonemes for both target and spoken text
-        target_phonemes = epi.transliterate(cleaned_text)
-        spoken_phonemes = epi.transliterate(cleaned_transcript)
+        # Get phonemes for both target and spoken text (served from the word cache)
+        target_phonemes, spoken_phonemes = g2p.transliterate_many([cleaned_text, cleaned_transcript])
         
         # Ensure we have phonemes to compare
         if not target_phonemes or not spoken_phonemes:
-            return pd.DataFrame({'target': [], 'spoken': [], 'correct': []})
-        
-        # Compare phonemes
-        phoneme_scores = []
-        max_len = max(len(target_phonemes), len(spoken_phonemes))
-        
-        # Pad shorter sequence with spaces to match lengths
-        target_phonemes = target_phonemes.ljust(max_len)
-        spoken_phonemes = spoken_phonemes.ljust(max_len)
+            return PhonemeComparison.empty()
         
-        for t_ph, s_ph in zip(target_phonemes, spoken_phonemes):
-            score = 1 if t_ph == s_ph else 0
-            phoneme_scores.append({
-                'target': t_ph,
-                'spoken': s_ph,
-                'correct': score
-            })
-        
-        df = pd.DataFrame(phoneme_scores)
-        # Ensure we have a valid score column
-        if 'correct' not in df.columns or df.empty:
-            df = pd.DataFrame({'target': [], 'spoken': [], 'correct': []})
-            
-        return df
+        # Align phoneme segments so a single insertion or deletion
+        # only affects the phonemes around it
+        return compare_ipa(target_phonemes, spoken_phonemes)
     except Exception as e:
         print(f"Phoneme analysis error: {str(e)}")
-        return pd.DataFrame({'target': [], 'spoken': [], 'correct': []})
+        return PhonemeComparison.empty()
 
-def get_phoneme_feedback(phoneme_df):
+def get_phoneme_feedback(comparison):
     """
     Generate specific feedback for phoneme mistakes.
     """
-    mistakes = phoneme_df[phoneme_df['correct'] == 0]
     feedback = []
     
-    for _, row in mistakes.iterrows():
+    for target, spoken, operation in comparison.mistakes():
+        if operation == DELETE:
+            tip = f"Don't skip the '{target}' sound"
+        elif operation == INSERT:
+            tip = f"Avoid adding an extra '{spoken}' sound"
+        else:
+            tip = f"Try to pronounce '{target}' instead of '{spoken}'"
         feedback.append({
-            'target_phoneme': row['target'],
-            'spoken_phoneme': row['spoken'],
-            'tip': f"Try to pronounce '{row['target']}' instead of '{row['spoken']}'"
+            'target_phoneme': target,
+            'spoken_phoneme': spoken,
+            'tip': tip
         })
     
     return feedback
@@ -97,36 +78,29 @@ def similarity_score(target_text: str, user_text: str) -> dict:
             'word_level_score': 0.0,
             'phoneme_score': 0.0,
             'completeness_score': 0.0,
-            'phoneme_details': []
+            'phoneme_details': [],
+            'word_details': [],
+            'phoneme_comparison': PhonemeComparison.empty()
         }
     
-    # Word-level similarity
-    try:
-        word_score = difflib.SequenceMatcher(None, 
-            target_text.lower(), 
-            user_text.lower()
-        ).ratio()
-    except Exception:
-        word_score = 0.0
+    # Word-level alignment
+    words = compare_words(target_text, user_text)
+    word_score = words.score()
+    completeness_score = words.completeness()
     
     # Phoneme-level analysis
-    phoneme_df = get_phoneme_analysis(target_text, user_text)
-    if phoneme_df.empty or 'correct' not in phoneme_df.columns:
-        phoneme_score = 0.0
-    else:
-        phoneme_score = float(phoneme_df['correct'].mean()) if not pd.isna(phoneme_df['correct'].mean()) else 0.0
+    comparison = get_phoneme_analysis(target_text, user_text)
+    phoneme_score = comparison.score()
     
-    # Word count comparison
     try:
-        target_words = len(target_text.split())
-        spoken_words = len(user_text.split())
-        completeness_score = min(spoken_words / target_words if target_words > 0 else 0, 1.0)
+        # Served from the G2P word cache filled by the phoneme analysis
+        target_phonemes = [ipa for _, ipa in get_g2p().transliterate_words(target_text)]
     except Exception:
-        completeness_score = 0.0
+        target_phonemes = None
     
     # Calculate overall score, handling any remaining NaN values
     scores = [word_score, phoneme_score, completeness_score]
-    valid_scores = [s for s in scores if not pd.isna(s)]
+    valid_scores = [s for s in scores if not math.isnan(s)]
     overall_score = sum(valid_scores) / len(valid_scores) if valid_scores else 0.0
     
     return {
@@ -134,174 +108,213 @@ def similarity_score(target_text: str, user_text: str) -> dict:
         'word_level_score': round(float(word_score), 2),
         'phoneme_score': round(float(phoneme_score), 2),
         'completeness_score': round(float(completeness_score), 2),
-        'phoneme_details': get_phoneme_feedback(phoneme_df)
+        'phoneme_details': get_phoneme_feedback(comparison),
+        'word_details': words.words(target_phonemes, comparison),
+        'phoneme_comparison': comparison
     }
 
-def transcribe_audio_google(audio_file: str) -> str:
+def transcribe_audio_google(audio_file, endpoint=None, timeout=None) -> str:
     """
     Transcribe audio using Google Speech Recognition.
     Args:
-        audio_file: path to audio file (will be converted to WAV if needed)
+        audio_file: path to audio file, or DecodedAudio already in memory
+        endpoint: Recognizer URL, defaults to Google's public speech API
+        timeout: Seconds to wait for the recognizer before giving up
     Returns:
-        str: Transcribed text or error message
+        str: Transcribed text
+    Raises:
+        TranscriptionError: The audio could not be decoded, nothing was
+                            recognized or the service failed
     """
-    import os
-    from pydub import AudioSegment
-    
     try:
-        # Convert audio to WAV if it's not already
-        file_ext = os.path.splitext(audio_file)[1].lower()
-        if file_ext != '.wav':
-            try:
-                if file_ext == '.ogg':
-                    audio = AudioSegment.from_ogg(audio_file)
-                elif file_ext == '.mp3':
-                    audio = AudioSegment.from_mp3(audio_file)
-                else:
-                    audio = AudioSegment.from_file(audio_file)
-                
-                wav_path = os.path.splitext(audio_file)[0] + '.wav'
-                audio.export(wav_path, format='wav')
-                audio_file = wav_path
-            except Exception as e:
-                return f"Audio conversion error: {str(e)}"
+        import speech_recognition as sr
+
+        try:
+            audio = decode_audio(audio_file)
+        except Exception as e:
+            raise TranscriptionError(f"Audio conversion error: {str(e)}") from e
 
         # Initialize recognizer
         recognizer = sr.Recognizer()
+        if timeout is not None:
+            recognizer.operation_timeout = timeout
         
-        # Record from wav file
-        with sr.AudioFile(audio_file) as source:
-            audio_data = recognizer.record(source)
+        # Hand the decoded buffer straight to the recognizer
+        audio_data = audio.to_audio_data()
             
         try:
             # Use Google Speech Recognition
-            text = recognizer.recognize_google(audio_data)  # type: ignore
+            if endpoint:
+                text = recognizer.recognize_google(audio_data, endpoint=endpoint)  # type: ignore
+            else:
+                text = recognizer.recognize_google(audio_data)  # type: ignore
             return text.lower()
         except sr.UnknownValueError:
-            return "Could not understand audio"
+            raise TranscriptionError("Could not understand audio") from None
         except sr.RequestError:
-            return "Service unavailable"
+            raise TranscriptionError("Service unavailable") from None
             
+    except TranscriptionError:
+        raise
     except Exception as e:
-        return f"Audio processing error: {str(e)}"
+        raise TranscriptionError(f"Audio processing error: {str(e)}") from e
 
-def transcribe_audio_huggingface(audio_file: str) -> str:
+def transcribe_audio_huggingface(audio_file, cancel_event=None) -> str:
     """
     Transcribe audio using Hugging Face Wav2Vec2 as offline alternative.
     Args:
-        audio_file: Path to audio file
+        audio_file: Path to audio file, or DecodedAudio already in memory
+        cancel_event (threading.Event): Give up if set before the model is free
     Returns:
-        str: Transcribed text or error message
+        str: Transcribed text
+    Raises:
+        TranscriptionError: The audio could not be decoded, nothing was
+                            recognized or the model failed
+        TranscriptionCancelled: cancel_event was set while waiting for the model
     """
     try:
-        import os
-        from pydub import AudioSegment
         from typing import Dict, Any, Union, List
         
-        # Convert audio to WAV if it's not already
-        file_ext = os.path.splitext(audio_file)[1].lower()
-        if file_ext != '.wav':
-            try:
-                if file_ext == '.ogg':
-                    audio = AudioSegment.from_ogg(audio_file)
-                elif file_ext == '.mp3':
-                    audio = AudioSegment.from_mp3(audio_file)
-                else:
-                    audio = AudioSegment.from_file(audio_file)
-                
-                wav_path = os.path.splitext(audio_file)[0] + '.wav'
-                audio.export(wav_path, format='wav')
-                audio_file = wav_path
-            except Exception as e:
-                return f"Audio conversion error: {str(e)}"
+        try:
+            audio = decode_audio(audio_file)
+        except Exception as e:
+            raise TranscriptionError(f"Audio conversion error: {str(e)}") from e
 
-        # Load pre-trained Wav2Vec2 model for speech recognition
-        speech_recognizer = pipeline("automatic-speech-recognition", model="facebook/wav2vec2-base-960h")  # type: ignore
-        result: Union[Dict[str, Any], str, List[Union[Dict[str, Any], str]]] = speech_recognizer(audio_file)
+        # Shared Wav2Vec2 model, loaded once per worker
+        speech_recognizer = get_asr_model()
+        result: Union[Dict[str, Any], str, List[Union[Dict[str, Any], str]]] = speech_recognizer.transcribe(
+            audio.to_pipeline_input(), cancel_event=cancel_event)
         
         # Handle different types of output from the model
-        transcript: str
-        if isinstance(result, dict) and 'text' in result:
-            transcript = str(result['text'])
-        elif isinstance(result, str):
-            transcript = result
-        elif isinstance(result, list) and len(result) > 0:
-            if isinstance(result[0], dict) and 'text' in result[0]:
-                transcript = str(result[0]['text'])
-            else:
-                transcript = str(result[0])
-        else:
-            return "Could not understand audio"
-            
-        return transcript.lower() if transcript else "Could not understand audio"
+        transcript = pipeline_text(result)
+        if not transcript:
+            raise TranscriptionError("Could not understand audio")
+        return transcript.lower()
+    except (TranscriptionError, TranscriptionCancelled):
+        raise
     except Exception as e:
-        return f"Hugging Face transcription error: {str(e)}"
+        raise TranscriptionError(f"Hugging Face transcription error: {str(e)}") from e
+
+def create_error_response(error_msg: str, transcript=None) -> dict:
+    return {
+        'success': False,
+        'error': error_msg,
+        'transcript': transcript,
+        'scores': None
+    }
 
-def analyze_pronunciation(target_text: str, audio_path: str) -> dict:
+def score_transcript(target_text: str, transcript: str, asr_backend=None) -> dict:
     """
-    Enhanced pronunciation analysis with detailed feedback.
-    Returns comprehensive analysis of pronunciation quality.
+    Score a transcript against the target text and build the feedback response.
     
     Args:
         target_text (str): The text that should have been spoken
-        audio_path (str): Path to the audio file
+        transcript (str): What the recognizer heard
+        asr_backend (str): Name of the recognizer that produced the transcript
         
     Returns:
         dict: Analysis results including scores and feedback
     """
-    from typing import Dict, Any, Optional, List
+    from typing import Dict, Any
 
-    def create_error_response(error_msg: str, transcript: Optional[str] = None) -> Dict[str, Any]:
-        return {
-            'success': False,
-            'error': error_msg,
-            'transcript': transcript,
-            'scores': None
+    cache = get_result_cache()
+    cache_key = content_key(target_text, transcript)
+    if cache is not None:
+        cached = cache.get(SCORES, cache_key, SCORER_VERSION)
+        if cached is not None:
+            cached['asr_backend'] = asr_backend
+            cached['phoneme_comparison'] = PhonemeComparison.from_steps(cached.pop('phoneme_steps'))
+            return cached
+
+    # Get detailed analysis
+    try:
+        analysis: Dict[str, Any] = similarity_score(target_text, transcript)
+    except Exception as e:
+        return create_error_response(f"Analysis error: {str(e)}", transcript)
+    
+    # Create success response
+    # 'phoneme_comparison' is not JSON serializable; HTTP handlers drop it
+    feedback: Dict[str, Any] = {
+        'success': True,
+        'transcript': transcript,
+        'asr_backend': asr_backend,
+        'phoneme_comparison': analysis['phoneme_comparison'],
+        'scores': {
+            'overall': round(analysis['overall_score'] * 100, 2),  # Convert to percentage
+            'word_accuracy': round(analysis['word_level_score'] * 100, 2),
+            'phoneme_accuracy': round(analysis['phoneme_score'] * 100, 2),
+            'completeness': round(analysis['completeness_score'] * 100, 2)
+        },
+        'feedback': {
+            'phoneme_issues': analysis['phoneme_details'],
+            'words': analysis['word_details'],
+            'general_feedback': get_general_feedback(analysis['overall_score']),
+            'improvement_tips': get_improvement_tips(analysis)
         }
+    }
+    
+    # An empty comparison may be a G2P failure; do not keep it around
+    comparison = analysis['phoneme_comparison']
+    if cache is not None and len(comparison):
+        entry = {key: value for key, value in feedback.items() if key not in ('asr_backend', 'phoneme_comparison')}
+        entry['phoneme_steps'] = comparison.to_steps()
+        cache.set(SCORES, cache_key, SCORER_VERSION, entry)
+    
+    return feedback
+
+def analyze_pronunciation(target_text: str, audio_path) -> dict:
+    """
+    Enhanced pronunciation analysis with detailed feedback.
+    Returns comprehensive analysis of pronunciation quality.
     
+    Args:
+        target_text (str): The text that should have been spoken
+        audio_path: Path to the audio file, or an in-memory
+                    (sample_rate, ndarray) tuple / DecodedAudio
+        
+    Returns:
+        dict: Analysis results including scores and feedback
+    """
     try:
         # Input validation
-        if not target_text or not audio_path:
+        if not target_text or audio_path is None or (isinstance(audio_path, str) and not audio_path):
             return create_error_response("Missing required input: target text or audio path")
         
-        # Get transcript
-        transcript = transcribe_audio_google(audio_path)
+        # Decode once; every recognizer reads the same in-memory buffer
+        try:
+            audio = decode_audio(audio_path)
+        except Exception as e:
+            return create_error_response(f"Audio conversion error: {str(e)}")
+        
+        # Trim silence so no recognizer uploads or runs on it
+        audio, vad = prepare_for_asr(audio)
+        if vad.is_empty:
+            response = create_error_response("No speech detected in the recording. Please try again.")
+            response['vad'] = vad.as_dict()
+            return response
+        
+        # Identical audio (a resubmission or retry) reuses its transcript
+        cache = get_result_cache()
+        audio_key = content_key(audio.samples.tobytes(), audio.sample_rate)
+        cached = cache.get(TRANSCRIPTS, audio_key, transcriber_version()) if cache is not None else None
+        if cached is not None:
+            transcript, asr_backend = cached
+        else:
+            # Get transcript: Google and the local model race, first usable result wins
+            transcript, asr_backend = get_transcriber().transcribe(audio)
+            if cache is not None and asr_backend is not None:
+                cache.set(TRANSCRIPTS, audio_key, transcriber_version(), [transcript, asr_backend])
         
         # Check for transcription errors
         if not isinstance(transcript, str):
             return create_error_response("Invalid transcription result")
             
-        if "Could not understand" in transcript or "Service unavailable" in transcript:
-            # Fall back to Hugging Face
-            transcript = transcribe_audio_huggingface(audio_path)
-            
-            if not isinstance(transcript, str) or "error" in transcript.lower() or "could not understand" in transcript.lower():
-                return create_error_response(str(transcript))
+        if asr_backend is None:
+            return create_error_response(str(transcript))
     
-        # Get detailed analysis
-        try:
-            analysis: Dict[str, Any] = similarity_score(target_text, transcript)
-        except Exception as e:
-            return create_error_response(f"Analysis error: {str(e)}", transcript)
-        
-        # Create success response
-        feedback: Dict[str, Any] = {
-            'success': True,
-            'transcript': transcript,
-            'scores': {
-                'overall': round(analysis['overall_score'] * 100, 2),  # Convert to percentage
-                'word_accuracy': round(analysis['word_level_score'] * 100, 2),
-                'phoneme_accuracy': round(analysis['phoneme_score'] * 100, 2),
-                'completeness': round(analysis['completeness_score'] * 100, 2)
-            },
-            'feedback': {
-                'phoneme_issues': analysis['phoneme_details'],
-                'general_feedback': get_general_feedback(analysis['overall_score']),
-                'improvement_tips': get_improvement_tips(analysis)
-            }
-        }
-        
-        return feedback
+        result = score_transcript(target_text, transcript, asr_backend)
+        result['vad'] = vad.as_dict()
+        return result
         
     except Exception as e:
         return create_error_response(f"Unexpected error: {str(e)}")
@@ -0,0 +1,250 @@
+"""
+Pluggable ASR backends and a hedging scheduler.
+
+Instead of calling Google and only then falling back to the local model,
+the HedgedTranscriber starts the primary backend, starts the hedges after
+a configurable delay (or right away when the primary fails), returns the
+first acceptable transcript and cancels the rest.
+
+Cancellation is cooperative: a backend that has not started yet is
+skipped, and a local model call still waiting for the model lock gives
+up once another backend has won. A request already sent to Google or a
+forward pass already running is not interrupted; it finishes in its
+worker thread and its result is discarded.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import metrics
+from utils.asr_models import TranscriptionCancelled
+
+
+class TranscriptionError(Exception):
+    """
+    Raised when a recognizer produced no transcript: the audio could not be
+    decoded, nothing was recognized, the recognizer failed or the call was
+    cancelled. The message is shown to the user.
+    """
+
+
+class ASRBackend:
+    """
+    Base class for speech recognizers.
+    Subclasses implement _transcribe(), which returns the transcript or
+    raises TranscriptionError (or TranscriptionCancelled).
+    """
+    name = 'base'
+
+    def _transcribe(self, audio, cancel_event=None):
+        raise NotImplementedError
+
+    def transcribe(self, audio, cancel_event=None):
+        """
+        Transcribe audio, recording latency under asr_latency_seconds.<name>.
+        Args:
+            audio: Audio file path or DecodedAudio
+            cancel_event (threading.Event): Set when another backend already won
+        Returns:
+            str: Transcript
+        Raises:
+            TranscriptionError: Nothing was recognized, the recognizer failed
+                                or the call was cancelled
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            metrics.counter(f"asr_cancelled.{self.name}").inc()
+            raise TranscriptionError("Cancelled")
+        start = time.perf_counter()
+        try:
+            transcript = self._transcribe(audio, cancel_event)
+        except TranscriptionCancelled:
+            metrics.counter(f"asr_cancelled.{self.name}").inc()
+            raise TranscriptionError("Cancelled") from None
+        finally:
+            metrics.histogram(f"asr_latency_seconds.{self.name}").observe(time.perf_counter() - start)
+        if not transcript or not transcript.strip():
+            raise TranscriptionError("Could not understand audio")
+        return transcript
+
+
+class GoogleBackend(ASRBackend):
+    """Google Web Speech API, or any recognizer speaking the same protocol."""
+    name = 'google'
+
+    def __init__(self, endpoint=None, timeout=None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def _transcribe(self, audio, cancel_event=None):
+        from utils.analysis_utils import transcribe_audio_google
+        return transcribe_audio_google(audio, endpoint=self.endpoint, timeout=self.timeout)
+
+
+class Wav2Vec2Backend(ASRBackend):
+    """Local Hugging Face model served from the process-wide registry."""
+    name = 'wav2vec2'
+
+    def _transcribe(self, audio, cancel_event=None):
+        from utils.analysis_utils import transcribe_audio_huggingface
+        return transcribe_audio_huggingface(audio, cancel_event=cancel_event)
+
+
+class RemoteWav2Vec2Backend(ASRBackend):
+    """Local model served by the ASR inference server (utils/asr_server.py)."""
+    name = 'wav2vec2'
+
+    def __init__(self, client):
+        self.client = client
+
+    def _transcribe(self, audio, cancel_event=None):
+        from utils.audio_decode import decode_audio
+
+        try:
+            samples = decode_audio(audio).samples
+        except Exception as e:
+            raise TranscriptionError(f"Audio conversion error: {str(e)}") from e
+        try:
+            return self.client.transcribe(samples)
+        except Exception as e:
+            raise TranscriptionError(f"ASR inference server error: {str(e)}") from e
+
+
+def _local_model_backend():
+    """The inference server when ASR_INFERENCE_ADDRESS is set, else the in-process model."""
+    from utils.asr_server import get_inference_client
+
+    client = get_inference_client()
+    return RemoteWav2Vec2Backend(client) if client is not None else Wav2Vec2Backend()
+
+
+class HedgedTranscriber:
+    """
+    Races a primary backend against hedge backends.
+    Args:
+        primary (ASRBackend): Backend started first
+        hedges (list): Backends started after hedge_delay seconds, or as
+                       soon as the primary returns an unacceptable result
+        hedge_delay (float): Seconds to give the primary alone; 0 starts all at once
+        executor (ThreadPoolExecutor): Pool running the backends
+    """
+
+    def __init__(self, primary, hedges=(), hedge_delay=1.0, executor=None):
+        self.primary = primary
+        self.hedges = list(hedges)
+        self.hedge_delay = hedge_delay
+        self.executor = executor or _get_executor()
+
+    def transcribe(self, audio):
+        """
+        Returns:
+            tuple: (transcript, backend_name); on failure the transcript is the
+                   last error message and backend_name is None
+        """
+        cancel_event = threading.Event()
+        pending = {}
+
+        def start(backend):
+            future = self.executor.submit(backend.transcribe, audio, cancel_event)
+            pending[future] = backend
+
+        start(self.primary)
+        hedges = list(self.hedges)
+        if self.hedge_delay <= 0:
+            while hedges:
+                start(hedges.pop(0))
+
+        last_error = "Could not understand audio"
+        deadline = time.monotonic() + self.hedge_delay
+        try:
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if hedges else None
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Primary is too slow: start the hedges
+                    while hedges:
+                        start(hedges.pop(0))
+                    continue
+
+                for future in done:
+                    backend = pending.pop(future)
+                    try:
+                        transcript = future.result()
+                    except TranscriptionError as e:
+                        last_error = str(e)
+                    except Exception as e:
+                        last_error = f"{backend.name} error: {str(e)}"
+                    else:
+                        metrics.counter(f"asr_wins.{backend.name}").inc()
+                        return transcript, backend.name
+                    metrics.counter(f"asr_failures.{backend.name}").inc()
+
+                if not pending:
+                    # Everything started so far failed: start the hedges now
+                    while hedges:
+                        start(hedges.pop(0))
+            return last_error, None
+        finally:
+            cancel_event.set()
+            for future in pending:
+                future.cancel()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("ASR_MAX_WORKERS", 4)),
+                    thread_name_prefix="asr"
+                )
+    return _executor
+
+
+BACKENDS = {
+    'google': lambda: GoogleBackend(
+        endpoint=os.environ.get("GOOGLE_SPEECH_ENDPOINT") or None,
+        timeout=float(os.environ["GOOGLE_SPEECH_TIMEOUT"]) if os.environ.get("GOOGLE_SPEECH_TIMEOUT") else None
+    ),
+    'wav2vec2': _local_model_backend,
+}
+
+_transcriber = None
+
+
+def transcriber_version():
+    """
+    Identifies the configured recognizers, so cached transcripts are not
+    reused after ASR_BACKENDS, ASR_MODELS or ASR_ENGINE change. Bump ASR_CACHE_VERSION
+    to invalidate them for any other reason, e.g. a model updated in place.
+    """
+    from utils.asr_models import asr_engine, configured_asr_models
+
+    return '|'.join([
+        os.environ.get("ASR_BACKENDS", "google,wav2vec2"),
+        ','.join(configured_asr_models()),
+        asr_engine(),
+        os.environ.get("ASR_CACHE_VERSION", "1")
+    ])
+
+
+def get_transcriber():
+    """
+    Get the process-wide transcriber.
+    ASR_BACKENDS lists backend names, primary first (default "google,wav2vec2");
+    ASR_HEDGE_DELAY is the head start in seconds given to the primary (default 1.0).
+    """
+    global _transcriber
+    if _transcriber is None:
+        names = [n.strip() for n in os.environ.get("ASR_BACKENDS", "google,wav2vec2").split(",") if n.strip()]
+        backends = [BACKENDS[name]() for name in names]
+        _transcriber = HedgedTranscriber(
+            backends[0], backends[1:],
+            hedge_delay=float(os.environ.get("ASR_HEDGE_DELAY", 1.0))
+        )
+    return _transcriber
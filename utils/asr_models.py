@@ -0,0 +1,260 @@
+"""
+Process-wide registry of warm ASR models.
+
+Each configured model is loaded at most once per worker process and then
+shared by every Flask request thread and Gradio callback in that process.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_ASR_MODEL = "facebook/wav2vec2-base-960h"
+SAMPLE_RATE = 16000
+
+_registry = {}
+_registry_lock = threading.Lock()
+_loading_locks = {}
+
+
+def configured_asr_models():
+    """
+    Get the ASR model names configured for this worker.
+    Reads the comma separated ASR_MODELS environment variable.
+    Returns:
+        list: Model names, the first one being the default model
+    """
+    names = [n.strip() for n in os.environ.get("ASR_MODELS", DEFAULT_ASR_MODEL).split(",")]
+    return [n for n in names if n] or [DEFAULT_ASR_MODEL]
+
+
+def asr_engine():
+    """
+    How the local model is run, from ASR_ENGINE: 'pipeline' (default, fp32
+    transformers pipeline), 'int8' (the same pipeline with dynamically
+    quantized linear layers) or 'onnx' (ONNX Runtime, see utils/onnx_asr.py).
+    """
+    return os.environ.get("ASR_ENGINE", "pipeline")
+
+
+def _model_memory_bytes(model):
+    """Size in bytes of the parameters and buffers of a torch model."""
+    try:
+        total = 0
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        return total
+    except Exception:
+        return 0
+
+
+class TranscriptionCancelled(Exception):
+    """Raised when a transcription is cancelled while waiting for the model."""
+
+
+class LoadedASRModel:
+    """A loaded speech recognition pipeline plus its load statistics."""
+
+    def __init__(self, name, pipeline, load_seconds, engine='pipeline'):
+        self.name = name
+        self.pipeline = pipeline
+        self.load_seconds = load_seconds
+        self.engine = engine
+        self.memory_bytes = (getattr(pipeline, "memory_bytes", None)
+                             or _model_memory_bytes(getattr(pipeline, "model", None)))
+        self.loaded_at = time.time()
+        self.warm = False
+        self.calls = 0
+        # transformers pipelines keep per-call state, so inference is serialized
+        self._lock = threading.Lock()
+
+    def transcribe(self, inputs, cancel_event=None, **kwargs):
+        """
+        Run the pipeline on a file path, raw array or {"raw", "sampling_rate"} dict.
+        Safe to call from several threads at once. When cancel_event is set
+        while the call waits for the model, it raises TranscriptionCancelled
+        instead of running; a forward pass already started runs to the end.
+        """
+        with self._lock:
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranscriptionCancelled()
+            self.calls += 1
+            return self.pipeline(inputs, **kwargs)
+
+    def transcribe_batch(self, inputs, batch_size=8):
+        """
+        Transcribe several clips with batched forward passes; the pipeline
+        pads each batch to its longest clip.
+        Args:
+            inputs (list): Pipeline inputs, e.g. {"raw", "sampling_rate"} dicts
+            batch_size (int): Clips per forward pass
+        Returns:
+            list: Lowercased transcripts, '' where nothing was recognized
+        """
+        if not inputs:
+            return []
+        with self._lock:
+            self.calls += len(inputs)
+            results = self.pipeline(list(inputs), batch_size=batch_size)
+        return [pipeline_text(result).lower() for result in results]
+
+    def prewarm(self):
+        """Run a short silent clip through the model so the first real call is fast."""
+        dummy = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        self.transcribe({"raw": dummy, "sampling_rate": SAMPLE_RATE})
+        self.warm = True
+
+    def share_memory(self):
+        """
+        Put the weights in shared memory, read-only, so processes forked
+        after this call all map the same pages instead of copying them.
+        """
+        model = getattr(self.pipeline, "model", None)
+        if model is None or not hasattr(model, "share_memory"):
+            return False
+        model.eval()
+        for parameter in model.parameters():
+            parameter.requires_grad_(False)
+        model.share_memory()
+        return True
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'engine': self.engine,
+            'load_seconds': round(self.load_seconds, 3),
+            'memory_bytes': self.memory_bytes,
+            'loaded_at': self.loaded_at,
+            'warm': self.warm,
+            'calls': self.calls
+        }
+
+
+def pipeline_text(result):
+    """Extract the transcript from any of the shapes an ASR pipeline returns."""
+    if isinstance(result, dict) and 'text' in result:
+        return str(result['text'])
+    if isinstance(result, str):
+        return result
+    if isinstance(result, list) and len(result) > 0:
+        if isinstance(result[0], dict) and 'text' in result[0]:
+            return str(result[0]['text'])
+        return str(result[0])
+    return ""
+
+
+def load_asr_model(name, engine=None):
+    """
+    Load a model outside the registry, e.g. to compare engines.
+    Args:
+        name (str): Model name
+        engine (str): 'pipeline', 'int8' or 'onnx', defaults to asr_engine()
+    Returns:
+        LoadedASRModel: The loaded model
+    """
+    engine = engine or asr_engine()
+    if engine not in ('pipeline', 'int8', 'onnx'):
+        raise ValueError(f"Unknown ASR engine: {engine}")
+    start = time.perf_counter()
+    if engine == 'onnx':
+        from utils.onnx_asr import OnnxCTCPipeline, default_onnx_dir
+        asr_pipeline = OnnxCTCPipeline(default_onnx_dir(name),
+                                       quantized=os.environ.get("ASR_ONNX_QUANTIZED", "1") == "1")
+    else:
+        from transformers import pipeline
+
+        asr_pipeline = pipeline("automatic-speech-recognition", model=name)  # type: ignore
+        if engine == 'int8':
+            import torch
+            asr_pipeline.model = torch.quantization.quantize_dynamic(
+                asr_pipeline.model, {torch.nn.Linear}, dtype=torch.qint8)
+    load_seconds = time.perf_counter() - start
+    print(f"Loaded ASR model {name} ({engine}) in {load_seconds:.2f}s")
+    return LoadedASRModel(name, asr_pipeline, load_seconds, engine=engine)
+
+
+def get_asr_model(name=None):
+    """
+    Get the shared ASR model, loading it on first use.
+    Args:
+        name (str): Model name, defaults to the first configured model
+    Returns:
+        LoadedASRModel: The warm model shared by the whole process
+    """
+    name = name or configured_asr_models()[0]
+    model = _registry.get(name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        loading_lock = _loading_locks.setdefault(name, threading.Lock())
+
+    # Loading happens outside the registry lock so one slow model
+    # does not block lookups of models that are already loaded.
+    with loading_lock:
+        model = _registry.get(name)
+        if model is None:
+            model = load_asr_model(name)
+            with _registry_lock:
+                _registry[name] = model
+    return model
+
+
+def prewarm_asr_models(names=None):
+    """
+    Load and warm up every configured ASR model. Meant to run once at boot.
+    Args:
+        names (list): Model names, defaults to configured_asr_models()
+    Returns:
+        list: Stats of the warmed models
+    """
+    warmed = []
+    for name in names or configured_asr_models():
+        try:
+            model = get_asr_model(name)
+            if not model.warm:
+                model.prewarm()
+            warmed.append(model.stats())
+        except Exception as e:
+            print(f"Error warming ASR model {name}: {str(e)}")
+    return warmed
+
+
+def preload_for_fork(names=None):
+    """
+    Load every configured ASR model in a preforking master (gunicorn
+    --preload) and move its weights to shared memory. No inference runs
+    here: torch's thread pools must not be started before the fork, so
+    each worker warms up after it has been forked.
+    Returns:
+        list: Stats of the loaded models
+    """
+    if asr_engine() == 'onnx':
+        # An ONNX Runtime session starts its thread pool when it is created
+        print("ASR_ENGINE=onnx: models are loaded in each worker, not before fork")
+        return []
+    loaded = []
+    for name in names or configured_asr_models():
+        try:
+            model = get_asr_model(name)
+            model.share_memory()
+            loaded.append(model.stats())
+        except Exception as e:
+            print(f"Error preloading ASR model {name}: {str(e)}")
+    return loaded
+
+
+def start_prewarm_thread(names=None):
+    """Warm the ASR models in a background thread so boot is not blocked."""
+    thread = threading.Thread(target=prewarm_asr_models, args=(names,), name="asr-prewarm")
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def asr_model_stats():
+    """Stats of all models loaded in this process."""
+    with _registry_lock:
+        models = list(_registry.values())
+    return [model.stats() for model in models]
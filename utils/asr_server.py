@@ -0,0 +1,356 @@
+"""
+ASR inference server: one process owns the local model and serves every
+web worker over a local socket.
+
+Requests that arrive close together are micro-batched: the batcher takes
+the first waiting clip, then keeps collecting until it has max_batch clips
+or max_wait seconds have passed, and runs them as one padded forward pass.
+A larger max_wait trades latency for throughput.
+
+Run it next to the web workers and point them at it. Both sides need the
+same ASR_INFERENCE_AUTHKEY; by default the server listens on a Unix socket
+that only its own user can open:
+
+    export ASR_INFERENCE_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python -m utils.asr_server --max-batch 8 --max-wait-ms 10
+    ASR_INFERENCE_ADDRESS=$(python -m utils.asr_server --print-address) gunicorn app:app ...
+"""
+import argparse
+import itertools
+import os
+import queue
+import socket
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from utils import metrics
+from utils.asr_models import SAMPLE_RATE, get_asr_model
+
+
+def default_address():
+    """Unix socket in XDG_RUNTIME_DIR, or the temp directory when that is not set."""
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "pronunciation-asr.sock")
+
+
+def parse_address(address):
+    """'host:port' becomes a TCP address; anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return host or '127.0.0.1', int(port)
+    return address
+
+
+def _authkey():
+    """The shared secret from ASR_INFERENCE_AUTHKEY; there is no default."""
+    authkey = os.environ.get("ASR_INFERENCE_AUTHKEY", "").encode()
+    if not authkey:
+        raise RuntimeError("ASR_INFERENCE_AUTHKEY must be set for the ASR inference server and its clients")
+    return authkey
+
+
+def _remove_stale_socket(path):
+    """Delete a socket file left by a server that is no longer running."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.remove(path)
+    finally:
+        probe.close()
+
+
+class _Request:
+    __slots__ = ('request_id', 'samples', 'connection', 'received_at')
+
+    def __init__(self, request_id, samples, connection):
+        self.request_id = request_id
+        self.samples = samples
+        self.connection = connection
+        self.received_at = time.perf_counter()
+
+
+class _ClientConnection:
+    """Server side of one client; replies from the batcher share its send lock."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._send_lock = threading.Lock()
+
+    def send(self, message):
+        with self._send_lock:
+            try:
+                self.connection.send(message)
+            except (OSError, EOFError):
+                pass  # the client went away; its reader thread cleans up
+
+
+class ASRInferenceServer:
+    """
+    Serves transcription requests for one model with dynamic micro-batching.
+    Args:
+        model: Object with transcribe_batch(inputs, batch_size), e.g. a LoadedASRModel
+        address: (host, port) tuple or Unix socket path
+        max_batch (int): Most clips per forward pass
+        max_wait (float): Seconds to wait for more clips after the first one
+        max_queue (int): Clips allowed to wait for the model; beyond that
+                         requests are answered with an error at once
+    """
+
+    def __init__(self, model, address, max_batch=8, max_wait=0.01, authkey=None, max_queue=64):
+        self.model = model
+        self.address = address
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.authkey = authkey or _authkey()
+        self._requests = queue.Queue(maxsize=max_queue)
+        self._listener = None
+        self.batches = 0
+        self.clips = 0
+
+    def _collect(self):
+        """Block for one request, then gather more until the batch is full or max_wait passes."""
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0
+                             else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                texts = self.model.transcribe_batch(
+                    [{"raw": request.samples, "sampling_rate": SAMPLE_RATE} for request in batch],
+                    batch_size=len(batch)
+                )
+                replies = [(request, text, None) for request, text in zip(batch, texts)]
+            except Exception as e:
+                replies = [(request, None, str(e)) for request in batch]
+            finished = time.perf_counter()
+
+            self.batches += 1
+            self.clips += len(batch)
+            metrics.histogram("asr_server_batch_size", buckets=(1, 2, 4, 8, 16, 32, 64)).observe(len(batch))
+            metrics.histogram("asr_server_forward_seconds").observe(finished - started)
+            for request, text, error in replies:
+                metrics.histogram("asr_server_queue_seconds").observe(started - request.received_at)
+                request.connection.send((request.request_id, text, error))
+
+    def _serve_client(self, connection):
+        client = _ClientConnection(connection)
+        try:
+            while True:
+                request_id, samples = connection.recv()
+                try:
+                    self._requests.put_nowait(_Request(request_id, np.asarray(samples, dtype=np.float32), client))
+                except queue.Full:
+                    metrics.counter("asr_server_rejected").inc()
+                    client.send((request_id, None, f"server busy: {self._requests.maxsize} clips already waiting"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def _listen(self):
+        if not isinstance(self.address, str):
+            return Listener(self.address, authkey=self.authkey)
+        _remove_stale_socket(self.address)
+        # Created owner-only (0600) rather than chmod-ed afterwards, so no
+        # other user can connect in between
+        previous_umask = os.umask(0o177)
+        try:
+            return Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(previous_umask)
+
+    def serve_forever(self):
+        """Accept clients until the process is stopped."""
+        self._listener = self._listen()
+        batcher = threading.Thread(target=self._batch_loop, name="asr-batcher")
+        batcher.daemon = True
+        batcher.start()
+        print(f"ASR inference server listening on {self._listener.address} "
+              f"(max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.0f}ms)")
+        while True:
+            try:
+                connection = self._listener.accept()
+            except AuthenticationError:
+                metrics.counter("asr_server_auth_failures").inc()
+                print("Rejected an ASR inference client with the wrong ASR_INFERENCE_AUTHKEY")
+                continue
+            except (OSError, EOFError):
+                if self._listener is None:
+                    return
+                continue
+            thread = threading.Thread(target=self._serve_client, args=(connection,), name="asr-client")
+            thread.daemon = True
+            thread.start()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+
+class InferenceClient:
+    """
+    Thread-safe client for ASRInferenceServer. All threads share one
+    connection; a reader thread routes replies back by request id. When a
+    connection drops, the requests sent on it fail at once, even if
+    another thread has already opened a new one.
+    """
+
+    def __init__(self, address, authkey=None, timeout=30.0):
+        self.address = address
+        self.authkey = authkey or _authkey()
+        self.timeout = timeout
+        self._ids = itertools.count()
+        self._pending = {}
+        # connection -> ids of the requests sent on it and not yet answered
+        self._sent = {}
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        """Open the connection and start its reader, if not already done. Caller holds _lock."""
+        if self._connection is None:
+            connection = Client(self.address, authkey=self.authkey)
+            self._connection = connection
+            self._sent[connection] = set()
+            reader = threading.Thread(target=self._read, args=(connection,), name="asr-client-reader")
+            reader.daemon = True
+            reader.start()
+        return self._connection
+
+    def _send(self, request_id, samples):
+        """Send a request on the current connection. Caller holds _lock."""
+        connection = self._connect()
+        self._sent[connection].add(request_id)
+        try:
+            connection.send((request_id, samples))
+        except (OSError, EOFError):
+            self._sent[connection].discard(request_id)
+            raise
+
+    def _read(self, connection):
+        try:
+            while True:
+                request_id, text, error = connection.recv()
+                with self._lock:
+                    self._sent[connection].discard(request_id)
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(text)
+        except (EOFError, OSError) as e:
+            with self._lock:
+                if self._connection is connection:
+                    self._connection = None
+                failed = [self._pending.pop(request_id, None) for request_id in self._sent.pop(connection, ())]
+            for future in failed:
+                if future is not None:
+                    future.set_exception(ConnectionError(f"ASR inference server disconnected: {e}"))
+
+    def transcribe(self, samples):
+        """
+        Transcribe mono float32 samples at 16 kHz.
+        Returns:
+            str: Lowercased transcript, '' when nothing was recognized
+        """
+        future = Future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        try:
+            with self._lock:
+                try:
+                    self._send(request_id, samples)
+                except (OSError, EOFError):
+                    # Server restarted since the last call: reconnect once
+                    self._connection = None
+                    self._send(request_id, samples)
+        except Exception:
+            self._pending.pop(request_id, None)
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """
+    Get the process-wide client for the server at ASR_INFERENCE_ADDRESS,
+    or None when no inference server is configured.
+    """
+    global _client
+    address = os.environ.get("ASR_INFERENCE_ADDRESS")
+    if not address:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    parse_address(address),
+                    timeout=float(os.environ.get("ASR_INFERENCE_TIMEOUT", 30))
+                )
+    return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the local ASR model to the web workers")
+    parser.add_argument("--address", default=os.environ.get("ASR_INFERENCE_ADDRESS") or default_address(),
+                        help="Unix socket path (default: %(default)s) or host:port")
+    parser.add_argument("--model", default=None, help="Model name (default: first of ASR_MODELS)")
+    parser.add_argument("--max-batch", type=int, default=int(os.environ.get("ASR_MAX_BATCH", 8)))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.environ.get("ASR_MAX_WAIT_MS", 10)))
+    parser.add_argument("--max-queue", type=int, default=int(os.environ.get("ASR_MAX_QUEUE", 64)),
+                        help="Clips allowed to wait before requests are refused")
+    parser.add_argument("--print-address", action="store_true", help="Print the address and exit")
+    args = parser.parse_args()
+
+    if args.print_address:
+        print(args.address)
+        return
+    try:
+        _authkey()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    model = get_asr_model(args.model)
+    model.prewarm()
+    server = ASRInferenceServer(model, parse_address(args.address),
+                                max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                                max_queue=args.max_queue)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
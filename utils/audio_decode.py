@@ -0,0 +1,148 @@
+"""
+Shared audio decode stage.
+
+Audio is decoded once per request into a mono 16 kHz float32 NumPy
+buffer that every recognizer consumes directly; nothing is written to disk.
+"""
+import os
+import time
+import wave
+
+import numpy as np
+
+from utils import metrics
+
+TARGET_SAMPLE_RATE = 16000
+
+
+class DecodedAudio:
+    """Mono float32 samples in [-1, 1] plus where they came from."""
+    __slots__ = ('samples', 'sample_rate', 'source', 'decode_seconds', 'input_bytes')
+
+    def __init__(self, samples, sample_rate, source=None, decode_seconds=0.0, input_bytes=0):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source = source
+        self.decode_seconds = decode_seconds
+        self.input_bytes = input_bytes
+
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sample_rate) if self.sample_rate else 0.0
+
+    def to_pcm16(self):
+        """The samples as little-endian 16-bit PCM bytes."""
+        return (np.clip(self.samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+    def to_audio_data(self):
+        """The samples as a speech_recognition AudioData, without a WAV file."""
+        import speech_recognition as sr
+        return sr.AudioData(self.to_pcm16(), self.sample_rate, 2)
+
+    def to_pipeline_input(self):
+        """The samples in the dict form accepted by transformers ASR pipelines."""
+        return {"raw": self.samples, "sampling_rate": self.sample_rate}
+
+
+def to_float32(data):
+    """Convert integer or float PCM of any width to float32 in [-1, 1]."""
+    data = np.asarray(data)
+    if data.dtype == np.uint8:
+        return (data.astype(np.float32) - 128.0) / 128.0
+    if np.issubdtype(data.dtype, np.integer):
+        return data.astype(np.float32) / float(np.iinfo(data.dtype).max + 1)
+    return data.astype(np.float32, copy=False)
+
+
+def to_mono(data):
+    """Average (frames, channels) audio down to one channel."""
+    if data.ndim == 1:
+        return data
+    # Gradio and most decoders use (frames, channels); tolerate (channels, frames)
+    if data.shape[0] < data.shape[1] and data.shape[0] <= 8:
+        data = data.T
+    return data.mean(axis=1, dtype=np.float32)
+
+
+def resample(samples, from_rate, to_rate=TARGET_SAMPLE_RATE):
+    """Linear interpolation resampling, vectorized over the whole clip."""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / float(from_rate)
+    target_length = int(round(duration * to_rate))
+    positions = np.arange(target_length, dtype=np.float64) * (from_rate / float(to_rate))
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def normalize_samples(data, sample_rate, target_rate=TARGET_SAMPLE_RATE):
+    """Any PCM array to mono float32 at target_rate."""
+    samples = to_mono(to_float32(data))
+    return resample(samples, sample_rate, target_rate)
+
+
+def _read_wav(path):
+    with wave.open(path, 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        frames = f.readframes(f.getnframes())
+    if width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        data = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)) << 8
+    else:
+        data = np.frombuffer(frames, dtype={1: np.uint8, 2: '<i2', 4: '<i4'}[width])
+    if channels > 1:
+        data = data.reshape(-1, channels)
+    return data, rate
+
+
+def _read_with_pydub(path):
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(path)
+    data = np.array(segment.get_array_of_samples())
+    if segment.channels > 1:
+        data = data.reshape(-1, segment.channels)
+    return data, segment.frame_rate
+
+
+def decode_audio(source, target_rate=TARGET_SAMPLE_RATE):
+    """
+    Decode audio into a mono float32 buffer.
+    Args:
+        source: Path to an audio file, a (sample_rate, ndarray) tuple as
+                produced by gr.Audio, or an already decoded DecodedAudio
+        target_rate (int): Output sample rate
+    Returns:
+        DecodedAudio: The decoded samples
+    """
+    if isinstance(source, DecodedAudio):
+        return source
+
+    start = time.perf_counter()
+    if isinstance(source, tuple) and len(source) == 2:
+        # Already in memory: only dtype, channels and rate are normalized
+        rate, data = source
+        data = np.asarray(data)
+        rate = int(rate)
+        input_bytes = data.nbytes
+        label = 'buffer'
+    else:
+        input_bytes = os.path.getsize(source)
+        label = source
+        data = None
+        if os.path.splitext(source)[1].lower() == '.wav':
+            try:
+                data, rate = _read_wav(source)
+            except (wave.Error, KeyError, EOFError):
+                data = None
+        if data is None:
+            data, rate = _read_with_pydub(source)
+
+    decoded = DecodedAudio(normalize_samples(data, rate, target_rate), target_rate,
+                           source=label, input_bytes=input_bytes)
+    decoded.decode_seconds = time.perf_counter() - start
+    metrics.histogram("audio_decode_seconds").observe(decoded.decode_seconds)
+    metrics.counter("audio_decode_input_bytes").inc(input_bytes)
+    return decoded
@@ -1,28 +1,83 @@
-from gtts import gTTS
-import os
-import tempfile
+import threading
+import numpy as np
+from utils.tts_backends import clamp_speed, get_tts_backend
+from utils.tts_cache import get_tts_cache
 
 def text_to_speech(text, lang='en', speed=1.0):
     """
-    Convert text to speech using Tacotron2 and return the file path.
+    Convert text to speech and return the file path.
+    Repeated (text, lang, speed) requests are served from the TTS cache.
     Args:
         text (str): Text to convert to speech
-        lang (str): Language code (currently only 'en' supported)
+        lang (str): Language code
         speed (float): Speech rate multiplier (0.5 to 2.0)
     Returns:
         str: Path to the generated audio file
     """
+    backend = get_tts_backend()
+    speed = clamp_speed(speed)
+    return get_tts_cache(backend).get_or_create(
+        text, lang, speed, lambda path: backend.save(text, lang, speed, path)
+    )
+
+def stream_speech(text, lang='en', speed=1.0):
     """
-    Convert text to speech and return the file path.
+    Stream speech for text as it is synthesized.
+    A cached phrase is yielded at once as a single chunk; otherwise chunks
+    are yielded as they are rendered.
     Args:
         text (str): Text to convert to speech
         lang (str): Language code
-        speed (float): Speech rate (not used in gTTS currently)
+        speed (float): Speech rate multiplier (0.5 to 2.0)
+    Yields:
+        tuple: (sample_rate, int16 ndarray) audio chunks
+    """
+    backend = get_tts_backend()
+    speed = clamp_speed(speed)
+    cached = get_tts_cache(backend).get(text, lang, speed)
+    if cached:
+        try:
+            yield backend.load(cached)
+            return
+        except Exception as e:
+            print(f"Error reading cached speech: {str(e)}")
+
+    chunks = []
+    for chunk in backend.stream(text, lang, speed):
+        chunks.append(chunk)
+        yield chunk
+
+    # Keep the rendered phrase so the next play is a cache hit
+    if chunks:
+        try:
+            sample_rate = chunks[0][0]
+            samples = np.concatenate([samples for _, samples in chunks])
+            get_tts_cache(backend).get_or_create(
+                text, lang, speed, lambda path: backend.save_pcm(sample_rate, samples, path)
+            )
+        except Exception as e:
+            print(f"Error caching streamed speech: {str(e)}")
+
+def prerender_phrases(phrases, lang='en', speed=1.0):
+    """
+    Synthesize phrases into the TTS cache ahead of time.
+    Args:
+        phrases (list): Phrases to render
     Returns:
-        str: Path to the generated audio file
+        int: Number of phrases rendered or already cached
     """
-    tts = gTTS(text=text, lang=lang, slow=False)
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp:
-        tmp_path = tmp.name
-    tts.save(tmp_path)
-    return tmp_path
+    rendered = 0
+    for phrase in phrases:
+        try:
+            text_to_speech(phrase, lang=lang, speed=speed)
+            rendered += 1
+        except Exception as e:
+            print(f"Error pre-rendering '{phrase}': {str(e)}")
+    return rendered
+
+def start_prerender_thread(phrases, lang='en', speed=1.0):
+    """Pre-render phrases in a background thread so startup is not blocked."""
+    thread = threading.Thread(target=prerender_phrases, args=(phrases, lang, speed), name="tts-prerender")
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,206 @@
+"""
+Batch pronunciation scoring for whole sets of recordings.
+
+Decoding and scoring (G2P + alignment) run in a process pool; the local
+ASR model runs in this process on batches of decoded clips. Results are
+yielded as JSON-ready dicts as soon as each batch is scored.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from utils.analysis_utils import create_error_response, score_transcript
+from utils.asr_models import get_asr_model
+from utils.audio_decode import decode_audio
+from utils.vad import prepare_for_asr
+
+MAX_BATCH_SIZE = 32
+
+
+def read_manifest(path):
+    """
+    Read (phrase, audio) pairs from a JSONL or CSV manifest.
+    Each record needs a "phrase" and an "audio" (or "audio_path") field;
+    relative audio paths are resolved against the manifest's directory.
+    Returns:
+        list: {'phrase', 'audio'} dicts
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for record in records:
+        audio = record.get('audio') or record.get('audio_path')
+        if audio and not os.path.isabs(audio):
+            audio = os.path.join(base_dir, audio)
+        items.append({'phrase': record.get('phrase'), 'audio': audio})
+    return items
+
+
+def _decode_item(audio):
+    """Process pool stage: decode and trim one clip into (samples, duration) or an error string."""
+    try:
+        decoded, vad = prepare_for_asr(decode_audio(audio))
+    except Exception as e:
+        return None, 0.0, f"Audio conversion error: {str(e)}"
+    if vad.is_empty:
+        return None, 0.0, "No speech detected in the recording"
+    return decoded.samples, decoded.duration, None
+
+
+def _score_item(args):
+    """Process pool stage: G2P, alignment and scoring of one transcript."""
+    phrase, transcript = args
+    result = score_transcript(phrase, transcript, 'wav2vec2')
+    result.pop('phoneme_comparison', None)
+    return result
+
+
+class BatchStats:
+    """Progress and throughput of a batch run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        elapsed = self.elapsed
+        return {
+            'done': self.done,
+            'total': self.total,
+            'failed': self.failed,
+            'elapsed_seconds': round(elapsed, 2),
+            'clips_per_second': round(self.done / elapsed, 2) if elapsed else 0.0,
+            'audio_seconds_per_second': round(self.audio_seconds / elapsed, 2) if elapsed else 0.0
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_batch_pool():
+    """
+    Get the process pool shared by all batch requests of this process.
+    BATCH_MAX_WORKERS sets its size (default: 2, or the CPU count if lower),
+    so concurrent requests queue for the same processes. A pool left broken
+    by a killed child process is replaced.
+    """
+    global _pool
+    # ProcessPoolExecutor has no public flag for this; _broken is set once a child died
+    if _pool is None or getattr(_pool, '_broken', False):
+        with _pool_lock:
+            if _pool is None or getattr(_pool, '_broken', False):
+                if _pool is not None:
+                    _pool.shutdown(wait=False)
+                workers = int(os.environ.get("BATCH_MAX_WORKERS", min(2, os.cpu_count() or 1)))
+                _pool = ProcessPoolExecutor(max_workers=max(1, workers),
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def score_batch(items, workers=None, batch_size=8, on_progress=None, pool=None):
+    """
+    Score many (phrase, audio) pairs.
+
+    Stages overlap: while the model transcribes batch k, the pool decodes
+    batch k + 1 and scores batch k - 1.
+    Args:
+        items (list): {'phrase', 'audio'} dicts, e.g. from read_manifest()
+        workers (int): Decode/scoring processes, defaults to the CPU count
+        batch_size (int): Clips per ASR forward pass
+        on_progress (callable): Called with BatchStats after every batch
+        pool (ProcessPoolExecutor): Existing pool to use, e.g. get_batch_pool();
+                                    workers is ignored and the pool is left running
+    Yields:
+        dict: One result per item, in manifest order, with 'index', 'phrase' and 'audio'
+    """
+    items = list(items)
+    stats = BatchStats(len(items))
+    workers = workers or os.cpu_count() or 1
+    model = get_asr_model()
+    starts = list(range(0, len(items), batch_size))
+
+    # spawn keeps torch's threads and the loaded model out of the workers
+    context = multiprocessing.get_context('spawn')
+    owned = ProcessPoolExecutor(max_workers=workers, mp_context=context) if pool is None else None
+    with owned or nullcontext(pool) as pool:
+
+        def submit_decodes(start):
+            return [pool.submit(_decode_item, item['audio']) if item.get('phrase') and item.get('audio') else None
+                    for item in items[start:start + batch_size]]
+
+        def finish(start, results, score_futures):
+            for offset, future in score_futures.items():
+                try:
+                    results[offset] = future.result()
+                except Exception as e:
+                    results[offset] = create_error_response(f"Analysis error: {str(e)}")
+            for offset, result in enumerate(results):
+                item = items[start + offset]
+                stats.done += 1
+                if not result.get('success'):
+                    stats.failed += 1
+                result.update({'index': start + offset, 'phrase': item.get('phrase'), 'audio': item.get('audio')})
+                yield result
+            if on_progress:
+                on_progress(stats)
+
+        previous = None
+        decode_futures = submit_decodes(0) if starts else []
+        for position, start in enumerate(starts):
+            next_decodes = submit_decodes(starts[position + 1]) if position + 1 < len(starts) else []
+
+            results = [None] * len(decode_futures)
+            to_transcribe = []
+            for offset, future in enumerate(decode_futures):
+                if future is None:
+                    results[offset] = create_error_response("Missing required input: target text or audio path")
+                    continue
+                samples, duration, error = future.result()
+                if error:
+                    results[offset] = create_error_response(error)
+                else:
+                    stats.audio_seconds += duration
+                    to_transcribe.append((offset, samples))
+
+            failure = None
+            try:
+                transcripts = model.transcribe_batch(
+                    [{"raw": samples, "sampling_rate": 16000} for _, samples in to_transcribe],
+                    batch_size=batch_size
+                )
+            except Exception as e:
+                transcripts = [''] * len(to_transcribe)
+                failure = f"Hugging Face transcription error: {str(e)}"
+
+            score_futures = {}
+            for (offset, _), transcript in zip(to_transcribe, transcripts):
+                if failure or not transcript.strip():
+                    results[offset] = create_error_response(failure or "Could not understand audio")
+                else:
+                    score_futures[offset] = pool.submit(_score_item, (items[start + offset]['phrase'], transcript))
+
+            if previous:
+                yield from finish(*previous)
+            previous = (start, results, score_futures)
+            decode_futures = next_decodes
+
+        if previous:
+            yield from finish(*previous)
@@ -0,0 +1,174 @@
+"""
+Shared grapheme-to-phoneme service.
+
+One epitran transliterator per process, with a bounded LRU cache of
+word level phonemes that can optionally be persisted to disk.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_LANGUAGE = 'eng-Latn'
+DEFAULT_CACHE_SIZE = 20000
+
+
+def normalize_text(input_text):
+    """Lowercase, keep only letters and spaces, collapse whitespace."""
+    if not isinstance(input_text, str):
+        return ""
+    cleaned = ''.join(c for c in input_text.lower() if c.isalpha() or c.isspace())
+    return ' '.join(cleaned.split())
+
+
+class G2PService:
+    """Word level G2P with a shared transliterator and an LRU cache."""
+
+    def __init__(self, language=DEFAULT_LANGUAGE, max_words=DEFAULT_CACHE_SIZE, cache_path=None):
+        self.language = language
+        self.max_words = max_words
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._epi = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._epi_lock = threading.Lock()
+        if cache_path:
+            self.load()
+
+    def _transliterator(self):
+        if self._epi is None:
+            with self._epi_lock:
+                if self._epi is None:
+                    import epitran
+                    self._epi = epitran.Epitran(self.language)
+        return self._epi
+
+    def prewarm(self):
+        """Load the transliterator's tables now, e.g. in a preforking master."""
+        self._transliterator()
+
+    def _lookup(self, word):
+        with self._lock:
+            phonemes = self._cache.get(word)
+            if phonemes is not None:
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return phonemes
+            self.misses += 1
+
+        epi = self._transliterator()
+        with self._epi_lock:
+            phonemes = epi.transliterate(word)
+
+        with self._lock:
+            self._cache[word] = phonemes
+            self._cache.move_to_end(word)
+            while len(self._cache) > self.max_words:
+                self._cache.popitem(last=False)
+        return phonemes
+
+    def transliterate_words(self, text):
+        """
+        Transliterate text word by word.
+        Args:
+            text (str): Raw text, normalized before lookup
+        Returns:
+            list: (word, phonemes) pairs
+        """
+        return [(word, self._lookup(word)) for word in normalize_text(text).split()]
+
+    def transliterate(self, text):
+        """
+        Transliterate text into an IPA string, words separated by spaces.
+        Args:
+            text (str): Raw text, normalized before lookup
+        Returns:
+            str: IPA transcription
+        """
+        return ' '.join(phonemes for _, phonemes in self.transliterate_words(text))
+
+    def transliterate_many(self, texts):
+        """
+        Transliterate several texts, looking each distinct word up only once.
+        Args:
+            texts (list): Raw texts
+        Returns:
+            list: IPA transcriptions in the same order as texts
+        """
+        normalized = [normalize_text(text).split() for text in texts]
+        unique_words = {word for words in normalized for word in words}
+        table = {word: self._lookup(word) for word in unique_words}
+        return [' '.join(table[word] for word in words) for words in normalized]
+
+    def load(self):
+        """Load cached words from cache_path, if it exists."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return 0
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('language') != self.language:
+                return 0
+            with self._lock:
+                for word, phonemes in data.get('words', {}).items():
+                    self._cache[word] = phonemes
+                while len(self._cache) > self.max_words:
+                    self._cache.popitem(last=False)
+                return len(self._cache)
+        except Exception as e:
+            print(f"Error loading G2P cache: {str(e)}")
+            return 0
+
+    def save(self):
+        """Write the cache to cache_path atomically."""
+        if not self.cache_path:
+            return False
+        try:
+            with self._lock:
+                data = {'language': self.language, 'words': dict(self._cache)}
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+            return True
+        except Exception as e:
+            print(f"Error saving G2P cache: {str(e)}")
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'language': self.language,
+                'size': len(self._cache),
+                'max_words': self.max_words,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_g2p():
+    """
+    Get the process-wide G2P service.
+    G2P_CACHE_SIZE and G2P_CACHE_PATH configure the cache; when a path is
+    set the cache is loaded at startup and saved at exit.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                cache_path = os.environ.get('G2P_CACHE_PATH') or None
+                service = G2PService(
+                    max_words=int(os.environ.get('G2P_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+                    cache_path=cache_path
+                )
+                if cache_path:
+                    import atexit
+                    atexit.register(service.save)
+                _service = service
+    return _service
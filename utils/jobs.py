@@ -0,0 +1,462 @@
+"""
+In-process job queue for pronunciation analysis.
+
+Submitting returns a Job at once; a fixed pool of worker threads runs the
+jobs in order. The queue is bounded: when it is full, submit() raises
+QueueFull so the caller can answer 503 instead of piling up work. Finished
+jobs are kept for JOB_TTL seconds so clients can poll for or stream them.
+
+Jobs submitted with shared=True are also written to the analysis_jobs
+table (see JobStore), so any gunicorn worker can report on a job that
+another worker runs. Those jobs' results must be JSON serializable.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, delete, func, or_, select, update
+
+from utils import metrics
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+# Unfinished jobs older than JOB_TTL plus this were lost with their worker process
+STALE_SECONDS = 3600
+
+jobs_metadata = MetaData()
+
+analysis_jobs = Table(
+    'analysis_jobs', jobs_metadata,
+    Column('id', String(32), primary_key=True),
+    Column('owner', String(64)),
+    Column('status', String(16), nullable=False),
+    Column('result', Text),
+    Column('error', Text),
+    Column('created_at', Float, nullable=False),
+    Column('started_at', Float),
+    Column('finished_at', Float),
+    Index('ix_analysis_jobs_status_created', 'status', 'created_at'),
+    Index('ix_analysis_jobs_finished_at', 'finished_at'),
+)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue cannot take more work."""
+
+
+class Job:
+    """One unit of work plus its status, result and timings."""
+
+    def __init__(self, fn, args, kwargs, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        # Bumped on every status change; watchers wait for it to move
+        self._version = 0
+        self._changed = threading.Condition()
+
+    def _set_status(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED:
+                self.finished_at = time.time()
+                self.result = result
+                self.error = error
+            self._version += 1
+            self._changed.notify_all()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def wait(self, timeout=None):
+        """Block until the job has finished. Returns True if it did."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not self.finished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    def watch(self, timeout=None):
+        """
+        Yield the job's dict now and after every status change until it
+        finishes. Yields None when timeout seconds pass without a change,
+        so a streaming caller can send a keep-alive.
+        """
+        seen = -1
+        while True:
+            with self._changed:
+                if self._version == seen:
+                    self._changed.wait(timeout)
+                changed = self._version != seen
+                seen = self._version
+                state = self.to_dict() if changed else None
+            yield state
+            if state is not None and state['status'] in FINISHED:
+                return
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class StoredJob:
+    """
+    Read-only view of a job in the analysis_jobs table, usually one that
+    another worker process runs. Changes are picked up by polling.
+    """
+
+    def __init__(self, store, row):
+        self._store = store
+        self._apply(row)
+
+    def _apply(self, row):
+        self.id = row.id
+        self.owner = row.owner
+        self.status = row.status
+        self.result = json.loads(row.result) if row.result is not None else None
+        self.error = row.error
+        self.created_at = row.created_at
+        self.started_at = row.started_at
+        self.finished_at = row.finished_at
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def refresh(self):
+        """Reload the row. Returns False if it has expired in the meantime."""
+        row = self._store.load_row(self.id)
+        if row is None:
+            return False
+        self._apply(row)
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the job has finished. Returns True if it did."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.finished:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self._store.poll_interval)
+            if not self.refresh():
+                return False
+        return True
+
+    def watch(self, timeout=None):
+        """Same contract as Job.watch(), polling the table for changes."""
+        state = self.to_dict()
+        yield state
+        last_sent = time.monotonic()
+        while not self.finished:
+            time.sleep(self._store.poll_interval)
+            if not self.refresh():
+                return
+            current = self.to_dict()
+            if current != state:
+                state = current
+                last_sent = time.monotonic()
+                yield state
+            elif timeout is not None and time.monotonic() - last_sent >= timeout:
+                last_sent = time.monotonic()
+                yield None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobStore:
+    """
+    Job states in the analysis_jobs table, shared by every worker process.
+    The table is created by the migrations (revision 0004).
+    Args:
+        engine: SQLAlchemy engine of the database holding the table
+        poll_interval (float): Seconds between reads when watching a job
+    """
+
+    def __init__(self, engine, poll_interval=1.0):
+        self.engine = engine
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _row(job):
+        return {
+            'owner': None if job.owner is None else str(job.owner),
+            'status': job.status,
+            'result': json.dumps(job.result) if job.status == DONE else None,
+            'error': job.error,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at
+        }
+
+    def insert(self, job):
+        with self.engine.begin() as connection:
+            connection.execute(analysis_jobs.insert().values(id=job.id, **self._row(job)))
+
+    def update(self, job):
+        with self.engine.begin() as connection:
+            connection.execute(update(analysis_jobs).where(analysis_jobs.c.id == job.id).values(**self._row(job)))
+
+    def discard(self, job):
+        with self.engine.begin() as connection:
+            connection.execute(delete(analysis_jobs).where(analysis_jobs.c.id == job.id))
+
+    def load_row(self, job_id):
+        with self.engine.connect() as connection:
+            return connection.execute(select(analysis_jobs).where(analysis_jobs.c.id == job_id)).first()
+
+    def load(self, job_id):
+        """The StoredJob with job_id, or None if unknown or expired."""
+        row = self.load_row(job_id)
+        return StoredJob(self, row) if row is not None else None
+
+    def position(self, job):
+        """Queued jobs of every worker submitted before job (0 once it is running)."""
+        if job.status != QUEUED:
+            return 0
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(func.count()).select_from(analysis_jobs).where(
+                    analysis_jobs.c.status == QUEUED, analysis_jobs.c.created_at < job.created_at)
+            ).scalar()
+
+    def expire(self, ttl):
+        """Delete jobs finished more than ttl seconds ago and unfinished ones left by dead workers."""
+        now = time.time()
+        with self.engine.begin() as connection:
+            return connection.execute(delete(analysis_jobs).where(or_(
+                analysis_jobs.c.finished_at < now - ttl,
+                analysis_jobs.c.created_at < now - ttl - STALE_SECONDS
+            ))).rowcount
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs run by a fixed number of worker threads.
+    Args:
+        workers (int): Jobs run at the same time
+        max_pending (int): Jobs allowed to wait before submit() raises QueueFull
+        ttl (float): Seconds a finished job stays retrievable
+        store (JobStore): Where shared jobs are recorded, or None
+    """
+
+    def __init__(self, workers=2, max_pending=32, ttl=600, store=None):
+        self.workers = workers
+        self.ttl = ttl
+        self.store = store
+        self._shared_ids = set()
+        self._last_store_expiry = 0.0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._running = 0
+        for index in range(workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}")
+            thread.daemon = True
+            thread.start()
+
+    def _update_gauges(self):
+        metrics.gauge("jobs_queue_depth").set(self._queue.qsize())
+        metrics.gauge("jobs_running").set(self._running)
+
+    def _is_shared(self, job_id):
+        with self._jobs_lock:
+            return job_id in self._shared_ids
+
+    def _record(self, job, action, shared=None):
+        """Mirror a shared job's state into the store; the job itself never fails on this."""
+        if not (self._is_shared(job.id) if shared is None else shared):
+            return
+        try:
+            getattr(self.store, action)(job)
+        except Exception as e:
+            metrics.counter("jobs_store_errors").inc()
+            print(f"Error recording job {job.id}: {str(e)}")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._jobs_lock:
+                self._running += 1
+            self._update_gauges()
+            metrics.histogram("job_queue_wait_seconds").observe(time.time() - job.created_at)
+            job._set_status(RUNNING)
+            self._record(job, 'update')
+            start = time.perf_counter()
+            try:
+                result = job._fn(*job._args, **job._kwargs)
+                job._set_status(DONE, result=result)
+                metrics.counter("jobs_completed").inc()
+            except Exception as e:
+                job._set_status(FAILED, error=str(e))
+                metrics.counter("jobs_failed").inc()
+            finally:
+                metrics.histogram("job_run_seconds").observe(time.perf_counter() - start)
+                job._fn = job._args = job._kwargs = None
+                self._record(job, 'update')
+                with self._jobs_lock:
+                    self._running -= 1
+                self._update_gauges()
+                self._queue.task_done()
+                self._expire_store()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._jobs_lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._shared_ids.discard(job_id)
+
+    def _expire_store(self):
+        """Runs on the worker threads, at most once a minute."""
+        if self.store is None or time.time() - self._last_store_expiry < 60:
+            return
+        self._last_store_expiry = time.time()
+        try:
+            self.store.expire(self.ttl)
+        except Exception as e:
+            print(f"Error expiring stored jobs: {str(e)}")
+
+    def submit(self, fn, *args, owner=None, shared=False, **kwargs):
+        """
+        Queue fn(*args, **kwargs).
+        Args:
+            owner: Optional id of the user the job belongs to
+            shared (bool): Record the job in the store so every worker process
+                           can look it up; its result must be JSON serializable
+        Returns:
+            Job: The queued job
+        Raises:
+            QueueFull: When max_pending jobs are already waiting
+        """
+        self._expire()
+        job = Job(fn, args, kwargs, owner=owner)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            if shared and self.store is not None:
+                self._shared_ids.add(job.id)
+        # Recorded before it can start, so no update can precede the insert
+        self._record(job, 'insert')
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # No longer shared before its row goes, so nobody reads the store for it
+            with self._jobs_lock:
+                del self._jobs[job.id]
+                shared = job.id in self._shared_ids
+                self._shared_ids.discard(job.id)
+            self._record(job, 'discard', shared=shared)
+            metrics.counter("jobs_rejected").inc()
+            raise QueueFull(f"{self._queue.maxsize} jobs already waiting")
+        metrics.counter("jobs_submitted").inc()
+        self._update_gauges()
+        return job
+
+    def get(self, job_id):
+        """
+        The job with job_id, or None if unknown or expired. Jobs of other
+        worker processes are found in the store and returned as StoredJob.
+        """
+        self._expire()
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        try:
+            return self.store.load(job_id)
+        except Exception as e:
+            print(f"Error loading job {job_id}: {str(e)}")
+            return None
+
+    def position(self, job):
+        """Number of queued jobs ahead of job (0 once it is running)."""
+        if job.status != QUEUED:
+            return 0
+        if self.store is not None and (isinstance(job, StoredJob) or self._is_shared(job.id)):
+            try:
+                return self.store.position(job)
+            except Exception as e:
+                print(f"Error reading the job queue position: {str(e)}")
+        if isinstance(job, StoredJob):
+            return 0
+        with self._queue.mutex:
+            pending = list(self._queue.queue)
+        return next((index for index, queued in enumerate(pending) if queued is job), 0)
+
+    def stats(self):
+        with self._jobs_lock:
+            running, stored = self._running, len(self._jobs)
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize(),
+            'max_pending': self._queue.maxsize,
+            'running': running,
+            'stored': stored,
+            'shared_store': self.store is not None
+        }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Get the process-wide job queue, sized by JOB_WORKERS (default 2),
+    JOB_QUEUE_SIZE (default 32) and JOB_TTL seconds (default 600).
+    Shared jobs are stored in JOB_STORE_URL (default DATABASE_URL);
+    JOB_STORE=0 keeps every job in this process.
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                store = None
+                url = os.environ.get("JOB_STORE_URL") or os.environ.get("DATABASE_URL")
+                if os.environ.get("JOB_STORE", "1") == "1" and url:
+                    from models.engine import create_engine
+                    store = JobStore(create_engine(url))
+                _job_queue = JobQueue(
+                    workers=int(os.environ.get("JOB_WORKERS", 2)),
+                    max_pending=int(os.environ.get("JOB_QUEUE_SIZE", 32)),
+                    ttl=float(os.environ.get("JOB_TTL", 600)),
+                    store=store
+                )
+    return _job_queue
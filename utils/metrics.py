@@ -0,0 +1,258 @@
+"""
+Minimal in-process metrics: counters, gauges and latency histograms.
+
+Values live in this process; snapshot() returns a JSON friendly dict that
+can be logged or served from a debug endpoint. With several worker
+processes each one writes its metrics to a file in METRICS_DIR every few
+seconds (start_exporter()), and combined_snapshot() adds up the files of
+all workers: counters, gauges and histogram buckets are summed.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds; the last bucket catches everything above
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between two writes of a worker's metrics file
+EXPORT_SECONDS = 5.0
+
+
+def _bucket_quantile(buckets, counts, q):
+    """Upper bound of the bucket holding quantile q; counts has one more entry than buckets."""
+    count = sum(counts)
+    if not count:
+        return 0.0
+    rank = q * count
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        seen += bucket_count
+        if seen >= rank:
+            return buckets[index] if index < len(buckets) else float('inf')
+    return float('inf')
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """A value that goes up and down, e.g. a queue depth."""
+    kind = 'gauge'
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket containing it."""
+        with self._lock:
+            counts = list(self.counts)
+        return _bucket_quantile(self.buckets, counts, q)
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            buckets['+Inf'] = self.counts[-1]
+            count, total = self.count, self.total
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'mean': round(total / count, 6) if count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': buckets
+        }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _get(name, factory):
+    metric = _metrics.get(name)
+    if metric is None:
+        with _metrics_lock:
+            metric = _metrics.get(name)
+            if metric is None:
+                metric = factory()
+                _metrics[name] = metric
+    return metric
+
+
+def counter(name):
+    """Get or create the process-wide counter called name."""
+    return _get(name, lambda: Counter(name))
+
+
+def gauge(name):
+    """Get or create the process-wide gauge called name."""
+    return _get(name, lambda: Gauge(name))
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS):
+    """Get or create the process-wide histogram called name."""
+    return _get(name, lambda: Histogram(name, buckets))
+
+
+def reset():
+    """
+    Drop every metric of this process. A forked worker calls this first, so
+    it does not report the values it inherited from the master again.
+    """
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def snapshot(prefix=''):
+    """All metrics whose name starts with prefix, as a dict."""
+    with _metrics_lock:
+        items = [(name, metric) for name, metric in _metrics.items() if name.startswith(prefix)]
+    return {name: metric.snapshot() for name, metric in sorted(items)}
+
+
+def _metrics_path(directory, pid):
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def write_snapshot(directory):
+    """Write this process's metrics, with their kinds, to its file in directory."""
+    with _metrics_lock:
+        items = list(_metrics.items())
+    data = {
+        'pid': os.getpid(),
+        'time': time.time(),
+        'metrics': {name: {'kind': metric.kind, 'value': metric.snapshot()} for name, metric in items}
+    }
+    path = _metrics_path(directory, os.getpid())
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def remove_snapshot(directory, pid):
+    """Drop the file of a worker that exited, so its gauges stop counting."""
+    try:
+        os.remove(_metrics_path(directory, pid))
+    except OSError:
+        pass
+
+
+_exporter_pid = None
+
+
+def start_exporter(directory, interval=EXPORT_SECONDS):
+    """Write this process's metrics to directory every interval seconds from a daemon thread."""
+    global _exporter_pid
+    with _metrics_lock:
+        if _exporter_pid == os.getpid():
+            return
+        _exporter_pid = os.getpid()
+
+    def export():
+        while True:
+            try:
+                write_snapshot(directory)
+            except Exception as e:
+                print(f"Error writing metrics: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=export, name="metrics-exporter")
+    thread.daemon = True
+    thread.start()
+
+
+def _merge_histograms(values):
+    bounds = [key for key in values[0]['buckets'] if key != '+Inf']
+    counts = [sum(value['buckets'].get(key, 0) for value in values) for key in bounds + ['+Inf']]
+    count = sum(value['count'] for value in values)
+    total = sum(value['sum'] for value in values)
+    buckets = tuple(float(bound) for bound in bounds)
+    return {
+        'count': count,
+        'sum': round(total, 6),
+        'mean': round(total / count, 6) if count else 0.0,
+        'p50': _bucket_quantile(buckets, counts, 0.5),
+        'p95': _bucket_quantile(buckets, counts, 0.95),
+        'buckets': dict(zip(bounds + ['+Inf'], counts))
+    }
+
+
+def combined_snapshot(directory=None, prefix=''):
+    """
+    Metrics of every worker that wrote to directory (default METRICS_DIR),
+    this process's being written first so they are current. Without a
+    directory only this process is reported.
+    Returns:
+        dict: workers (list of pids) and metrics (name -> summed value)
+    """
+    directory = directory or os.environ.get("METRICS_DIR")
+    if not directory:
+        return {'workers': [os.getpid()], 'metrics': snapshot(prefix)}
+    write_snapshot(directory)
+
+    workers, merged = [], {}
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        workers.append(data['pid'])
+        for name, entry in data['metrics'].items():
+            if name.startswith(prefix):
+                merged.setdefault(name, (entry['kind'], []))[1].append(entry['value'])
+
+    values = {}
+    for name, (kind, parts) in sorted(merged.items()):
+        values[name] = _merge_histograms(parts) if kind == 'histogram' else sum(parts)
+    return {'workers': workers, 'metrics': values}
@@ -0,0 +1,130 @@
+"""
+ONNX Runtime engine for CTC speech models such as Wav2Vec2.
+
+export_onnx() converts a Hugging Face model into a directory holding
+model.onnx, an int8 weight-quantized model.int8.onnx and the processor
+files. OnnxCTCPipeline runs such a directory and is called like a
+transformers ASR pipeline, so LoadedASRModel serves it unchanged. It
+needs the optional onnxruntime package (and onnx to export).
+
+    python convert_asr_model.py facebook/wav2vec2-base-960h
+    ASR_ENGINE=onnx gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+import numpy as np
+
+from utils.asr_models import SAMPLE_RATE
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+
+def default_onnx_dir(name):
+    """Where the export of model name is kept unless ASR_ONNX_DIR is set."""
+    root = os.environ.get("ASR_ONNX_DIR") or "onnx_models"
+    return os.path.join(root, name.replace("/", "--"))
+
+
+def export_onnx(name, output_dir=None, quantize=True, opset=14):
+    """
+    Export a Hugging Face CTC model to ONNX, with dynamic batch and length axes.
+    Args:
+        name (str): Model name or local path
+        output_dir (str): Target directory, default_onnx_dir(name) by default
+        quantize (bool): Also write an int8 weight-quantized copy
+    Returns:
+        str: The output directory
+    """
+    import torch
+    from transformers import AutoModelForCTC, AutoProcessor
+
+    output_dir = output_dir or default_onnx_dir(name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = AutoModelForCTC.from_pretrained(name).eval()
+    AutoProcessor.from_pretrained(name).save_pretrained(output_dir)
+
+    class Logits(torch.nn.Module):
+        # Only the logits, whatever output type the transformers version returns
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_values):
+            return self.model(input_values).logits
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            Logits(model), (torch.zeros(1, SAMPLE_RATE),), fp32_path,
+            input_names=["input_values"], output_names=["logits"],
+            dynamic_axes={"input_values": {0: "batch", 1: "samples"},
+                          "logits": {0: "batch", 1: "frames"}},
+            opset_version=opset, **_legacy_exporter(torch)
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # Only the transformer's matrix products; int8 convolutions are slow on most CPUs
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE),
+                         op_types_to_quantize=["MatMul", "Gemm"], weight_type=QuantType.QInt8)
+    return output_dir
+
+
+def _legacy_exporter(torch):
+    """dynamic_axes needs the TorchScript exporter, which newer torch only uses on request."""
+    import inspect
+
+    return {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+
+def _samples(item):
+    """Pipeline style input (path, array or {"raw", "sampling_rate"}) as 16 kHz float32."""
+    from utils.audio_decode import decode_audio, normalize_samples
+
+    if isinstance(item, dict):
+        return normalize_samples(item["raw"], item.get("sampling_rate", SAMPLE_RATE), SAMPLE_RATE)
+    if isinstance(item, str):
+        return decode_audio(item, SAMPLE_RATE).samples
+    return np.asarray(item, dtype=np.float32)
+
+
+class OnnxCTCPipeline:
+    """
+    Greedy CTC decoding of an exported model with ONNX Runtime on the CPU.
+    Args:
+        model_dir (str): Directory written by export_onnx()
+        quantized (bool): Run model.int8.onnx instead of model.onnx
+        threads (int): Intra-op threads, 0 lets ONNX Runtime decide
+    """
+    model = None
+
+    def __init__(self, model_dir, quantized=True, threads=0):
+        import onnxruntime
+        from transformers import AutoProcessor
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.processor = AutoProcessor.from_pretrained(model_dir)
+        self.memory_bytes = os.path.getsize(path)
+
+    def _run(self, batch):
+        features = self.processor([_samples(item) for item in batch], sampling_rate=SAMPLE_RATE,
+                                  return_tensors="np", padding=True)
+        logits = self.session.run(["logits"], {"input_values": features.input_values.astype(np.float32)})[0]
+        return [{"text": text} for text in self.processor.batch_decode(logits.argmax(axis=-1))]
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        """Same call shape as a transformers pipeline: one input gives a dict, a list gives a list."""
+        if not isinstance(inputs, list):
+            return self._run([inputs])[0]
+        batch_size = batch_size or len(inputs) or 1
+        results = []
+        for start in range(0, len(inputs), batch_size):
+            results.extend(self._run(inputs[start:start + batch_size]))
+        return results
@@ -0,0 +1,333 @@
+"""
+Phoneme tokenization and sequence alignment.
+
+IPA strings are split into phoneme segments (a base symbol plus its
+diacritics, length marks and tie bars), interned to integer ids and
+aligned with a row-vectorized Levenshtein DP.
+"""
+import threading
+import unicodedata
+
+import numpy as np
+
+# Stress and syllable marks carry no segmental information
+IGNORED_SYMBOLS = {'ˈ', 'ˌ', '.', '‿', '|', '‖'}
+# Symbols that modify the preceding segment
+MODIFIER_SYMBOLS = {'ː', 'ˑ', '̃', 'ʰ', 'ʷ', 'ʲ', 'ˠ', 'ˤ', 'ⁿ', 'ˡ', '˞'}
+# Tie bars join the next base symbol into the current segment
+TIE_BARS = {'͡', '͜'}
+# Common English affricates and diphthongs written without a tie bar
+DIGRAPHS = {'tʃ', 'dʒ', 'aj', 'aw', 'ej', 'ow', 'ɔj'}
+
+MATCH = 'match'
+SUBSTITUTE = 'substitute'
+DELETE = 'delete'    # target phoneme missing from the spoken sequence
+INSERT = 'insert'    # extra phoneme in the spoken sequence
+
+
+def _is_modifier(ch):
+    return ch in MODIFIER_SYMBOLS or unicodedata.combining(ch) != 0
+
+
+def tokenize_word(ipa):
+    """
+    Split the IPA of a single word into phoneme segments.
+    Args:
+        ipa (str): IPA transcription without spaces
+    Returns:
+        list: Phoneme segments
+    """
+    segments = []
+    tied = False
+    for ch in ipa:
+        if ch in IGNORED_SYMBOLS or ch.isspace():
+            continue
+        if ch in TIE_BARS:
+            if segments:
+                segments[-1] += ch
+                tied = True
+            continue
+        if segments and (tied or _is_modifier(ch)):
+            segments[-1] += ch
+            tied = False
+            continue
+        if segments and segments[-1] + ch in DIGRAPHS:
+            segments[-1] += ch
+            continue
+        segments.append(ch)
+    return segments
+
+
+def tokenize_ipa(ipa):
+    """
+    Split an IPA string into phoneme segments, ignoring word boundaries.
+    Args:
+        ipa (str): IPA transcription, words separated by spaces
+    Returns:
+        list: Phoneme segments
+    """
+    segments = []
+    for word in ipa.split():
+        segments.extend(tokenize_word(word))
+    return segments
+
+
+class PhonemeInventory:
+    """Interns phoneme segments to small integer ids, shared by the process."""
+
+    def __init__(self):
+        self._ids = {}
+        self._symbols = []
+        self._lock = threading.Lock()
+
+    def encode(self, segments):
+        ids = self._ids
+        missing = [seg for seg in segments if seg not in ids]
+        if missing:
+            with self._lock:
+                for seg in missing:
+                    if seg not in ids:
+                        ids[seg] = len(self._symbols)
+                        self._symbols.append(seg)
+        return np.fromiter((ids[seg] for seg in segments), dtype=np.int32, count=len(segments))
+
+    def decode(self, phoneme_id):
+        return self._symbols[phoneme_id] if phoneme_id >= 0 else ''
+
+    def __len__(self):
+        return len(self._symbols)
+
+
+inventory = PhonemeInventory()
+
+
+def edit_cost(n, m, prefer_matches=False):
+    """
+    Cost of one edit in edit_distance_matrix(). With prefer_matches it
+    exceeds the number of possible matches, so fewer edits always win and
+    the matches only break ties.
+    """
+    return n + m + 1 if prefer_matches else 1
+
+
+def edit_distance_matrix(target_ids, spoken_ids, prefer_matches=False):
+    """
+    Full Levenshtein DP matrix for two integer sequences.
+
+    Each row is computed with whole-array operations: substitutions and
+    deletions come from the previous row, and the insertion chain along
+    the row is resolved with a running minimum of (cost - j) + j.
+
+    Args:
+        prefer_matches (bool): Edits cost edit_cost() and matches -1, so that
+                               among the alignments with the fewest edits the
+                               one with the most matches is cheapest
+    Returns:
+        np.ndarray: (len(target) + 1, len(spoken) + 1) matrix of distances
+    """
+    n, m = len(target_ids), len(spoken_ids)
+    edit = edit_cost(n, m, prefer_matches)
+    match = -1 if prefer_matches else 0
+    largest = edit * (n + m)
+    dtype = np.int16 if largest < np.iinfo(np.int16).max else (
+        np.int32 if largest < np.iinfo(np.int32).max else np.int64)
+    dist = np.empty((n + 1, m + 1), dtype=dtype)
+    cols = np.arange(m + 1, dtype=dtype) * edit
+    dist[0] = cols
+    if m == 0:
+        dist[:, 0] = np.arange(n + 1, dtype=dtype) * edit
+        return dist
+
+    cost = np.where(target_ids[:, None] != spoken_ids[None, :], edit, match).astype(dtype)
+    row = np.empty(m + 1, dtype=dtype)
+    for i in range(1, n + 1):
+        prev = dist[i - 1]
+        row[0] = i * edit
+        np.minimum(prev[1:] + edit, prev[:-1] + cost[i - 1], out=row[1:])
+        dist[i] = np.minimum.accumulate(row - cols) + cols
+    return dist
+
+
+def align(target_ids, spoken_ids, prefer_matches=False):
+    """
+    Align two phoneme id sequences.
+    Args:
+        target_ids (np.ndarray): Expected phoneme ids
+        spoken_ids (np.ndarray): Recognized phoneme ids
+        prefer_matches (bool): Among alignments with the fewest edits, take
+                               one with the most matches rather than any
+    Returns:
+        tuple: (distance, ops) where ops is a list of
+               (op, target_index, spoken_index) in sequence order; the index
+               of the missing side is None for insertions and deletions
+    """
+    target_ids = np.asarray(target_ids, dtype=np.int32)
+    spoken_ids = np.asarray(spoken_ids, dtype=np.int32)
+    dist = edit_distance_matrix(target_ids, spoken_ids, prefer_matches)
+    edit = edit_cost(len(target_ids), len(spoken_ids), prefer_matches)
+    match = -1 if prefer_matches else 0
+
+    ops = []
+    i, j = len(target_ids), len(spoken_ids)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            same = target_ids[i - 1] == spoken_ids[j - 1]
+            if dist[i, j] == dist[i - 1, j - 1] + (match if same else edit):
+                ops.append((MATCH if same else SUBSTITUTE, i - 1, j - 1))
+                i -= 1
+                j -= 1
+                continue
+        if i > 0 and dist[i, j] == dist[i - 1, j] + edit:
+            ops.append((DELETE, i - 1, None))
+            i -= 1
+        else:
+            ops.append((INSERT, None, j - 1))
+            j -= 1
+    ops.reverse()
+    return sum(1 for op, _, _ in ops if op != MATCH), ops
+
+
+def align_prefix(target_ids, spoken_ids, prefer_matches=False):
+    """
+    Align a partial utterance against the start of the target: the spoken
+    sequence is aligned to whichever target prefix it matches best, so the
+    words not yet spoken do not count as deletions.
+    Args:
+        prefer_matches (bool): As in align()
+    Returns:
+        tuple: (prefix_length, distance, ops) with ops as in align()
+    """
+    target_ids = np.asarray(target_ids, dtype=np.int32)
+    spoken_ids = np.asarray(spoken_ids, dtype=np.int32)
+    # Last column: distance of the whole spoken sequence to every target prefix
+    last = edit_distance_matrix(target_ids, spoken_ids, prefer_matches)[:, -1]
+    # Among equally good prefixes take the longest
+    prefix_length = int(np.flatnonzero(last == last.min())[-1])
+    distance, ops = align(target_ids[:prefix_length], spoken_ids, prefer_matches)
+    return prefix_length, distance, ops
+
+
+def align_ipa(target_ipa, spoken_ipa):
+    """
+    Tokenize and align two IPA strings.
+    Returns:
+        tuple: (target_segments, spoken_segments, distance, ops)
+    """
+    target_segments = tokenize_ipa(target_ipa)
+    spoken_segments = tokenize_ipa(spoken_ipa)
+    distance, ops = align(inventory.encode(target_segments), inventory.encode(spoken_segments))
+    return target_segments, spoken_segments, distance, ops
+
+
+OP_CODES = {MATCH: 0, SUBSTITUTE: 1, DELETE: 2, INSERT: 3}
+OP_NAMES = [MATCH, SUBSTITUTE, DELETE, INSERT]
+
+
+class PhonemeComparison:
+    """
+    Compact result of a phoneme alignment.
+
+    Stores one entry per alignment step as inventory ids (-1 for the
+    missing side of an insertion or deletion), an op code and a packed
+    correctness bitmask.
+    """
+    __slots__ = ('target_ids', 'spoken_ids', 'op_codes', 'correct_bits', 'length')
+
+    def __init__(self, target_ids, spoken_ids, op_codes):
+        self.target_ids = np.asarray(target_ids, dtype=np.int32)
+        self.spoken_ids = np.asarray(spoken_ids, dtype=np.int32)
+        self.op_codes = np.asarray(op_codes, dtype=np.uint8)
+        self.length = len(self.op_codes)
+        self.correct_bits = np.packbits(self.op_codes == OP_CODES[MATCH])
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [])
+
+    @classmethod
+    def from_alignment(cls, target_ids, spoken_ids, ops):
+        """Build a comparison from align() ops over the given id sequences."""
+        target_ids = np.append(np.asarray(target_ids, dtype=np.int32), -1)
+        spoken_ids = np.append(np.asarray(spoken_ids, dtype=np.int32), -1)
+        target_index = np.fromiter((-1 if t is None else t for _, t, _ in ops), dtype=np.int64, count=len(ops))
+        spoken_index = np.fromiter((-1 if s is None else s for _, _, s in ops), dtype=np.int64, count=len(ops))
+        codes = np.fromiter((OP_CODES[op] for op, _, _ in ops), dtype=np.uint8, count=len(ops))
+        # Index -1 picks the trailing -1 sentinel for gaps
+        return cls(target_ids[target_index], spoken_ids[spoken_index], codes)
+
+    @classmethod
+    def from_steps(cls, steps):
+        """Rebuild a comparison from to_steps() output, e.g. one read back from a cache."""
+        target_ids = [inventory.encode([target])[0] if target else -1 for target, _, _ in steps]
+        spoken_ids = [inventory.encode([spoken])[0] if spoken else -1 for _, spoken, _ in steps]
+        return cls(target_ids, spoken_ids, [OP_CODES[op] for _, _, op in steps])
+
+    def to_steps(self):
+        """
+        The alignment as symbols rather than ids, which are only valid in this process.
+        Returns:
+            list: [target_phoneme, spoken_phoneme, op] per step, '' for a missing side
+        """
+        return [[inventory.decode(int(target)), inventory.decode(int(spoken)), OP_NAMES[code]]
+                for target, spoken, code in zip(self.target_ids, self.spoken_ids, self.op_codes)]
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def correct(self):
+        """Boolean mask of correctly pronounced alignment steps."""
+        return np.unpackbits(self.correct_bits, count=self.length).astype(bool)
+
+    def score(self):
+        """Fraction of alignment steps that match, 0.0 when empty."""
+        if not self.length:
+            return 0.0
+        return float(np.unpackbits(self.correct_bits, count=self.length).sum()) / self.length
+
+    def mistakes(self):
+        """
+        Iterate over the incorrect steps.
+        Yields:
+            tuple: (target_phoneme, spoken_phoneme, op), '' for a missing side
+        """
+        for index in np.flatnonzero(~self.correct):
+            yield (inventory.decode(int(self.target_ids[index])),
+                   inventory.decode(int(self.spoken_ids[index])),
+                   OP_NAMES[self.op_codes[index]])
+
+    def to_dataframe(self):
+        """Debugging helper: the comparison as a pandas DataFrame."""
+        import pandas as pd
+        return pd.DataFrame({
+            'target': [inventory.decode(int(i)) for i in self.target_ids],
+            'spoken': [inventory.decode(int(i)) for i in self.spoken_ids],
+            'correct': self.correct.astype(int),
+            'operation': [OP_NAMES[code] for code in self.op_codes]
+        })
+
+
+def compare_ipa(target_ipa, spoken_ipa):
+    """
+    Tokenize, encode and align two IPA strings.
+    Returns:
+        PhonemeComparison: The alignment result
+    """
+    target_ids = inventory.encode(tokenize_ipa(target_ipa))
+    spoken_ids = inventory.encode(tokenize_ipa(spoken_ipa))
+    _, ops = align(target_ids, spoken_ids)
+    return PhonemeComparison.from_alignment(target_ids, spoken_ids, ops)
+
+
+def compare_ipa_prefix(target_ipa, spoken_ipa):
+    """
+    Like compare_ipa(), for a spoken IPA string that may cover only the
+    beginning of the target.
+    Returns:
+        tuple: (PhonemeComparison over the matched prefix, prefix_length, target_length)
+    """
+    target_ids = inventory.encode(tokenize_ipa(target_ipa))
+    spoken_ids = inventory.encode(tokenize_ipa(spoken_ipa))
+    prefix_length, _, ops = align_prefix(target_ids, spoken_ids)
+    comparison = PhonemeComparison.from_alignment(target_ids[:prefix_length], spoken_ids, ops)
+    return comparison, prefix_length, len(target_ids)
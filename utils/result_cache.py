@@ -0,0 +1,353 @@
+"""
+Two-tier cache for analysis results.
+
+Entries live in a per-process LRU and, when a database is configured, in a
+shared analysis_cache table so every worker and restart benefits. Each
+entry belongs to a namespace and is keyed by a hash of its inputs plus a
+version string: transcripts by audio content and the configured
+recognizers, scores by (target, transcript) and the scorer version.
+Changing a version makes the old entries unreachable, and prune() deletes
+them together with expired rows and the oldest rows beyond max_rows.
+
+Requests only read the shared table. Writes are queued to a background
+thread, which also prunes the table every few minutes; when the queue is
+full a write is dropped, which only costs a later miss. After an error the
+shared tier is skipped for a minute rather than retried on every call. The
+table is created by migration 0005 (flask db upgrade), or with
+"python -m utils.result_cache create" for a separate RESULT_CACHE_URL.
+
+Configuration:
+
+- RESULT_CACHE: 1 (default) for both tiers, memory for the LRU only, 0 to disable
+- RESULT_CACHE_URL: database of the shared tier (default DATABASE_URL)
+- RESULT_CACHE_SIZE: LRU entries per process (default 2048)
+- RESULT_CACHE_ROWS: rows kept in the shared table (default 200000)
+- RESULT_CACHE_TTL: seconds an entry is served (default 7 days)
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from utils import metrics
+
+TRANSCRIPTS = 'transcript'
+SCORES = 'score'
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_ROWS = 200000
+DEFAULT_TTL = 7 * 24 * 3600
+# Seconds between two prune() runs of the writer thread
+PRUNE_SECONDS = 600
+# Writes waiting for the writer thread before new ones are dropped
+WRITE_QUEUE_SIZE = 1000
+WRITE_BATCH = 100
+# Seconds the shared tier is skipped after an error
+RETRY_SECONDS = 60
+
+cache_metadata = MetaData()
+
+analysis_cache = Table(
+    'analysis_cache', cache_metadata,
+    Column('namespace', String(16), primary_key=True),
+    Column('key', String(64), primary_key=True),
+    Column('version', String(255), nullable=False),
+    Column('value', Text, nullable=False),
+    Column('created_at', Float, nullable=False),
+    Column('expires_at', Float, nullable=False),
+    Index('ix_analysis_cache_expires_at', 'expires_at'),
+    Index('ix_analysis_cache_created_at', 'created_at'),
+)
+
+_UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def content_key(*parts):
+    """sha256 hex digest of parts; bytes are hashed as is, anything else as JSON."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, ensure_ascii=False).encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    In-process LRU in front of an optional shared table.
+    Args:
+        engine: SQLAlchemy engine of the shared tier, or None for the LRU only
+        max_entries (int): LRU size
+        max_rows (int): Rows kept in the shared table
+        ttl (float): Seconds an entry is served
+    """
+
+    def __init__(self, engine=None, max_entries=DEFAULT_MAX_ENTRIES, max_rows=DEFAULT_MAX_ROWS, ttl=DEFAULT_TTL):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer_pid = None
+        self._versions = {}
+        self._last_prune = time.time()
+        self._retry_at = 0.0
+
+    def _shared(self):
+        """The engine, or None if the shared tier is off or failed less than RETRY_SECONDS ago."""
+        if self.engine is None or time.time() < self._retry_at:
+            return None
+        return self.engine
+
+    def _shared_failed(self, action, e):
+        self._retry_at = time.time() + RETRY_SECONDS
+        metrics.counter("result_cache_errors").inc()
+        print(f"Error {action} result cache, skipping it for {RETRY_SECONDS}s: {str(e)}")
+
+    def _start_writer(self):
+        """Start the writer thread, again in a process forked after it was started."""
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        thread = threading.Thread(target=self._write_loop, name="result-cache-writer")
+        thread.daemon = True
+        thread.start()
+
+    def _write_loop(self):
+        while True:
+            rows = [self._pending.get()]
+            while len(rows) < WRITE_BATCH:
+                try:
+                    rows.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                engine = self._shared()
+                if engine is not None:
+                    self._upsert(engine, rows)
+                    metrics.counter("result_cache_writes").inc(len(rows))
+                    if time.time() - self._last_prune >= PRUNE_SECONDS:
+                        self._last_prune = time.time()
+                        self.prune(dict(self._versions))
+            except Exception as e:
+                self._shared_failed("writing", e)
+            finally:
+                for _ in rows:
+                    self._pending.task_done()
+
+    @staticmethod
+    def _upsert(engine, rows):
+        # The last write of a key wins, as it would one at a time
+        rows = list({(row['namespace'], row['key']): row for row in rows}.values())
+        with engine.begin() as connection:
+            dialect = _UPSERT_DIALECTS.get(connection.dialect.name)
+            if dialect is not None:
+                stmt = dialect.insert(analysis_cache)
+                connection.execute(stmt.on_conflict_do_update(
+                    index_elements=['namespace', 'key'],
+                    set_={column: stmt.excluded[column] for column in ('value', 'created_at', 'expires_at')}
+                ), rows)
+            else:
+                for row in rows:
+                    connection.execute(delete(analysis_cache).where(
+                        analysis_cache.c.namespace == row['namespace'], analysis_cache.c.key == row['key']))
+                connection.execute(analysis_cache.insert(), rows)
+
+    def _remember(self, memory_key, value, expires_at):
+        with self._lock:
+            self._entries[memory_key] = (value, expires_at)
+            self._entries.move_to_end(memory_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, namespace, key, version):
+        """
+        Look up an entry.
+        Returns:
+            The cached value (a fresh copy), or None on a miss
+        """
+        memory_key = (namespace, key, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(memory_key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(memory_key)
+                    metrics.counter(f"result_cache_hits.{namespace}.memory").inc()
+                    return json.loads(entry[0])
+                del self._entries[memory_key]
+
+        engine = self._shared()
+        try:
+            if engine is not None:
+                with engine.connect() as connection:
+                    row = connection.execute(
+                        select(analysis_cache.c.value, analysis_cache.c.expires_at).where(
+                            analysis_cache.c.namespace == namespace,
+                            analysis_cache.c.key == content_key(key, version),
+                            analysis_cache.c.expires_at > now
+                        )
+                    ).first()
+                if row is not None:
+                    self._remember(memory_key, row.value, row.expires_at)
+                    metrics.counter(f"result_cache_hits.{namespace}.shared").inc()
+                    return json.loads(row.value)
+        except Exception as e:
+            self._shared_failed("reading", e)
+
+        metrics.counter(f"result_cache_misses.{namespace}").inc()
+        return None
+
+    def set(self, namespace, key, version, value):
+        """Store a JSON serializable value in the LRU and queue it for the shared table."""
+        text = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember((namespace, key, version), text, expires_at)
+        if self._shared() is None:
+            return
+
+        self._start_writer()
+        self._versions[namespace] = version
+        try:
+            self._pending.put_nowait({
+                'namespace': namespace,
+                'key': content_key(key, version),
+                'version': version,
+                'value': text,
+                'created_at': now,
+                'expires_at': expires_at
+            })
+        except queue.Full:
+            metrics.counter("result_cache_writes_dropped").inc()
+
+    def flush(self):
+        """Wait until every queued write has reached the shared table (or failed)."""
+        self._pending.join()
+
+    def prune(self, current_versions=None):
+        """
+        Delete expired rows, rows of superseded versions and the oldest rows
+        beyond max_rows from the shared table.
+        Args:
+            current_versions (dict): namespace -> version still in use;
+                                     other versions of those namespaces are deleted
+        Returns:
+            int: Rows deleted
+        """
+        engine = self._shared()
+        if engine is None:
+            return 0
+        table = analysis_cache
+        deleted = 0
+        with engine.begin() as connection:
+            deleted += connection.execute(delete(table).where(table.c.expires_at <= time.time())).rowcount
+            for namespace, version in (current_versions or {}).items():
+                deleted += connection.execute(delete(table).where(
+                    table.c.namespace == namespace, table.c.version != version)).rowcount
+            excess = connection.execute(select(func.count()).select_from(table)).scalar() - self.max_rows
+            if excess > 0:
+                cutoff = connection.execute(
+                    select(table.c.created_at).order_by(table.c.created_at).offset(excess - 1).limit(1)
+                ).scalar()
+                deleted += connection.execute(delete(table).where(table.c.created_at <= cutoff)).rowcount
+        metrics.counter("result_cache_pruned").inc(deleted)
+        return deleted
+
+    def clear(self, namespace=None):
+        """Drop every entry, or those of one namespace, from both tiers."""
+        with self._lock:
+            for memory_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                del self._entries[memory_key]
+        engine = self._shared()
+        if engine is None:
+            return 0
+        stmt = delete(analysis_cache)
+        if namespace is not None:
+            stmt = stmt.where(analysis_cache.c.namespace == namespace)
+        with engine.begin() as connection:
+            return connection.execute(stmt).rowcount
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'shared': self.engine is not None,
+                'pending_writes': self._pending.qsize()
+            }
+        return {**stats, **metrics.snapshot('result_cache_')}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Get the process-wide result cache, configured from the RESULT_CACHE_*
+    variables, or None when RESULT_CACHE=0.
+    """
+    global _cache
+    mode = os.environ.get("RESULT_CACHE", "1")
+    if mode == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                engine = None
+                url = os.environ.get("RESULT_CACHE_URL") or os.environ.get("DATABASE_URL")
+                if mode != "memory" and url:
+                    from models.engine import create_engine
+                    engine = create_engine(url)
+                _cache = ResultCache(
+                    engine,
+                    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+                    max_rows=int(os.environ.get("RESULT_CACHE_ROWS", DEFAULT_MAX_ROWS)),
+                    ttl=float(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL))
+                )
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the shared analysis result cache")
+    parser.add_argument("command", choices=["create", "prune", "clear", "stats"])
+    parser.add_argument("--namespace", choices=[TRANSCRIPTS, SCORES], default=None,
+                        help="Limit clear to one namespace")
+    args = parser.parse_args()
+
+    cache = get_result_cache()
+    if cache is None:
+        print("RESULT_CACHE=0: caching is disabled")
+        return
+    if args.command == "create":
+        # Only needed when RESULT_CACHE_URL is not the migrated database
+        if cache.engine is None:
+            print("No shared tier configured")
+            return
+        cache_metadata.create_all(cache.engine, checkfirst=True)
+        print("Created analysis_cache")
+    elif args.command == "prune":
+        from utils.analysis_utils import SCORER_VERSION
+        from utils.asr_backends import transcriber_version
+        print(f"Deleted {cache.prune({TRANSCRIPTS: transcriber_version(), SCORES: SCORER_VERSION})} rows")
+    elif args.command == "clear":
+        print(f"Deleted {cache.clear(args.namespace)} rows")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
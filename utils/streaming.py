@@ -0,0 +1,232 @@
+"""
+Incremental pronunciation scoring for audio that is still being recorded.
+
+A StreamingScorer receives microphone chunks as they arrive. Audio is cut
+into segments at pauses (or at segment_seconds when there is no pause);
+finished segments are transcribed once and their text is kept, and only
+the open segment at the end is re-transcribed as it grows, so every ASR
+call stays short however long the user talks. After each update the
+partial transcript is aligned against the start of the target phrase and
+partial scores are reported. When recording stops only the last open
+segment is left to transcribe before the full result is ready.
+
+Chunks are appended to a buffer that grows by doubling, so a long
+recording costs amortized O(1) per chunk. append() only buffers audio;
+refresh() runs the ASR and may run on another thread (e.g. a job queue
+worker) while further chunks are appended.
+"""
+import threading
+import time
+
+import numpy as np
+
+from utils.asr_models import SAMPLE_RATE, get_asr_model
+from utils.audio_decode import decode_audio
+from utils.g2p import get_g2p, normalize_text
+from utils.phoneme_alignment import compare_ipa_prefix
+from utils.word_alignment import compare_words_prefix
+
+FRAME_SECONDS = 0.02
+
+
+def find_pause(samples, pause_seconds=0.3, min_speech_seconds=0.5, silence_rms=0.01):
+    """
+    Find the sample index in the middle of the last pause that follows speech.
+    A frame is silent when its RMS is below silence_rms or a tenth of the
+    loud frames' level, whichever is higher.
+    Returns:
+        int: Cut position, or 0 when there is no usable pause
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    count = len(samples) // frame
+    if count == 0:
+        return 0
+    rms = np.sqrt(np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1))
+    silent = rms < max(silence_rms, 0.1 * np.percentile(rms, 95))
+
+    pause_frames = int(pause_seconds / FRAME_SECONDS)
+    min_speech_frames = int(min_speech_seconds / FRAME_SECONDS)
+    # Runs of silent frames as (start, end) frame indexes
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    for start, end in reversed(list(zip(edges[::2], edges[1::2]))):
+        if end - start >= pause_frames and np.count_nonzero(~silent[:start]) >= min_speech_frames:
+            return int((start + end) // 2 * frame)
+    return 0
+
+
+def transcribe_samples(samples):
+    """Transcribe 16 kHz float32 samples with the local model (or its inference server)."""
+    from utils.asr_server import get_inference_client
+
+    client = get_inference_client()
+    if client is not None:
+        return client.transcribe(samples)
+    return get_asr_model().transcribe_batch([{"raw": samples, "sampling_rate": SAMPLE_RATE}])[0]
+
+
+class StreamingScorer:
+    """
+    Scores one recording while it is being made.
+    Args:
+        target_text (str): The phrase the user is reading
+        step_seconds (float): New audio needed before the transcript is refreshed
+        segment_seconds (float): Longest segment before it is closed without a pause
+        transcribe (callable): samples -> text, defaults to the local model
+    """
+
+    def __init__(self, target_text, step_seconds=0.5, segment_seconds=6.0, transcribe=None):
+        self.target_text = target_text
+        self.step_seconds = step_seconds
+        self.segment_seconds = segment_seconds
+        self._transcribe = transcribe or transcribe_samples
+        self._samples = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        self._length = 0
+        self._lock = threading.Lock()
+        # Job refreshing this scorer, for callers that refresh on a job queue
+        self.refresh_job = None
+        self._segment_start = 0
+        self._transcribed_until = 0
+        self._committed = []
+        self._tail = ''
+        self._target_ipa = None
+        self.asr_calls = 0
+        self.asr_seconds = 0.0
+
+    @property
+    def _buffer(self):
+        # Appends never touch samples before _length, so this view stays
+        # valid even when the storage is reallocated behind it
+        return self._samples[:self._length]
+
+    @property
+    def duration(self):
+        return self._length / SAMPLE_RATE
+
+    @property
+    def transcript(self):
+        return ' '.join(text for text in self._committed + [self._tail] if text)
+
+    def _run_asr(self, samples):
+        start = time.perf_counter()
+        try:
+            return self._transcribe(samples).strip()
+        finally:
+            self.asr_calls += 1
+            self.asr_seconds += time.perf_counter() - start
+
+    def _refresh(self):
+        with self._lock:
+            buffer = self._buffer
+        segment = buffer[self._segment_start:]
+        cut = find_pause(segment)
+        if cut == 0 and len(segment) >= self.segment_seconds * SAMPLE_RATE:
+            cut = len(segment)
+        if cut:
+            # Close the segment: its text will not change any more
+            text = self._run_asr(segment[:cut])
+            if text:
+                self._committed.append(text)
+            self._segment_start += cut
+            segment = buffer[self._segment_start:]
+        self._tail = self._run_asr(segment) if len(segment) >= SAMPLE_RATE * FRAME_SECONDS else ''
+        self._transcribed_until = len(buffer)
+
+    def append(self, audio):
+        """
+        Append a chunk of microphone audio without transcribing it.
+        Args:
+            audio: (sample_rate, ndarray) tuple as produced by Gradio
+        Returns:
+            bool: True once step_seconds of new audio wait for refresh()
+        """
+        chunk = decode_audio(audio).samples
+        with self._lock:
+            needed = self._length + len(chunk)
+            if needed > len(self._samples):
+                grown = np.zeros(max(needed, 2 * len(self._samples)), dtype=np.float32)
+                grown[:self._length] = self._samples[:self._length]
+                self._samples = grown
+            self._samples[self._length:needed] = chunk
+            self._length = needed
+            return self._length - self._transcribed_until >= self.step_seconds * SAMPLE_RATE
+
+    def refresh(self):
+        """
+        Transcribe the audio appended so far and score it.
+        Only one refresh may run at a time.
+        Returns:
+            dict: partial()
+        """
+        self._refresh()
+        return self.partial()
+
+    def add_chunk(self, audio):
+        """
+        Append a chunk of microphone audio and refresh the partial result
+        once step_seconds of new audio have arrived.
+        Args:
+            audio: (sample_rate, ndarray) tuple as produced by Gradio
+        Returns:
+            dict: partial(), or None if no refresh was due
+        """
+        if not self.append(audio):
+            return None
+        return self.refresh()
+
+    def partial(self):
+        """
+        Scores of the transcript so far against the part of the target it covers.
+        Returns:
+            dict: transcript, progress (share of target phonemes reached) and
+                  word and phoneme accuracy in percent, plus the phoneme issues
+        """
+        transcript = self.transcript
+        result = {
+            'transcript': transcript,
+            'progress': 0.0,
+            'word_accuracy': 0.0,
+            'phoneme_accuracy': 0.0,
+            'phoneme_issues': [],
+            'seconds': round(self.duration, 2)
+        }
+        if not transcript:
+            return result
+
+        # Aligned rather than compared by position, so a skipped or extra
+        # word does not shift every word after it
+        spoken_words = normalize_text(transcript).split()
+        result['word_accuracy'] = round(compare_words_prefix(self.target_text, transcript).score() * 100, 2)
+
+        try:
+            g2p = get_g2p()
+            if self._target_ipa is None:
+                self._target_ipa = g2p.transliterate(normalize_text(self.target_text))
+            comparison, prefix_length, target_length = compare_ipa_prefix(
+                self._target_ipa, g2p.transliterate(' '.join(spoken_words)))
+        except Exception as e:
+            print(f"Streaming phoneme analysis error: {str(e)}")
+            return result
+
+        result['progress'] = round(prefix_length / target_length * 100, 2) if target_length else 0.0
+        result['phoneme_accuracy'] = round(comparison.score() * 100, 2)
+        result['phoneme_issues'] = [
+            {'target_phoneme': target, 'spoken_phoneme': spoken, 'type': op}
+            for target, spoken, op in comparison.mistakes()
+        ]
+        return result
+
+    def finish(self):
+        """
+        Transcribe whatever audio arrived since the last refresh and score
+        the whole transcript like a submitted recording.
+        Returns:
+            dict: Same shape as analyze_pronunciation()
+        """
+        from utils.analysis_utils import create_error_response, score_transcript
+
+        if self._transcribed_until < self._length:
+            self._refresh()
+        transcript = self.transcript
+        if not transcript:
+            return create_error_response("Could not understand audio")
+        return score_transcript(self.target_text, transcript.lower(), 'wav2vec2-streaming')
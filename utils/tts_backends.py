@@ -0,0 +1,238 @@
+"""
+Text-to-speech backends.
+
+Every backend renders text to mono int16 PCM in memory, honours the speed
+multiplier and can stream a phrase chunk by chunk so playback starts
+before the whole phrase has been synthesized.
+"""
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+
+
+def clamp_speed(speed):
+    return min(max(float(speed), MIN_SPEED), MAX_SPEED)
+
+
+def split_into_chunks(text, max_words=8):
+    """
+    Split text at sentence and clause punctuation, then into runs of at most
+    max_words words, so each chunk can be synthesized on its own.
+    """
+    chunks = []
+    for clause in re.split(r'(?<=[.!?;:,])\s+', text.strip()):
+        words = clause.split()
+        for start in range(0, len(words), max_words):
+            chunks.append(' '.join(words[start:start + max_words]))
+    return [chunk for chunk in chunks if chunk]
+
+
+def change_speed(samples, sample_rate, speed, frame_ms=40):
+    """
+    Time-stretch int16 speech without changing its pitch (overlap-add).
+    Frames are read every hop * speed samples and written every hop samples.
+    """
+    speed = clamp_speed(speed)
+    if abs(speed - 1.0) < 1e-3 or len(samples) == 0:
+        return samples
+    frame = max(int(sample_rate * frame_ms / 1000), 16)
+    hop = frame // 2
+    audio = samples.astype(np.float32)
+    if len(audio) < frame:
+        audio = np.pad(audio, (0, frame - len(audio)))
+
+    starts = np.arange(0, len(audio) - frame + 1, hop * speed).astype(np.int64)
+    window = np.hanning(frame).astype(np.float32)
+    frames = audio[starts[:, None] + np.arange(frame)] * window
+
+    out_length = (len(starts) - 1) * hop + frame
+    positions = ((np.arange(len(starts)) * hop)[:, None] + np.arange(frame)).ravel()
+    out = np.bincount(positions, weights=frames.ravel(), minlength=out_length)
+    norm = np.bincount(positions, weights=np.tile(window, len(starts)), minlength=out_length)
+    out /= np.maximum(norm, 1e-3)
+    return np.clip(out, -32768, 32767).astype(np.int16)
+
+
+def pcm_to_wav_bytes(samples, sample_rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+class TTSBackend:
+    """
+    Base class for speech synthesizers.
+    Subclasses implement synthesize(); save() and stream() build on it.
+    """
+    name = 'base'
+    extension = '.wav'
+
+    def synthesize(self, text, lang='en', speed=1.0):
+        """
+        Returns:
+            tuple: (sample_rate, int16 ndarray)
+        """
+        raise NotImplementedError
+
+    def save(self, text, lang, speed, path):
+        """Write the whole phrase to path in this backend's format."""
+        self.save_pcm(*self.synthesize(text, lang, speed), path)
+
+    def save_pcm(self, sample_rate, samples, path):
+        """Write already synthesized PCM to path in this backend's format."""
+        with open(path, 'wb') as f:
+            f.write(pcm_to_wav_bytes(samples, sample_rate))
+
+    def load(self, path):
+        """
+        Read a file written by save() back into PCM.
+        Returns:
+            tuple: (sample_rate, int16 ndarray)
+        """
+        with wave.open(path, 'rb') as f:
+            return f.getframerate(), np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+
+    def stream(self, text, lang='en', speed=1.0):
+        """
+        Yield (sample_rate, int16 ndarray) chunks as they are synthesized.
+        """
+        for chunk in split_into_chunks(text):
+            yield self.synthesize(chunk, lang, speed)
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS; needs the network. Speed is applied by time-stretching."""
+    name = 'gtts'
+    extension = '.mp3'
+
+    def _mp3(self, text, lang, speed):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        # gTTS only knows normal and slow; slow covers the low end natively
+        gTTS(text=text, lang=lang, slow=clamp_speed(speed) <= 0.6).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def _effective_speed(self, speed):
+        speed = clamp_speed(speed)
+        return speed / 0.5 if speed <= 0.6 else speed
+
+    def synthesize(self, text, lang='en', speed=1.0):
+        from pydub import AudioSegment
+
+        segment = AudioSegment.from_file(io.BytesIO(self._mp3(text, lang, speed)), format='mp3')
+        segment = segment.set_channels(1).set_sample_width(2)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.int16)
+        return segment.frame_rate, change_speed(samples, segment.frame_rate, self._effective_speed(speed))
+
+    def save(self, text, lang, speed, path):
+        if abs(self._effective_speed(speed) - 1.0) < 1e-3:
+            # Nothing to stretch: keep gTTS's MP3 as is
+            with open(path, 'wb') as f:
+                f.write(self._mp3(text, lang, speed))
+            return
+        self.save_pcm(*self.synthesize(text, lang, speed), path)
+
+    def save_pcm(self, sample_rate, samples, path):
+        from pydub import AudioSegment
+
+        AudioSegment(samples.astype('<i2').tobytes(), frame_rate=sample_rate,
+                     sample_width=2, channels=1).export(path, format='mp3')
+
+    def load(self, path):
+        from pydub import AudioSegment
+
+        segment = AudioSegment.from_file(path, format='mp3').set_channels(1).set_sample_width(2)
+        return segment.frame_rate, np.array(segment.get_array_of_samples(), dtype=np.int16)
+
+
+class Pyttsx3Backend(TTSBackend):
+    """Offline synthesis through the platform engine (eSpeak, SAPI5, NSSpeech)."""
+    name = 'pyttsx3'
+    BASE_RATE = 175  # words per minute at speed 1.0
+
+    def __init__(self):
+        # pyttsx3 engines are not thread safe
+        self._lock = threading.Lock()
+
+    def synthesize(self, text, lang='en', speed=1.0):
+        import pyttsx3
+        from utils.audio_decode import to_mono
+
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            with self._lock:
+                engine = pyttsx3.init()
+                engine.setProperty('rate', int(self.BASE_RATE * clamp_speed(speed)))
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+            with wave.open(path, 'rb') as f:
+                sample_rate = f.getframerate()
+                channels = f.getnchannels()
+                samples = np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+            if channels > 1:
+                samples = to_mono(samples.reshape(-1, channels)).astype(np.int16)
+            return sample_rate, samples
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class FakeTTSBackend(TTSBackend):
+    """
+    Deterministic offline backend for tests and benchmarks: one tone per
+    word, 0.25 s long at speed 1.0, after an optional per-word delay that
+    simulates synthesis cost.
+    """
+    name = 'fake'
+    sample_rate = 16000
+
+    def __init__(self, seconds_per_word=0.0):
+        self.seconds_per_word = seconds_per_word
+
+    def synthesize(self, text, lang='en', speed=1.0):
+        words = text.split()
+        if self.seconds_per_word:
+            time.sleep(self.seconds_per_word * len(words))
+        length = int(0.25 * self.sample_rate / clamp_speed(speed))
+        t = np.arange(length, dtype=np.float32) / self.sample_rate
+        tones = [np.sin(2 * np.pi * (200 + 20 * (sum(map(ord, word)) % 20)) * t) for word in words]
+        if not tones:
+            return self.sample_rate, np.zeros(0, dtype=np.int16)
+        return self.sample_rate, (np.concatenate(tones) * 8000).astype(np.int16)
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'pyttsx3': Pyttsx3Backend,
+    'fake': FakeTTSBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_tts_backend():
+    """Get the process-wide TTS backend selected by TTS_BACKEND (default gtts)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[os.environ.get('TTS_BACKEND', 'gtts')]()
+    return _backend
@@ -0,0 +1,186 @@
+"""
+Content-addressed on-disk cache for synthesized speech.
+
+Files are named by a hash of (text, lang, speed), written atomically and
+evicted least-recently-used first once the directory exceeds its size budget.
+Files used within the last min_age seconds are never evicted, so a path
+just handed to a caller stays readable while it is being served.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from utils import metrics
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MIN_AGE = 60
+# Temporary files older than this were left behind by a crashed synthesis
+STALE_TMP_SECONDS = 3600
+
+
+class TTSCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, extension='.mp3', min_age=DEFAULT_MIN_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.min_age = min_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text, lang, speed):
+        payload = json.dumps([text, lang, round(float(speed), 3)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, text, lang='en', speed=1.0):
+        """
+        Look up cached audio.
+        Returns:
+            str: Path of the cached file, or None on a miss
+        """
+        path = self.path_for(self.key(text, lang, speed))
+        try:
+            # Touching the file marks it as recently used for eviction
+            os.utime(path)
+        except OSError:
+            return None
+        with self._lock:
+            self.hits += 1
+        metrics.counter("tts_cache_hits").inc()
+        return path
+
+    def get_or_create(self, text, lang, speed, synthesize):
+        """
+        Return cached audio, synthesizing it on a miss.
+        Args:
+            synthesize (callable): synthesize(path) writes the audio to path
+        Returns:
+            str: Path of the cached file
+        """
+        path = self.get(text, lang, speed)
+        if path:
+            return path
+
+        key = self.key(text, lang, speed)
+        with self._lock:
+            # [lock, threads using it]; the entry lives until the last one is done
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        # One synthesis per key even when several threads miss at once
+        try:
+            with entry[0]:
+                path = self.get(text, lang, speed)
+                if path:
+                    return path
+                with self._lock:
+                    self.misses += 1
+                metrics.counter("tts_cache_misses").inc()
+
+                path = self.path_for(key)
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                os.close(fd)
+                try:
+                    synthesize(tmp_path)
+                    os.replace(tmp_path, path)
+                except Exception:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """
+        Delete least recently used files until the cache fits max_bytes, and
+        temporary files abandoned by interrupted syntheses. Files used within
+        the last min_age seconds are kept even if the budget stays exceeded.
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if entry.name.endswith('.tmp'):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                continue
+            if not entry.name.endswith(self.extension):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes or now - mtime < self.min_age:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.evictions += removed
+        metrics.counter("tts_cache_evictions").inc(removed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache(backend=None):
+    """
+    Get the process-wide TTS cache of a backend.
+    TTS_CACHE_DIR and TTS_CACHE_MAX_MB configure where and how much is kept;
+    each backend gets its own subdirectory and file extension.
+    """
+    name = getattr(backend, 'name', 'gtts')
+    cache = _caches.get(name)
+    if cache is None:
+        with _cache_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                directory = os.environ.get('TTS_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'tts_cache')
+                max_bytes = int(float(os.environ.get('TTS_CACHE_MAX_MB', DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+                cache = TTSCache(os.path.join(directory, name), max_bytes,
+                                 extension=getattr(backend, 'extension', '.mp3'))
+                _caches[name] = cache
+    return cache
@@ -0,0 +1,141 @@
+"""
+Voice activity detection and loudness normalization before ASR.
+
+Frames are classified as speech from their energy, with a zero-crossing
+rate test that keeps quiet fricatives (s, f, th) which energy alone would
+drop. A clip whose loudness hardly varies (hum, fan or line noise) has no
+speech in it, however loud it is. Leading and trailing silence is trimmed, clips without speech are
+rejected before any recognizer is called, and the remaining audio is
+scaled to a common level. Everything is computed on whole-clip arrays.
+"""
+import os
+
+import numpy as np
+
+from utils import metrics
+from utils.audio_decode import DecodedAudio
+
+FRAME_SECONDS = 0.02
+# Absolute floor below which a frame is never speech (about -50 dBFS)
+MIN_SPEECH_RMS = 0.003
+# Speech must be this many times louder than the clip's noise floor
+NOISE_FLOOR_RATIO = 3.0
+# Zero crossings per sample typical of fricatives rather than hum
+FRICATIVE_ZCR = 0.25
+# Syllables make speech at least this much louder than the quietest frames;
+# steady noise stays within it
+MIN_DYNAMIC_RANGE = 2.0
+TARGET_RMS = 0.1
+MAX_GAIN = 20.0
+
+
+def frame_features(samples, sample_rate):
+    """
+    RMS energy and zero-crossing rate of consecutive frames.
+    Returns:
+        tuple: (rms, zcr) arrays with one value per frame
+    """
+    frame = max(int(sample_rate * FRAME_SECONDS), 1)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame)
+    return rms, zcr
+
+
+def speech_frames(samples, sample_rate, hangover_frames=5):
+    """
+    Boolean speech mask with one entry per frame, extended by
+    hangover_frames on both sides so word edges are kept.
+    """
+    rms, zcr = frame_features(samples, sample_rate)
+    if len(rms) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = np.percentile(rms, 10)
+    loudest = float(rms.max())
+    if loudest < noise_floor * MIN_DYNAMIC_RANGE:
+        return np.zeros(len(rms), dtype=bool)
+    # A clip that is speech throughout has no quiet frames to learn the floor
+    # from; capping at half the loudest frame still keeps its vowels. The
+    # maximum rather than a percentile, so a single short word still counts.
+    threshold = max(MIN_SPEECH_RMS, min(noise_floor * NOISE_FLOOR_RATIO, 0.5 * loudest))
+    speech = (rms > threshold) | ((zcr > FRICATIVE_ZCR) & (rms > max(MIN_SPEECH_RMS, noise_floor * 1.5)))
+    if hangover_frames:
+        kernel = np.ones(2 * hangover_frames + 1, dtype=np.int32)
+        speech = np.convolve(speech.astype(np.int32), kernel, mode='same') > 0
+    return speech
+
+
+def normalize_loudness(samples, target_rms=TARGET_RMS, max_gain=MAX_GAIN):
+    """
+    Scale samples to target_rms, never amplifying more than max_gain or clipping.
+    Returns:
+        tuple: (scaled samples, gain applied)
+    """
+    rms = float(np.sqrt(np.mean(np.square(samples)))) if len(samples) else 0.0
+    if rms == 0.0:
+        return samples, 1.0
+    peak = float(np.max(np.abs(samples)))
+    gain = min(target_rms / rms, max_gain, 0.99 / peak)
+    return (samples * gain).astype(np.float32), gain
+
+
+class VADResult:
+    """How much of a clip was kept as speech."""
+    __slots__ = ('original_seconds', 'speech_seconds', 'gain')
+
+    def __init__(self, original_seconds, speech_seconds, gain=1.0):
+        self.original_seconds = original_seconds
+        self.speech_seconds = speech_seconds
+        self.gain = gain
+
+    @property
+    def removed_seconds(self):
+        return self.original_seconds - self.speech_seconds
+
+    @property
+    def is_empty(self):
+        return self.speech_seconds == 0.0
+
+    def as_dict(self):
+        return {
+            'original_seconds': round(self.original_seconds, 3),
+            'speech_seconds': round(self.speech_seconds, 3),
+            'removed_seconds': round(self.removed_seconds, 3),
+            'gain': round(self.gain, 3)
+        }
+
+
+def prepare_for_asr(audio, min_speech_seconds=0.1):
+    """
+    Trim leading and trailing silence and normalize loudness.
+    Silence between words is kept so the recognizer sees natural pauses.
+    Set AUDIO_VAD=0 to pass audio through unchanged.
+    Args:
+        audio (DecodedAudio): Decoded clip
+        min_speech_seconds (float): Less speech than this counts as an empty clip
+    Returns:
+        tuple: (DecodedAudio, VADResult)
+    """
+    original = audio.duration
+    if os.environ.get("AUDIO_VAD", "1") != "1":
+        return audio, VADResult(original, original)
+
+    frame = max(int(audio.sample_rate * FRAME_SECONDS), 1)
+    speech = np.flatnonzero(speech_frames(audio.samples, audio.sample_rate))
+    if len(speech) == 0 or (speech[-1] + 1 - speech[0]) * FRAME_SECONDS < min_speech_seconds:
+        metrics.counter("vad_rejected").inc()
+        metrics.counter("vad_removed_seconds").inc(original)
+        return DecodedAudio(audio.samples[:0], audio.sample_rate, source=audio.source), VADResult(original, 0.0)
+
+    start, end = speech[0] * frame, min((speech[-1] + 1) * frame, len(audio.samples))
+    trimmed = audio.samples[start:end]
+    normalized, gain = normalize_loudness(trimmed)
+
+    result = VADResult(original, len(trimmed) / float(audio.sample_rate), gain)
+    metrics.counter("vad_removed_seconds").inc(result.removed_seconds)
+    return DecodedAudio(normalized, audio.sample_rate, source=audio.source,
+                        decode_seconds=audio.decode_seconds, input_bytes=audio.input_bytes), result
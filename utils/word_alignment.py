@@ -0,0 +1,153 @@
+"""
+Word level alignment of a transcript against its target text.
+
+Both texts are normalized and split once, words are interned to integer
+ids for the call and aligned with the same row-vectorized DP as phonemes,
+after the common leading and trailing words have been matched directly.
+Of the alignments with the fewest edits the one matching the most words
+is kept, so a skipped word is reported as missed rather than shifting the
+words after it into substitutions.
+Each target word can be mapped onto its span of target phonemes, giving
+per-word phoneme accuracy from the phoneme comparison.
+"""
+import numpy as np
+
+from utils.g2p import normalize_text
+from utils.phoneme_alignment import DELETE, INSERT, MATCH, OP_CODES, SUBSTITUTE, align, align_prefix, tokenize_ipa
+
+CORRECT = 'correct'
+SUBSTITUTED = 'substituted'
+MISSED = 'missed'
+EXTRA = 'extra'
+
+STATUS = {MATCH: CORRECT, SUBSTITUTE: SUBSTITUTED, DELETE: MISSED, INSERT: EXTRA}
+
+
+def intern_words(*texts):
+    """
+    Word lists as integer id arrays, equal words getting equal ids. The ids
+    only hold within one call, so no vocabulary grows with the traffic.
+    """
+    ids = {}
+    return [np.fromiter((ids.setdefault(word, len(ids)) for word in words), dtype=np.int32, count=len(words))
+            for words in texts]
+
+
+def align_words(target_ids, spoken_ids):
+    """
+    Align two word id sequences. The common leading and trailing words are
+    matched directly and only the stretch between them goes through the DP.
+    Returns:
+        list: (op, target_index, spoken_index) as in align()
+    """
+    target_ids = np.asarray(target_ids, dtype=np.int32)
+    spoken_ids = np.asarray(spoken_ids, dtype=np.int32)
+    shortest = min(len(target_ids), len(spoken_ids))
+
+    # Length of the common prefix, then of the common suffix of the rest
+    differs = np.flatnonzero(target_ids[:shortest] != spoken_ids[:shortest])
+    head = int(differs[0]) if len(differs) else shortest
+    rest = shortest - head
+    differs = np.flatnonzero(target_ids[::-1][:rest] != spoken_ids[::-1][:rest])
+    tail = int(differs[0]) if len(differs) else rest
+
+    target_end, spoken_end = len(target_ids) - tail, len(spoken_ids) - tail
+    _, middle = align(target_ids[head:target_end], spoken_ids[head:spoken_end], prefer_matches=True)
+    ops = [(MATCH, i, i) for i in range(head)]
+    ops.extend((op, None if t is None else t + head, None if s is None else s + head) for op, t, s in middle)
+    ops.extend((MATCH, target_end + i, spoken_end + i) for i in range(tail))
+    return ops
+
+
+class WordAlignment:
+    """Per-word result of aligning a transcript with its target text."""
+
+    def __init__(self, target_words, spoken_words, ops):
+        self.target_words = target_words
+        self.spoken_words = spoken_words
+        self.ops = ops
+
+    def __len__(self):
+        return len(self.ops)
+
+    def count(self, status):
+        return sum(1 for op, _, _ in self.ops if STATUS[op] == status)
+
+    def score(self):
+        """Correct words over alignment steps, so extra words also cost; 0.0 when empty."""
+        if not self.ops:
+            return 0.0
+        return self.count(CORRECT) / float(len(self.ops))
+
+    def completeness(self):
+        """Share of target words that were spoken, correctly or not."""
+        if not self.target_words:
+            return 0.0
+        return 1.0 - self.count(MISSED) / float(len(self.target_words))
+
+    def words(self, target_phonemes=None, comparison=None):
+        """
+        One entry per alignment step.
+        Args:
+            target_phonemes (list): IPA of each target word, e.g. from G2PService.transliterate_words
+            comparison (PhonemeComparison): Alignment of the target phonemes,
+                                            used for each word's phoneme accuracy
+        Returns:
+            list: dicts with word, spoken, status, and for target words when
+                  target_phonemes is given, phoneme_span as [start, end) into the
+                  target phonemes and phoneme_accuracy
+        """
+        spans = None
+        if target_phonemes is not None and len(target_phonemes) == len(self.target_words):
+            ends = np.cumsum([len(tokenize_ipa(ipa)) for ipa in target_phonemes], dtype=np.int64)
+            spans = np.stack((ends - np.diff(ends, prepend=0), ends), axis=1)
+
+        accuracy = None
+        if spans is not None and comparison is not None and len(comparison):
+            # Target phoneme each step belongs to; insertions count toward the phoneme before them
+            consumes = comparison.op_codes != OP_CODES[INSERT]
+            if spans.size == 0 or int(consumes.sum()) == int(spans[-1, 1]):
+                position = np.cumsum(consumes) - 1
+                correct = comparison.correct
+                bounds = np.searchsorted(position, spans, side='left')
+                accuracy = [float(correct[lo:hi].mean()) if hi > lo else 0.0 for lo, hi in bounds]
+
+        entries = []
+        for op, t, s in self.ops:
+            entry = {
+                'word': self.target_words[t] if t is not None else None,
+                'spoken': self.spoken_words[s] if s is not None else None,
+                'status': STATUS[op]
+            }
+            if t is not None and spans is not None:
+                entry['phoneme_span'] = [int(spans[t, 0]), int(spans[t, 1])]
+                if accuracy is not None:
+                    entry['phoneme_accuracy'] = round(accuracy[t] * 100, 2)
+            entries.append(entry)
+        return entries
+
+
+def compare_words(target_text, spoken_text):
+    """
+    Normalize, tokenize and align two texts word by word.
+    Returns:
+        WordAlignment: The alignment result
+    """
+    target_words = normalize_text(target_text).split()
+    spoken_words = normalize_text(spoken_text).split()
+    ops = align_words(*intern_words(target_words, spoken_words))
+    return WordAlignment(target_words, spoken_words, ops)
+
+
+def compare_words_prefix(target_text, spoken_text):
+    """
+    Like compare_words(), for a transcript that may cover only the start of
+    the target: the spoken words are aligned with whichever target prefix
+    they match best, so the words not yet spoken do not count as missed.
+    Returns:
+        WordAlignment: The alignment over that target prefix
+    """
+    target_words = normalize_text(target_text).split()
+    spoken_words = normalize_text(spoken_text).split()
+    prefix_length, _, ops = align_prefix(*intern_words(target_words, spoken_words), prefer_matches=True)
+    return WordAlignment(target_words[:prefix_length], spoken_words, ops)
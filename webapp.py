@@ -1,37 +1,16 @@
 from flask import Flask, render_template
 from flask_login import LoginManager, login_required
 from models.models import db, User
+from models.engine import init_app_db
 from auth.routes import auth_bp
-import gradio as gr
-from app import process_audio, play_phrase, PREDEFINED_PHRASES, CUSTOM_PHRASE_OPTION
+import os
 import threading
 
-def create_app():
-    app = Flask(__name__)
-    
-    # Load config
-    app.config.from_pyfile('config.py')
-    
-    # Initialize database
-    db.init_app(app)
-    
-    # Initialize LoginManager
-    login_manager = LoginManager()
-    login_manager.login_view = 'auth.login'
-    login_manager.init_app(app)
-    
-    @login_manager.user_loader
-    def load_user(user_id):
-        # Use Session.get() instead of Query.get() for SQLAlchemy 2.0 compatibility
-        return db.session.get(User, int(user_id))
-    
-    # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    
-    # Import and register main blueprint
-    from main import init_app as init_main
-    init_main(app)
-    
+def start_gradio_interface():
+    """Build the practice interface and serve it from a background thread."""
+    import gradio as gr
+    from app import process_audio, play_phrase, PREDEFINED_PHRASES, CUSTOM_PHRASE_OPTION
+
     # Create Gradio interface
     interface = gr.Blocks()
     with interface:
@@ -105,6 +84,38 @@ def create_app():
     gradio_thread = threading.Thread(target=launch_gradio)
     gradio_thread.daemon = True
     gradio_thread.start()
+
+def create_app(start_gradio=None):
+    app = Flask(__name__)
+    
+    # Load config
+    app.config.from_pyfile('config.py')
+    
+    # Initialize database
+    init_app_db(app, db)
+    
+    # Initialize LoginManager
+    login_manager = LoginManager()
+    login_manager.login_view = 'auth.login'
+    login_manager.init_app(app)
+    
+    @login_manager.user_loader
+    def load_user(user_id):
+        # Use Session.get() instead of Query.get() for SQLAlchemy 2.0 compatibility
+        return db.session.get(User, int(user_id))
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    
+    # Import and register main blueprint
+    from main import init_app as init_main
+    init_main(app)
+    
+    # Gradio pulls in the ML stack, so only the server entry points start it
+    if start_gradio is None:
+        start_gradio = os.environ.get('WEBAPP_GRADIO', '0') == '1'
+    if start_gradio:
+        start_gradio_interface()
     
     # Add route to redirect to Gradio interface
     @app.route('/practice')
@@ -120,5 +131,5 @@ def create_app():
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app(start_gradio=True)
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file